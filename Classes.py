@@ -1,17 +1,114 @@
-from utils import define_dynamic
+from bisect import bisect_right
+from collections import namedtuple
+from fractions import Fraction
+import math
+
+from CompactRhythms import STICKING_NAMES, iter_compact
+from utils import TICKS_PER_WHOLE, define_dynamic, duration_to_ticks
+
+# Notes, Rhythms and MultiRhythms star import this module
+__all__ = ['BarNote', 'to_ticks', 'OffsetIndex', 'Bar', 'Sheet', 'Crescendo']
+
+# A Note placed in a Bar, ticks is its length, mask its modifier bitmask with modulators included
+BarNote = namedtuple('BarNote', ['ticks', 'sticking', 'dynamic', 'mask'])
+
+
+def to_ticks(offset):
+    ''' Ticks at or before an offset in whole notes '''
+    return math.floor(Fraction(offset) * TICKS_PER_WHOLE)
+
+
+class OffsetIndex:
+    ''' Fenwick tree over bar lengths in ticks
+        Bar offsets are prefix sums, a length change and a lookup by time are O(log n) '''
+
+    def __init__(self):
+
+        self.values = []
+        self.tree = [0] # 1 based, tree[i] sums values (i - lowbit(i), i]
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+
+        self.values.append(value)
+        i = len(self.values)
+        # Node i covers the lowbit(i) values ending at i
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+
+    def add(self, index, delta):
+
+        self.values[index] += delta
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count):
+        ''' Sum of the first count values '''
+
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def find(self, ticks):
+        ''' Index of the value covering ticks, len(self) when ticks is past the end '''
+
+        index, remaining = 0, ticks
+        step = 1 << max(0, (len(self.tree) - 1).bit_length() - 1)
+        while step:
+            if index + step < len(self.tree) and self.tree[index + step] <= remaining:
+                index += step
+                remaining -= self.tree[index]
+            step >>= 1
+        return index
+
 
-        
 class Bar:
 
     def __init__(self, previous_bar, beat_count=4, beat_unit=4):
 
-        self._previous_bar = previous_bar # Reference bar just before current, use Sheet object for first bar
-        
+        # Reference bar just before current, use Sheet object for first bar
+        # Bars in a Sheet find their neighbours by number, no chain is kept
+        if isinstance(previous_bar, Sheet):
+            self._sheet, self._index = previous_bar, 0
+        elif isinstance(previous_bar, Bar):
+            self._sheet, self._index = previous_bar._sheet, previous_bar._index + 1
+        else:
+            self._sheet, self._index = None, 0
+
         self._beat_count = beat_count # top of time signature
         self._beat_unit = beat_unit # bottom of time signature
+        self._ticks = self.get_ticks(beat_count, beat_unit)
 
         self.rehearsal_marking = None
 
+        self.offsets = [] # Note starts in ticks from the start of the bar, sorted
+        self.notes = [] # BarNote for every offset
+
+    def __repr__(self):
+        return f"Bar({self.number}, time_signature={self.time_signature}, notes={len(self.notes)})"
+
+    def __len__(self):
+        return len(self.notes)
+
+    @staticmethod
+    def get_ticks(beat_count, beat_unit):
+        return duration_to_ticks(Fraction(beat_count, beat_unit))
+
+    @property
+    def number(self):
+        ''' Bar number, the first bar is 1 '''
+        return self._index + 1
+
+    @property
+    def previous_bar(self):
+        if self._sheet == None: return None
+        return self._sheet if self._index == 0 else self._sheet.bars[self._index - 1]
+
     @property
     def time_signature(self):
         return (self._beat_count, self._beat_unit)
@@ -20,15 +117,179 @@ class Bar:
     def duration(self):
         return self._beat_count / self._beat_unit
 
+    @property
+    def ticks(self):
+        return self._ticks
+
+    @property
+    def offset(self):
+        ''' Start of the bar in ticks from the start of the Sheet '''
+        return self._sheet.index.prefix(self._index) if self._sheet != None else 0
+
     def set_time_signature(self, beat_count, beat_unit):
+        ''' Change the bar length, later bars move with it and keep their Notes '''
+
+        ticks = self.get_ticks(beat_count, beat_unit)
+        if self.offsets and self.offsets[-1] >= ticks:
+            raise Exception(f"Time signature {beat_count}/{beat_unit} is too short for the Notes in bar {self.number}")
+
         self._beat_count, self._beat_unit = beat_count, beat_unit
+        if self._sheet != None: self._sheet._resize_bar(self, ticks)
+        self._ticks = ticks
+
+    def add_note(self, offset, note):
+        ''' Place a BarNote offset ticks from the start of the bar '''
+
+        if not 0 <= offset < self._ticks:
+            raise Exception(f"Offset {offset} is outside bar {self.number} of {self._ticks} ticks")
+
+        i = bisect_right(self.offsets, offset)
+        self.offsets.insert(i, offset)
+        self.notes.insert(i, note)
+
+    def get_note_index(self, offset):
+        ''' Index of the last Note starting at or before offset ticks, -1 when none has started '''
+        return bisect_right(self.offsets, offset) - 1
 
 
 
 
 class Sheet:
-    ''' Contains overall information '''
-    pass
+    ''' Contains overall information
+
+        Bars are kept in order with an OffsetIndex of their lengths, so a bar is found by number in O(1)
+        and by time in O(log n), and a time signature change moves every later bar in O(log n)
+
+        sheet = Sheet()
+        sheet.add_rhythm(make_16th_note_grid())
+        bar, note = sheet.get_note_at(2.5) # Note playing half way through bar 3 '''
+
+    def __init__(self, beat_count=4, beat_unit=4):
+
+        self.time_signature = (beat_count, beat_unit) # of new bars
+        self.bars = []
+        self.index = OffsetIndex()
+        self.end = 0 # ticks where the next added Note starts
+
+    def __repr__(self):
+        return f"Sheet(bars={len(self.bars)}, duration={self.get_duration()})"
+
+    def __len__(self):
+        return len(self.bars)
+
+    def __iter__(self):
+        return iter(self.bars)
+
+    @property
+    def ticks(self):
+        return self.index.prefix(len(self.index))
+
+    def get_duration(self):
+        return self.ticks / TICKS_PER_WHOLE
+
+    #########################################
+    #                 Bars                  #
+    #########################################
+
+    def add_bar(self, beat_count=None, beat_unit=None):
+        ''' Append a bar, the time signature defaults to the last bar's '''
+
+        last = self.bars[-1] if self.bars else None
+        if beat_count == None: beat_count = self.time_signature[0] if last == None else last._beat_count
+        if beat_unit == None: beat_unit = self.time_signature[1] if last == None else last._beat_unit
+
+        bar = Bar(self if last == None else last, beat_count, beat_unit)
+        self.bars.append(bar)
+        self.index.append(bar.ticks)
+        return bar
+
+    def get_bar(self, number):
+        ''' Bar by number, the first bar is 1 '''
+
+        if not 1 <= number <= len(self.bars): raise IndexError(f"No bar {number} in sheet of {len(self.bars)} bars")
+        return self.bars[number - 1]
+
+    def _resize_bar(self, bar, ticks):
+        ''' Called by Bar.set_time_signature, keeps the next Note after the last bar's Notes '''
+
+        delta = ticks - bar.ticks
+        self.index.add(bar._index, delta)
+        if bar._index < len(self.bars) - 1: self.end += delta
+
+    def get_bar_at(self, offset):
+        ''' Bar playing at an offset in whole notes, None past the end '''
+        return self.get_bar_at_ticks(to_ticks(offset))
+
+    def get_bar_at_ticks(self, ticks):
+
+        if ticks < 0: return None
+        index = self.index.find(ticks)
+        return self.bars[index] if index < len(self.bars) else None
+
+    #########################################
+    #                 Notes                 #
+    #########################################
+
+    def add_note(self, ticks, sticking='R', dynamic=3, mask=0):
+        ''' Append a Note after the last one, bars are added as they fill
+            A Note longer than the rest of its bar gets the bars it carries on into '''
+
+        while self.end >= self.ticks: self.add_bar()
+
+        bar = self.bars[-1]
+        bar.add_note(self.end - bar.offset, BarNote(ticks, sticking, define_dynamic(dynamic), mask))
+        self.end += ticks
+        while self.end > self.ticks: self.add_bar()
+
+    def add_rhythm(self, source):
+        ''' Append every Note of a Rhythm, MultiRhythm or their compact versions '''
+
+        for rhythm in iter_compact(source):
+            for record in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, rhythm.get_masks()):
+                ticks, sticking, dynamic, mask = record
+                self.add_note(ticks, STICKING_NAMES[sticking], dynamic, mask)
+
+        return self
+
+    @classmethod
+    def from_rhythm(cls, source, beat_count=4, beat_unit=4):
+        return cls(beat_count, beat_unit).add_rhythm(source)
+
+    def get_note_at(self, offset):
+        ''' (Bar, BarNote) playing at an offset in whole notes, None during a rest or past the end
+            A Note crossing bar lines is found from every bar it carries on into, the Bar returned
+            is the one it starts in '''
+        return self.get_note_at_ticks(to_ticks(offset))
+
+    def get_note_at_ticks(self, ticks):
+
+        bar = self.get_bar_at_ticks(ticks)
+        if bar == None: return None
+
+        start = bar.offset
+        i = bar.get_note_index(ticks - start)
+        if i >= 0:
+            note = bar.notes[i]
+            return (bar, note) if start + bar.offsets[i] + note.ticks > ticks else None
+
+        # Nothing started in this bar yet, the last Note started before it may still be playing
+        # Bars that Note fills have no Notes of their own, walk back over them
+        index = bar._index - 1
+        while index >= 0 and not self.bars[index].notes: index -= 1
+        if index < 0: return None
+
+        previous = self.bars[index]
+        if previous.offset + previous.offsets[-1] + previous.notes[-1].ticks > ticks:
+            return previous, previous.notes[-1]
+        return None
+
+    def iter_notes(self):
+        ''' Yield (ticks from the start of the Sheet, Bar, BarNote) in order '''
+
+        for bar in self.bars:
+            start = bar.offset
+            for offset, note in zip(bar.offsets, bar.notes):
+                yield start + offset, bar, note
 
 
 
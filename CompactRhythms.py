@@ -0,0 +1,397 @@
+from array import array
+from fractions import Fraction
+
+from utils import (STICKING, MODIFIER_CODES, DURATION_MULTIPLIERS, 
+                   action, define_dynamic, duration_to_ticks, get_modulator_states, get_plan, ticks_to_duration)
+
+# Reverse lookups for decoding
+STICKING_NAMES = {code: name for name, code in STICKING.items()}
+MODIFIER_NAMES = {code: name for name, code in MODIFIER_CODES.items()}
+DOT_CODES = {MODIFIER_CODES['dot']: DURATION_MULTIPLIERS['dot'],
+             MODIFIER_CODES['double_dot']: DURATION_MULTIPLIERS['double_dot']}
+
+
+def mask_codes(mask):
+    ''' Split a modifier bitmask into its modifier codes '''
+    return [code for code in MODIFIER_CODES.values() if mask & (1 << code)]
+
+
+class CompactRhythm:
+    ''' Columnar version of a Rhythm, one array per Note property
+
+        Does not require music21, Note and Rhythm objects are only built by to_rhythm
+
+        Columns
+            ticks: Note duration in utils.TICKS_PER_WHOLE, dots included
+            sticking: utils.STICKING codes
+            dynamics: utils.DYNAMICS values before modifiers, Marcato, Staccato and Tenuto set theirs when played
+            modifiers: bitmask of 1 << utils.MODIFIER_CODES value for every constant modifier on the Note
+            modulators: {name: (modifier code, Note position or None)}, kept out of the bitmasks '''
+
+    def __init__(self, default_duration: float=0):
+
+        self.default_duration = default_duration
+
+        self.ticks = array('l')
+        self.sticking_codes = array('b')
+        self.dynamics = array('b')
+        self.modifier_masks = array('l')
+
+        self.modulators = {}
+
+    def __repr__(self):
+        return f"CompactRhythm({self.get_duration()}, sticking={self.sticking}, modulators={self.modulators})"
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactRhythm): return NotImplemented
+        return (self.ticks == other.ticks and
+                self.sticking_codes == other.sticking_codes and
+                self.dynamics == other.dynamics and
+                self.modifier_masks == other.modifier_masks and
+                self.modulators == other.modulators)
+
+    def get_duration(self):
+        return ticks_to_duration(sum(self.ticks))
+
+    @property
+    def sticking(self):
+        ''' Get the sticking of notes in the rhythm as a string '''
+        return ''.join([STICKING_NAMES[code] for code in self.sticking_codes])
+
+    def get_masks(self):
+        ''' Modifier bitmask of every Note with modulators included '''
+
+        masks = array('l', self.modifier_masks)
+        for code, position in self.modulators.values():
+            if position != None: masks[position] |= 1 << code
+        return masks
+
+    def append_note(self, ticks, sticking='R', dynamic=3, mask=0):
+        ''' Append a single Note record '''
+
+        self.ticks.append(ticks)
+        self.sticking_codes.append(STICKING[sticking])
+        self.dynamics.append(define_dynamic(dynamic))
+        self.modifier_masks.append(mask)
+
+    #########################################
+    #             Rhythm methods            #
+    #########################################
+
+    # Same behaviour as the Rhythm methods of the same name
+    # Modifiers are passed by name or code from utils.MODIFIER_CODES instead of Modifier objects
+
+    def add_note(self, sticking=None, dur_mod=None, *mods, dynamic=3, dotted=False):
+        ''' Add a single Note by passing Note parameters '''
+
+        if type(dur_mod) == float: # Duration
+            _duration = dur_mod
+            _modifiers = [*mods]
+        elif dur_mod == None: # No value passed
+            _duration = self.default_duration
+            _modifiers = []
+        else: # Modifier passed
+            _duration = self.default_duration
+            _modifiers = dur_mod if type(dur_mod) == list else [dur_mod]
+
+        if not sticking: raise Exception('Provide a sticking value')
+
+        if dotted in [True, 'single']: 
+            _modifiers.append('dot')
+        elif dotted == 'double': 
+            _modifiers.append('double_dot')
+
+        mask = 0
+        ticks = Fraction(duration_to_ticks(_duration))
+        dynamic = define_dynamic(dynamic)
+        for modifier in _modifiers:
+            code = MODIFIER_CODES.get(modifier, modifier)
+            mask |= 1 << code
+            ticks *= Fraction(DOT_CODES.get(code, 1))
+
+        self.append_note(int(ticks), sticking, dynamic, mask)
+
+    def set_duration(self, *new_durations):
+        ''' Adjust the undotted duration of all notes in the Rhythm '''
+        dur_list = [*new_durations]
+
+        if len(dur_list) > len(self):
+            raise Exception(f"{len(dur_list)} duration values passed, only {len(self)} Notes in Rhythm object")
+        
+        while len(dur_list) < len(self):
+            dur_list.append(dur_list[-1])
+        
+        for i, new in enumerate(dur_list):
+            if not new: continue
+            ticks = Fraction(duration_to_ticks(new))
+            for code in mask_codes(self.modifier_masks[i]):
+                ticks *= Fraction(DOT_CODES.get(code, 1))
+            self.ticks[i] = int(ticks)
+
+    def set_sticking(self, new_sticking):
+        ''' Change the sticking of each note, "_" keeps the current value '''
+
+        for i, new in zip(range(len(self)), new_sticking):
+            if new == '_': continue
+            self.sticking_codes[i] = STICKING[new]
+
+    def add_modulator(self, modifier, position=None, name=None):
+        ''' Add modulator by modifier name or code '''
+
+        code = MODIFIER_CODES.get(modifier, modifier)
+        self.modulators[name if name != None else MODIFIER_NAMES[code]] = (code, None if position == None else position % len(self))
+
+    def get_modulator_moves(self, direction='forward', name=None):
+        ''' Current and next Note position of each modulator without moving them
+            Returns list of (name, position, new_position), position is None if not on a Note '''
+
+        moves = []
+        for name in ([*self.modulators] if not name else [name]):
+
+            _, position = self.modulators[name]
+
+            # Send in specified direction
+            if direction == 'forward':
+                new_position = position + 1 if position != None else 0
+            elif direction == 'backward':
+                new_position = position - 1 if position != None else -1
+            else:
+                raise Exception(f"position only accepts 'forward' or 'backward', value {direction} passed")
+
+            moves.append((name, position, new_position % len(self)))
+
+        return moves
+
+    def modulate(self, direction='forward', name=None):
+        ''' Move modulator forward or backward '''
+
+        for name, _, new_position in self.get_modulator_moves(direction, name):
+            self.set_modulator_position(new_position, name)
+
+    def modulated(self, direction='forward', name=None):
+        ''' Modulate a copy of the Rhythm, leaving this one unchanged '''
+
+        rhythm = self.copy()
+        rhythm.modulate(direction, name)
+        return rhythm
+
+    def set_modulator_position(self, position, name=None):
+        ''' Move modulators to the Note at position '''
+
+        for name in ([*self.modulators] if not name else [name]):
+            self.modulators[name] = (self.modulators[name][0], position % len(self))
+
+    def copy(self):
+        ''' Independent copy, arrays are copied in one step each '''
+
+        rhythm = CompactRhythm(self.default_duration)
+        rhythm.ticks = array('l', self.ticks)
+        rhythm.sticking_codes = array('b', self.sticking_codes)
+        rhythm.dynamics = array('b', self.dynamics)
+        rhythm.modifier_masks = array('l', self.modifier_masks)
+        rhythm.modulators = {**self.modulators}
+        return rhythm
+
+    #########################################
+    #               Conversion              #
+    #########################################
+
+    def to_dict(self):
+        ''' Plain dict for JSON and other non music21 formats '''
+        return {'default_duration': self.default_duration,
+                'ticks': [*self.ticks],
+                'sticking': self.sticking,
+                'dynamics': [*self.dynamics],
+                'modifier_masks': [*self.modifier_masks],
+                'modulators': {name: [*modulator] for name, modulator in self.modulators.items()}}
+
+    @classmethod
+    def from_dict(cls, values):
+        rhythm = cls(values['default_duration'])
+        for ticks, sticking, dynamic, mask in zip(values['ticks'], values['sticking'], values['dynamics'], values['modifier_masks']):
+            rhythm.append_note(ticks, sticking, dynamic, mask)
+        rhythm.modulators = {name: tuple(modulator) for name, modulator in values['modulators'].items()}
+        return rhythm
+
+    @classmethod
+    def from_rhythm(cls, rhythm):
+        ''' Build from a Rhythm, reads every Note once '''
+
+        compact = cls(rhythm._default_duration)
+
+        for note in rhythm._notes:
+            mask = 0
+            for modifier in note.modifiers:
+                if not modifier.modulator: mask |= 1 << modifier.code
+            compact.append_note(duration_to_ticks(note.get_duration()), note.sticking, note._dynamic_default, mask)
+
+        for name, modulator in rhythm.modulators.items():
+            compact.modulators[name] = (modulator.code, rhythm.get_modulator_position(name))
+
+        return compact
+
+    def to_rhythm(self):
+        ''' Build the music21 backed Rhythm and Note objects '''
+
+        try:
+            from .Rhythms import Rhythm, Note
+            from .Modifiers import MODIFIER_CLASSES
+        except ImportError:
+            from Rhythms import Rhythm, Note
+            from Modifiers import MODIFIER_CLASSES
+
+        rhythm = Rhythm(self.default_duration)
+
+        for ticks, sticking, dynamic, mask in zip(self.ticks, self.sticking_codes, self.dynamics, self.modifier_masks):
+
+            codes = mask_codes(mask)
+
+            # Dots are rebuilt from the undotted duration
+            dotted = False
+            duration = Fraction(ticks)
+            for code, multiplier in DOT_CODES.items():
+                if code in codes:
+                    codes.remove(code)
+                    duration /= Fraction(multiplier)
+                    dotted = 'single' if multiplier == DURATION_MULTIPLIERS['dot'] else 'double'
+
+            rhythm.add(Note(float(ticks_to_duration(duration)), STICKING_NAMES[sticking],
+                            [MODIFIER_CLASSES[code]() for code in codes], dynamic, dotted))
+
+        for name, (code, position) in self.modulators.items():
+            rhythm.add_modulator(MODIFIER_CLASSES[code](), position, name)
+
+        return rhythm
+
+
+class CompactMultiRhythm:
+    ''' Columnar version of a MultiRhythm, picklable and independent of music21
+
+        Attributes
+            default_rhythm: CompactRhythm of the seed rhythm
+            actions: MultiRhythm.actions, enough to rebuild with to_multi_rhythm
+            rhythms: CompactRhythm for every rhythm, copies of one state are the same object '''
+
+    def __init__(self, default_rhythm, actions=None, rhythms=None):
+
+        self.default_rhythm = default_rhythm
+        self.actions = [] if actions == None else actions
+        self.rhythms = [default_rhythm] if rhythms == None else rhythms
+        self.current_rhythm = self.rhythms[-1]
+
+    def __repr__(self):
+        return f"CompactMultiRhythm(default_rhythm={self.default_rhythm}, rhythms={len(self.rhythms)})"
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactMultiRhythm): return NotImplemented
+        return self.default_rhythm == other.default_rhythm and self.actions == other.actions and self.rhythms == other.rhythms
+
+    @classmethod
+    def replay(cls, rhythm, actions):
+        ''' Build a new CompactMultiRhythm by repeating recorded actions on a CompactRhythm '''
+
+        multi_rhythm = cls(rhythm)
+        for name, call in actions:
+            getattr(multi_rhythm, name)(**dict(call))
+
+        return multi_rhythm
+
+    @action
+    def copy(self, copies=1, _save_action=True):
+        ''' Duplicate rhythm in current state, copies share one CompactRhythm '''
+
+        self.rhythms.extend([self.current_rhythm] * copies)
+
+        if _save_action:
+            return (('copies', copies), ('_save_action', _save_action))
+
+    @action
+    def modulate(self, direction='forward', name=None, copies=1, _save_action=True):
+        ''' Modulate and create add copies to object '''
+
+        self.current_rhythm = self.current_rhythm.modulated(direction, name)
+        self.copy(copies, _save_action=False)
+
+        if _save_action:
+            return (('direction', direction), ('name', name), ('copies', copies), ('_save_action', _save_action))
+
+    def apply_actions(self, actions):
+        ''' Add the rhythms of copy and modulate actions in one pass
+            Modulator positions for the whole plan are worked out first, each state is built once from
+            the current rhythm, same result as calling the actions one by one '''
+
+        steps, counts = get_plan(actions)
+        rhythm = self.current_rhythm
+        names = [*rhythm.modulators]
+        states = get_modulator_states([(name, rhythm.modulators[name][1]) for name in names], len(rhythm), steps)
+
+        self.rhythms.extend([rhythm] * counts[0])
+        for state, count in zip(states, counts[1:]):
+            rhythm = self.current_rhythm.copy()
+            for name, (position, _) in zip(names, state):
+                rhythm.modulators[name] = (rhythm.modulators[name][0], position)
+            self.rhythms.extend([rhythm] * count)
+
+        self.current_rhythm = rhythm
+        self.actions.extend(actions)
+
+    def to_dict(self):
+        ''' Plain dict for JSON and other non music21 formats, copies of one state are stored once '''
+
+        states = {}
+        for rhythm in self.rhythms:
+            states.setdefault(id(rhythm), (len(states), rhythm))
+
+        return {'default_rhythm': self.default_rhythm.to_dict(),
+                'actions': [[name, [[*param] for param in call]] for name, call in self.actions],
+                'states': [rhythm.to_dict() for _, rhythm in states.values()],
+                'rhythms': [states[id(rhythm)][0] for rhythm in self.rhythms]}
+
+    @classmethod
+    def from_dict(cls, values):
+        states = [CompactRhythm.from_dict(state) for state in values['states']]
+        actions = [(name, tuple(tuple(param) for param in call)) for name, call in values['actions']]
+        return cls(CompactRhythm.from_dict(values['default_rhythm']), actions, [states[i] for i in values['rhythms']])
+
+    @classmethod
+    def from_multi_rhythm(cls, multi_rhythm):
+        ''' Build from a MultiRhythm, shared rhythms are converted once '''
+
+        converted = {}
+        rhythms = []
+        for rhythm in multi_rhythm.rhythms:
+            if id(rhythm) not in converted:
+                converted[id(rhythm)] = (rhythm, CompactRhythm.from_rhythm(rhythm))
+            rhythms.append(converted[id(rhythm)][1])
+
+        return cls(CompactRhythm.from_rhythm(multi_rhythm.default_rhythm), [*multi_rhythm.actions], rhythms)
+
+    def to_multi_rhythm(self, **kwargs):
+        ''' Rebuild the MultiRhythm by replaying actions on the seed rhythm, kwargs are passed to MultiRhythm '''
+
+        try:
+            from .MultiRhythms import MultiRhythm
+        except ImportError:
+            from MultiRhythms import MultiRhythm
+
+        return MultiRhythm.replay(self.default_rhythm.to_rhythm(), self.actions, **kwargs)
+
+
+def iter_compact(source):
+    ''' Yield a CompactRhythm for every rhythm in a Rhythm, MultiRhythm or their compact versions
+        Rhythms are converted as they are reached, repeated copies of a shared rhythm are converted once '''
+
+    if isinstance(source, CompactRhythm):
+        yield source
+        return
+
+    rhythms = source.rhythms if hasattr(source, 'rhythms') else [source]
+
+    last, compact = None, None
+    for rhythm in rhythms:
+        if rhythm is not last:
+            last, compact = rhythm, rhythm if isinstance(rhythm, CompactRhythm) else CompactRhythm.from_rhythm(rhythm)
+        yield compact
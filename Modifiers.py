@@ -1,16 +1,49 @@
 from copy import deepcopy
 import music21 as m21
-from utils import define_dynamic
+from durations import intern_duration
+from utils import define_dynamic, DURATION_MULTIPLIERS, MODIFIER_CODES, MODIFIER_DYNAMICS
 
-class Modifier:
+class BaseModifier:
+    ''' Defining interaction attributes for Note objects 
+        Should not be instantiated directly as some methods are set to feed
+        into child classes'''
+
+    shared = False # Set on flyweight instances used by many Notes
+    _note = None # music21 based modifiers do not run __init__ below, they are on no Note until added
+
+    def __init__(self):
+        
+        self.modulator = False
+        self._note = None
+
+    def add(self, note):
+        note.modifiers.append(self)
+        self._note = note
+
+    def remove(self):
+        note = self._note
+        self._note = None
+        if note == None: return 0, None
+
+        for i, mod in enumerate(note.modifiers):
+            if mod is self:
+                note.modifiers.pop(i)
+                return i, note
+        else:
+            return 0, None
+
+class Modifier(BaseModifier):
     ''' A notation object that modifies a note 
         Values of 0 passed to parameter indicate no modification '''
 
     name = 'Modifier'
     modifier_type = 'Parent'
+    code = None # Key in utils.MODIFIER_CODES
 
     def __init__(self, location, duration=0, dynamic=0, note=None):
 
+        super().__init__()
+
         self.location = location # Placement around Note
         self.duration = duration
         self.dynamic = define_dynamic(dynamic)
@@ -22,33 +55,92 @@ class Modifier:
         self.modulator = False
 
     def __repr__(self):
-        att_vals = [f"{att}={val}, " for att, val in self.__dict__.items() if val]
+        att_vals = [f"{att}={val}, " for att, val in self.__dict__.items() if val and att not in ['_key', 'shared']]
         return f"{self.name}({''.join(att_vals)})"
 
+    def add(self, note):
+        super().add(note)
+        note.apply_modifiers()
 
-class BaseModifier:
-    ''' Defining interaction attributes for Note objects 
-        Should not be instantiated directly as some methods are set to feed
-        into child classes'''
-    def __init__(self):
-        
-        self.modulator = False
-        self._note = None
+    def move(self, new_note):
+        self.remove()
+        self.add(new_note)
+
+    def remove(self):
+        i, note = super().remove()
+        if note != None: note.apply_modifiers()
+        return i, note
+
+
+class Shared(type):
+    ''' Metaclass of modifiers without per Note state
+        Calling the class returns one shared instance per set of arguments,
+        use the new class method for an instance of its own '''
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        instance = cls._instances.get((args, tuple(sorted(kwargs.items()))))
+        if instance == None:
+            instance = cls.new(*args, **kwargs)
+            object.__setattr__(instance, 'shared', True)
+            cls._instances[instance._key] = instance
+        return instance
+
+    def new(cls, *args, **kwargs):
+        ''' Instance that is not shared, needed to mark a modifier as a modulator '''
+        instance = super().__call__(*args, **kwargs)
+        instance._key = (args, tuple(sorted(kwargs.items())))
+        return instance
+
+def get_shared(cls, args, kwargs):
+    ''' Unpickle a shared modifier as the instance of this process '''
+    return cls(*args, **dict(kwargs))
+
+class SharedModifier(Modifier, metaclass=Shared):
+    ''' Flyweight Modifier, one immutable instance is put on every Note that uses it
+        The instance does not know its Notes, so it can only be removed through Note.remove_modifier '''
+
+    # Shared instances are frozen once the metaclass marks them, a change would reach every Note
+    def __setattr__(self, name, value):
+        if self.shared: raise AttributeError(f"{self.name} is shared between Notes, use unshared() for a copy that can be changed")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if self.shared: raise AttributeError(f"{self.name} is shared between Notes, use unshared() for a copy that can be changed")
+        super().__delattr__(name)
+
+    def __copy__(self):
+        if self.shared: return self
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+    def __deepcopy__(self, memo):
+        if self.shared: return self
+        clone = memo[id(self)] = object.__new__(type(self))
+        clone.__dict__.update({att: deepcopy(val, memo) for att, val in self.__dict__.items()})
+        return clone
+
+    def __reduce_ex__(self, protocol):
+        if self.shared: return (get_shared, (type(self), *self._key))
+        return super().__reduce_ex__(protocol)
+
+    def unshared(self):
+        ''' Copy that is not shared and can be changed or used as a modulator '''
+        return type(self).new(*self._key[0], **dict(self._key[1]))
 
     def add(self, note):
+        if not self.shared: return super().add(note)
         note.modifiers.append(self)
-        self._note = note
+        note.apply_modifiers()
 
     def remove(self):
-        note = self._note
-        self._note = None
+        if self.shared: raise Exception(f"{self.name} is shared between Notes, remove it with Note.remove_modifier")
+        return super().remove()
 
-        for i, mod in enumerate(note.modifiers):
-            if mod is self:
-                note.modifiers.pop(i)
-                return i, note
-        else:
-            return 0, None
 
 ###############################################################################
 #                                                                             #
@@ -63,10 +155,12 @@ class Dot(Modifier):
 
     name = 'Dot'
     modifier_type = 'duration'
+    code = MODIFIER_CODES['dot']
+    multiplier = DURATION_MULTIPLIERS['dot']
 
     def __init__(self, note):
         super().__init__(location='right', note=note)
-        self.duration = self._note.duration * 1.5
+        self.duration = intern_duration(self._note.get_duration(), self.multiplier).duration
 
 class DoubleDot(Modifier):
     ''' Make a Note double dotted
@@ -75,10 +169,12 @@ class DoubleDot(Modifier):
 
     name = 'DoubleDot'
     modifier_type = 'duration'
+    code = MODIFIER_CODES['double_dot']
+    multiplier = DURATION_MULTIPLIERS['double_dot']
 
     def __init__(self, note):
         super().__init__(location='right', note=note)
-        self.duration = self._note.duration * 1.75
+        self.duration = intern_duration(self._note.get_duration(), self.multiplier).duration
 
 ###############################################################################
 #                                                                             #
@@ -112,12 +208,15 @@ class Articulation(BaseModifier):
 
     def remove(self):
         i, note = super().remove()
-        return note.articulations.pop(i)
+        if note != None:
+            note.articulations = [art for art in note.articulations if art is not self]
+        return i, note
 
 class Accent(m21.articulations.Accent, Articulation):
 
     name = 'Accent'
     modifier_type = 'articulation'
+    code = MODIFIER_CODES['accent']
 
     def __init__(self, modulator=False, location='above'):
         super().__init__()
@@ -131,8 +230,9 @@ class Marcato(Modifier):
 
     name = 'Marcato'
     modifier_type = 'articulation'
+    code = MODIFIER_CODES['marcato']
 
-    def __init__(self, location: str='top', dynamic=15):
+    def __init__(self, location: str='top', dynamic=MODIFIER_DYNAMICS['marcato']):
         super().__init__(location=location, dynamic=dynamic)
 
 class Staccato(Modifier):
@@ -140,16 +240,18 @@ class Staccato(Modifier):
         variation since note duration is not a concern '''
     name = 'Staccato'
     modifier_type = 'articulation'
+    code = MODIFIER_CODES['staccato']
 
-    def __init__(self, location: str='top', dynamic=6):
+    def __init__(self, location: str='top', dynamic=MODIFIER_DYNAMICS['staccato']):
         super().__init__(location=location, dynamic=dynamic)
 
 class Tenuto(Modifier):
 
     name = 'Tenuto'
     modifier_type = 'articulation'
+    code = MODIFIER_CODES['tenuto']
 
-    def __init__(self, location: str='top', dynamic=9):
+    def __init__(self, location: str='top', dynamic=MODIFIER_DYNAMICS['tenuto']):
         super().__init__(location=location, dynamic=dynamic)
 
 ###############################################################################
@@ -158,18 +260,20 @@ class Tenuto(Modifier):
 #                                                                             #
 ###############################################################################
 
-class Diddle(Modifier):
+class Diddle(SharedModifier):
 
     name = 'Diddle'
     modifier_type = 'tremolo'
+    code = MODIFIER_CODES['diddle']
 
     def __init__(self, location: str='stem'):
         super().__init__(location=location)
 
-class Buzz(Modifier):
+class Buzz(SharedModifier):
 
     name = 'Buzz'
     modifier_type = 'tremolo'
+    code = MODIFIER_CODES['buzz']
 
     def __init__(self, location: str='stem'):
         super().__init__(location=location)
@@ -180,26 +284,29 @@ class Buzz(Modifier):
 #                                                                             #
 ###############################################################################
 
-class Flam(Modifier):
+class Flam(SharedModifier):
 
     name = 'Flam'
     modifier_type = 'grace note'
+    code = MODIFIER_CODES['flam']
 
     def __init__(self, location: str='left'):
         super().__init__(location=location)
 
-class Drag(Modifier):
+class Drag(SharedModifier):
 
     name = 'Drag'
     modifier_type = 'grace note'
+    code = MODIFIER_CODES['drag']
 
     def __init__(self, location: str='left'):
         super().__init__(location=location)
 
-class ThreeStrokeDrag(Modifier):
+class ThreeStrokeDrag(SharedModifier):
 
     name = 'ThreeStrokeDrag'
     modifier_type = 'grace note'
+    code = MODIFIER_CODES['three_stroke']
 
     def __init__(self, location: str='left'):
         super().__init__(location=location)
@@ -236,4 +343,11 @@ class RepeatBar(Modifier):
     modifier_type = 'repeat and jump'
 
     def __init__(self):
-        super().__init__(location='center')
\ No newline at end of file
+        super().__init__(location='center')
+
+
+# Modifier classes that can be placed on a Note, keyed by code
+MODIFIER_CLASSES = {cls.code: cls for cls in [Accent, Marcato, Tenuto, Staccato, 
+                                              Diddle, Buzz, 
+                                              Flam, Drag, ThreeStrokeDrag, 
+                                              Dot, DoubleDot]}
@@ -1,5 +1,7 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
 from copy import deepcopy
-import functools
 
 import music21 as m21
 
@@ -7,34 +9,46 @@ try:
     from .Classes import *
     from .Rhythms import *
     from .Modifiers import *
+    from .utils import action, get_modulator_states, get_plan
+    from .core import fill_16th_note_grid
 except:
     from Classes import *
     from Rhythms import *
     from Modifiers import *
-
-def action(func):
-    ''' Record function calls and parameters used to build up MultiRhythm object '''
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-       
-        call = func(*args, **kwargs)
-
-        if kwargs.get('_save_action') != False:
-            args[0].actions.append((func.__name__, call))
-
-    return wrapper
+    from utils import action, get_modulator_states, get_plan
+    from core import fill_16th_note_grid
 
 class MultiRhythm(m21.stream.Stream):
-    ''' Controller class for duplicating and modulating rhythms '''
+    ''' Controller class for duplicating and modulating rhythms 
+    
+        Parameters
+            rhythm: Rhythm
+                starting rhythm, it is not changed by modulation
+            copy_on_write: bool
+                copies share Note and Modifier objects, only Notes touched by a modulation are copied
+                consecutive copies are the same Rhythm object, use detach before editing one in place 
+            lazy: bool
+                only record actions, rhythms are rebuilt from the seed rhythm and actions when indexed or iterated
+                rhythms are shared like copy_on_write, current_rhythm is rebuilt from the plan when it is read
+            cache_size: int
+                how many rebuilt rhythms a lazy MultiRhythm keeps, 0 disables the cache '''
 
-    def __init__(self, rhythm=None):
+    def __init__(self, rhythm=None, copy_on_write=False, lazy=False, cache_size=8):
 
         super().__init__()
 
         if rhythm == None: raise TypeError("__init__() missing 1 required positional argument: 'rhythm'")
         self.default_rhythm = rhythm
-        self.current_rhythm = deepcopy(rhythm)
-        self.rhythms = [self.current_rhythm]
+        self.copy_on_write = copy_on_write
+        self.lazy = lazy
+        if lazy:
+            self.rhythms = LazyRhythms(self, cache_size)
+        elif copy_on_write:
+            self.current_rhythm = rhythm
+            self.rhythms = [rhythm]
+        else:
+            self.current_rhythm = deepcopy(rhythm)
+            self.rhythms = [deepcopy(rhythm)]
 
         # Store all actions taken to repeat them later
         self.actions = []
@@ -42,6 +56,26 @@ class MultiRhythm(m21.stream.Stream):
     def __repr__(self):
         return f"MultiRhythm(default_rhythm={self.default_rhythm})"
 
+    @classmethod
+    def replay(cls, rhythm, actions, **kwargs):
+        ''' Build a new MultiRhythm by repeating recorded actions on a rhythm
+            kwargs are passed to MultiRhythm, use lazy=True to only record the plan '''
+
+        multi_rhythm = cls(rhythm, **kwargs)
+        for name, call in actions:
+            getattr(multi_rhythm, name)(**dict(call))
+
+        return multi_rhythm
+
+    @property
+    def current_rhythm(self):
+        ''' Rhythm the next copy or modulate starts from, a lazy MultiRhythm rebuilds its last rhythm '''
+        return self.rhythms[-1] if self.lazy else self._current_rhythm
+
+    @current_rhythm.setter
+    def current_rhythm(self, rhythm):
+        self._current_rhythm = rhythm
+
     @property
     def notes(self):
         return [note for rhythm in self.rhythms for note in rhythm.notes]
@@ -57,8 +91,13 @@ class MultiRhythm(m21.stream.Stream):
                     record this in the actions attribute for rebuilding
                     for internal usage when this function is called within another function '''
 
-        for i in range(copies):
-            self.rhythms.append(deepcopy(self.current_rhythm))
+        if self.lazy:
+            pass # LazyRhythms replays self.actions
+        elif self.copy_on_write:
+            self.rhythms.extend([self.current_rhythm] * copies)
+        else:
+            for i in range(copies):
+                self.rhythms.append(deepcopy(self.current_rhythm))
 
         if _save_action:
             return (('copies', copies), ('_save_action', _save_action))
@@ -67,12 +106,182 @@ class MultiRhythm(m21.stream.Stream):
     def modulate(self, direction='forward', name=None, copies=1, _save_action=True):
         ''' Modulate and create add copies to object '''
         
-        self.current_rhythm.modulate(direction, name)
-        self.copy(copies, _save_action=False)
+        if self.lazy:
+            # LazyRhythms replays self.actions, arguments are checked before they are recorded
+            if direction not in ['forward', 'backward']:
+                raise Exception(f"position only accepts 'forward' or 'backward', value {direction} passed")
+            if name and name not in self.default_rhythm.modulators:
+                raise KeyError(name)
+        elif self.copy_on_write:
+            self.current_rhythm = self.current_rhythm.modulated(direction, name)
+            self.copy(copies, _save_action=False)
+        else:
+            self.current_rhythm.modulate(direction, name)
+            self.copy(copies, _save_action=False)
 
         if _save_action:
             return (('direction', direction), ('name', name), ('copies', copies), ('_save_action', _save_action))
 
+    def apply_actions(self, actions):
+        ''' Add the rhythms of copy and modulate actions without modulating step by step
+
+            Modulator positions for the whole plan are worked out first, then each state is shared from
+            the current rhythm with its modulators put straight on their Notes. Moved modulators are put
+            in the order they last moved, so every Note ends up as calling the actions one by one would
+            leave it '''
+
+        if self.lazy:
+            self.actions.extend(actions)
+            return
+
+        base = self.current_rhythm
+        steps, counts = get_plan(actions)
+        names, starts, states = get_states(base, steps)
+
+        rhythm, rhythms = base, [base] * counts[0]
+        for state, count in zip(states, counts[1:]):
+            rhythm = place_modulators(base, names, starts, state)
+            rhythms.extend([rhythm] * count)
+
+        if self.copy_on_write:
+            self.rhythms.extend(rhythms)
+            self.current_rhythm = rhythm
+        else:
+            # Eager rhythms own their Notes, sharing them is what copy_on_write does
+            self.rhythms.extend([deepcopy(copy) for copy in rhythms])
+            if rhythm is not base: self.current_rhythm = deepcopy(rhythm)
+
+        self.actions.extend(actions)
+
+    def detach(self, index):
+        ''' Replace a shared copy with its own deep copy so it can be edited in place
+            A lazy MultiRhythm keeps the copy in place of the rhythm it would rebuild at index '''
+        self.rhythms[index] = deepcopy(self.rhythms[index])
+        return self.rhythms[index]
+
+
+def get_states(base, steps):
+    ''' (modulator names, positions in base, get_modulator_states) of modulation steps from base '''
+
+    names = [*base.modulators]
+    starts = [base.get_modulator_position(name) for name in names]
+    return names, starts, get_modulator_states([*zip(names, starts)], len(base._notes), steps)
+
+def place_modulators(base, names, starts, state):
+    ''' Share base with its modulators moved to a state of get_modulator_states
+        Moved modulators are put in the order they last moved, as modulating step by step would leave them '''
+
+    moved = sorted([(last, i, position) for i, (position, last) in enumerate(state) if last != None])
+    rhythm = base.share(*[starts[i] for _, i, _ in moved if starts[i] != None], *[position for *_, position in moved])
+    for _, i, position in moved:
+        # Modulators not on a Note are not copied by share, every state would move the same one
+        if starts[i] == None: rhythm.modulators[names[i]] = deepcopy(base.modulators[names[i]])
+        rhythm.set_modulator_position(position, names[i])
+
+    return rhythm
+
+
+class LazyRhythms(Sequence):
+    ''' Rhythms of a lazy MultiRhythm, rebuilt from the seed rhythm and the actions log
+        Indexing builds a state straight from the seed, see place_modulators, iterating applies each
+        modulation to a shared copy of the previous state, see Rhythm.modulated
+        Copies of one state are the same Rhythm object '''
+
+    def __init__(self, multi_rhythm, cache_size=8):
+
+        self.multi_rhythm = multi_rhythm
+        self.cache_size = cache_size
+        self._cache = OrderedDict() # state: Rhythm, least recently used first
+
+        # Plan compiled from multi_rhythm.actions
+        # State 0 is the seed rhythm, every modulate action starts a new state
+        self._steps = [None] # (direction, name) leading into each state
+        self._ends = [1] # number of rhythms up to and including each state
+        self._compiled = 0 # actions already compiled
+        self._states = ([], [], []) # get_states of the compiled steps, see _materialize
+        self._detached = {} # index: Rhythm set by MultiRhythm.detach, returned instead of the rebuilt rhythm
+
+    def __repr__(self):
+        return f"LazyRhythms(rhythms={len(self)}, cached={[*self._cache]})"
+
+    def __len__(self):
+        self._compile()
+        return self._ends[-1]
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        length = len(self)
+        if index < 0: index += length
+        if not 0 <= index < length: raise IndexError('rhythm index out of range')
+
+        if index in self._detached: return self._detached[index]
+        return self._materialize(bisect_right(self._ends, index))
+
+    def __setitem__(self, index, rhythm):
+        ''' Keep a rhythm in place of the one rebuilt at index, see MultiRhythm.detach '''
+
+        length = len(self)
+        if index < 0: index += length
+        if not 0 <= index < length: raise IndexError('rhythm index out of range')
+
+        self._detached[index] = rhythm
+
+    def __iter__(self):
+        ''' Stream rhythms in order, one modulation per state '''
+
+        self._compile()
+        rhythm, index = self.multi_rhythm.default_rhythm, 0
+        for state, step in enumerate(self._steps):
+            if state:
+                rhythm = self._cache[state] if state in self._cache else rhythm.modulated(*step)
+                self._store(state, rhythm)
+            for i in range(self._ends[state] - (self._ends[state - 1] if state else 0)):
+                yield self._detached.get(index, rhythm)
+                index += 1
+
+    def _compile(self):
+        ''' Extend the plan with actions recorded since the last call '''
+
+        actions = self.multi_rhythm.actions
+        for name, call in actions[self._compiled:]:
+            params = dict(call)
+            if name == 'modulate':
+                self._steps.append((params.get('direction', 'forward'), params.get('name')))
+                self._ends.append(self._ends[-1] + params.get('copies', 1))
+            elif name == 'copy':
+                self._ends[-1] += params.get('copies', 1)
+        self._compiled = len(actions)
+
+    def _materialize(self, state):
+        ''' Get the rhythm for a state, built straight from the seed rhythm with its modulators placed '''
+
+        if state in self._cache:
+            self._cache.move_to_end(state)
+            return self._cache[state]
+
+        seed = self.multi_rhythm.default_rhythm
+        rhythm = seed
+        if state:
+            # No earlier state is needed, the plan gives every modulator's position
+            if len(self._states[2]) != len(self._steps) - 1:
+                self._states = get_states(seed, self._steps[1:])
+            rhythm = place_modulators(seed, *self._states[:2], self._states[2][state - 1])
+
+        self._store(state, rhythm)
+        return rhythm
+
+    def _store(self, state, rhythm):
+
+        if not self.cache_size: return
+
+        self._cache[state] = rhythm
+        self._cache.move_to_end(state)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
 ###############################################################################
 #                                                                             #
 #                                                                             #
@@ -81,7 +290,7 @@ class MultiRhythm(m21.stream.Stream):
 #                                                                             #
 ###############################################################################
 
-def make_16th_note_grid(rhythm=None):
+def make_16th_note_grid(rhythm=None, copy_on_write=False, lazy=False, closed_form=False):
 
     # Define default rhythm and modulator
     if not rhythm:
@@ -92,9 +301,7 @@ def make_16th_note_grid(rhythm=None):
         rhythm.add_note('L')
         rhythm.add_modulator(Accent(), 0, 'accent')
 
-    mr = MultiRhythm(rhythm)
-    mr.copy(3) # Fill out first bar
-    [mr.modulate(copies=int(dur)) for dur in '4'*3 + '2'*4 + '1'*4]
+    mr = MultiRhythm(rhythm, copy_on_write, lazy)
 
-    return mr
+    return fill_16th_note_grid(mr, closed_form)
         
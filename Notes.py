@@ -1,50 +1,75 @@
+from fractions import Fraction
+
 import music21 as m21
 
 try:
     from .Classes import *
     from .Rhythms import *
     from .Modifiers import *
+    from .durations import intern_duration
+    from .musicxml import note_musicxml
+    from .utils import duration_to_ticks
 except:
     from Classes import *
     from Rhythms import *
     from Modifiers import *
+    from durations import intern_duration
+    from musicxml import note_musicxml
+    from utils import duration_to_ticks
+
+# Places around a Note a Modifier can be drawn, see Modifier.location
+LOCATIONS = ('head', 'stem', 'tail', 'top', 'bottom', 'left', 'right')
+
+def location_property(location):
+    ''' Modifiers drawn at a location, an empty tuple until one is added '''
+
+    def getter(note):
+        return note._locations.get(location, ()) if note._locations else ()
+
+    def setter(note, modifiers):
+        if note._locations == None: note._locations = {}
+        note._locations[location] = modifiers
+
+    return property(getter, setter, doc=f"Modifiers drawn at the {location} of the Note")
+
 
 class Note(m21.note.Note):
 
-    def __init__(self, duration: float=0, sticking: str='R', modifiers: list=None, dynamic=3, dotted=False):
+    # Visual attributes for displaying modifiers, {location: [Modifier]}
+    # Set on a Note when a modifier is placed, most Notes read this default and never set it
+    _locations = None
+
+    head = location_property('head')
+    stem = location_property('stem')
+    tail = location_property('tail')
+    top = location_property('top')
+    bottom = location_property('bottom')
+    left = location_property('left')
+    right = location_property('right')
 
-        super().__init__()
+    # Note objects to connect tail to
+    stem_connection_left = None
+    stem_connection_right = None
+
+    stem_direction = 'up' #one of [up, down, none, double]
+
+    def __init__(self, duration: float=0, sticking: str='R', modifiers: list=None, dynamic=3, dotted=False):
 
         # Base properties
-        self._duration = m21.duration.Duration(duration * 4) # Space taken up by rhythm, eigth note would be .125
-        self._duration_default = deepcopy(self._duration)
+        self._duration_default = intern_duration(duration) # Space taken up by rhythm, eigth note would be .125, shared between Notes
+        super().__init__(duration=self._duration_default.to_m21())
         self.sticking = sticking # R or L
         self._sticking_default = sticking
         self.dynamic = define_dynamic(dynamic) # dynamics dict or 1-15
         self._dynamic_default = self.dynamic
 
-        # Visual attributes for displaying modifiers
-        self.head = 0
-        self.stem = 0
-        self.tail = 0
-        self.top = []
-        self.bottom = []
-        self.left = []
-        self.right = []
-
-        # Note objects to connect tail to
-        self.stem_connection_left = None
-        self.stem_connection_right = None
-
-        self.stem_direction = 'up' #one of [up, down, none, double]
-
         # Modifier objects to change base properties
-        self.modifiers = [] if modifiers == None else modifiers
+        self.modifiers = []
+        self.add_modifiers(*([] if modifiers == None else modifiers))
         if dotted in [True, 'single']: 
-            self.modifiers.append(Dot(self))
+            self.add_modifier(Dot(self))
         elif dotted == 'double': 
-            self.modifiers.append(DoubleDot(self))
-        self.apply_modifiers()
+            self.add_modifier(DoubleDot(self))
 
     def __repr__(self):
         mod_names = [(modifier.name, modifier.modulator) for modifier in self.modifiers]
@@ -72,44 +97,65 @@ class Note(m21.note.Note):
     
     def apply_modifiers(self):
         
+        self.reset_locations()
+
+        # Start from the unmodified values so a removed modifier leaves nothing behind
+        self.dynamic = self._dynamic_default
+        if self.duration.quarterLength != self._duration_default.quarter_length:
+            self.duration = self._duration_default.to_m21()
+
         for modifier in self.modifiers:
             
-            modifier._note = self
+            # Shared modifiers are on many Notes and do not track them
+            if not modifier.shared: modifier._note = self
+
+            # music21 articulations are tracked in self.articulations
+            if not isinstance(modifier, Modifier): continue
 
             # Apply modified values
-            [setattr(self, att, val) for att, val in modifier.__dict__.items() if hasattr(self, att) and val]
+            if modifier.dynamic:
+                self.dynamic = modifier.dynamic
+            if modifier.duration:
+                self.duration = intern_duration(modifier.duration).to_m21()
 
             # Attach to location
-            loc = getattr(self, modifier.location)
-            if loc != modifier: 
-                loc.append(modifier)
-            setattr(self, modifier.location, loc)
+            if modifier.location in LOCATIONS:
+                self.add_to_location(modifier.location, modifier)
 
     def get_modifier_names(self):
         return [mod.name for mod in self.modifiers]
 
     def remove_modifier(self, name):
-        ''' Remove modifier and reset values '''
-        
-        # Remove modifier from Note
-        for i, modifier in enumerate(self.modifiers):
-            if modifier.name == name:
-                break
-        removed_modifier = self.modifiers.pop(i)
-        # removed_modifier._note = None
-        
-        # Reset modified values in Note
-        # for att, val in modifier.__dict__.items():
-        #     if hasattr(self, att) and val:
-        #         setattr(self, att, self.__dict__[f"_{att}_default"])
+        ''' Remove the first modifier called name, values and locations are reset from the modifiers left '''
 
-        # Remove from location
-        # self.reset_locations()
+        modifier = next((mod for mod in self.modifiers if mod.name == name), None)
+        if modifier == None: raise Exception(f"No {name} modifier on {self}")
 
-        # Reapply modifiers in case another modifier of the same type exists
-        # self.apply_modifiers()
+        self.pop_modifier(modifier)
+        return modifier
+
+    def pop_modifier(self, modifier, index=None):
+        ''' Take a modifier object off the Note, index picks which one when a shared modifier is on it more than once
+            Returns (index in modifiers, index in articulations or None) to put it back with insert_modifier '''
+
+        if index == None: index = next((i for i, mod in enumerate(self.modifiers) if mod is modifier), None)
+        if index == None or self.modifiers[index] is not modifier: raise Exception(f"{modifier} is not on {self}")
+        self.modifiers.pop(index)
+
+        articulation_index = next((i for i, art in enumerate(self.articulations) if art is modifier), None)
+        if articulation_index != None: self.articulations.pop(articulation_index)
+
+        if not modifier.shared: modifier._note = None
+        self.apply_modifiers()
 
-        return removed_modifier
+        return index, articulation_index
+
+    def insert_modifier(self, index, modifier, articulation_index=None):
+        ''' Put a modifier back where pop_modifier took it from '''
+
+        self.modifiers.insert(index, modifier)
+        if articulation_index != None: self.articulations.insert(articulation_index, modifier)
+        self.apply_modifiers()
 
     #########################################
     #           Modifier Actions            #
@@ -120,6 +166,29 @@ class Note(m21.note.Note):
 
         
 
+    #########################################
+    #               Duration                #
+    #########################################
+
+    def get_duration(self):
+        return self.duration.quarterLength * .25
+
+    def get_ticks(self):
+        ''' Exact length in utils.TICKS_PER_WHOLE, modifiers included '''
+        return duration_to_ticks(Fraction(self.duration.quarterLength) / 4)
+
+    def set_duration(self, duration):
+        ''' Set the undotted duration of the Note, eigth note would be .125 '''
+
+        self._duration_default = intern_duration(duration)
+        self.duration = self._duration_default.to_m21()
+
+        # Duration modifiers scale from the new value
+        for modifier in self.modifiers:
+            if modifier.modifier_type == 'duration':
+                modifier.duration = intern_duration(duration, modifier.multiplier).duration
+        self.apply_modifiers()
+
     #########################################
     #             Other Actions             #
     #########################################
@@ -133,22 +202,15 @@ class Note(m21.note.Note):
     def get_musicxml(self):
         ''' Return MusicXML formatted string for the current Note state '''
 
-        f"<note> \
-             <unpitched> \
-                <display-step>A</display-step> \
-                <display-octave>3</display-octave> \
-            </unpitched> \
-            <duration>{'self.duration * self.beat_unit'}</duration> \
-            <type>{'text version of note duration, ex. eigth'}</type> \
-            <stem>{self.stem_direction}</stem> \
-            "
+        mask = 0
+        for modifier in self.modifiers:
+            mask |= 1 << modifier.code
+
+        return note_musicxml(duration_to_ticks(self.get_duration()), self.sticking, mask)
 
+    def add_to_location(self, location, modifier):
+        if self._locations == None: self._locations = {}
+        self._locations.setdefault(location, []).append(modifier)
 
     def reset_locations(self):
-        self.head = 0
-        self.stem = 0
-        self.tail = 0
-        self.top = []
-        self.bottom = []
-        self.left = []
-        self.right = []
\ No newline at end of file
+        self._locations = None
\ No newline at end of file
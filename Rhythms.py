@@ -1,4 +1,3 @@
-import functools
 from copy import deepcopy
 
 import music21 as m21
@@ -7,10 +6,12 @@ try:
     from .Classes import *
     from .Notes import *
     from .Modifiers import *
+    from .utils import rhythm_duration
 except:
     from Classes import *
     from Notes import *
     from Modifiers import *
+    from utils import rhythm_duration
 
 
 class Rhythm(m21.stream.Stream):
@@ -23,9 +24,10 @@ class Rhythm(m21.stream.Stream):
         # if default_duration == 0: raise TypeError("__init__() missing 1 required positional argument: 'default_duration'")
         self._default_duration = default_duration #m21.duration.Duration(default_duration * 4) 
 
-        # self._notes = [] if notes is None else notes # Container for Note objects
+        self._notes = [] # Note objects in order, avoids rebuilding the Stream iterator
 
         self.modulators = {}
+        self._modulator_positions = {} # name: index in self._notes of the Note holding the modulator
         
         # Space taken up by rhythm, eigth note would be .125
         self._duration = self.duration
@@ -44,19 +46,30 @@ class Rhythm(m21.stream.Stream):
     def get_duration(self):
         return self.duration.quarterLength * .25
 
+    def get_ticks(self):
+        ''' Exact length in utils.TICKS_PER_WHOLE '''
+        return sum([note.get_ticks() for note in self._notes])
+
     def set_duration(self, *new_durations):
         ''' Adjust the duration of all notes in the Rhythm '''
         dur_list = [*new_durations]
 
-        if len(dur_list) > len(self.notes):
-            raise Exception(f"{len(dur_list)} duration values passed, only {len(self.notes)} Notes in Rhythm object")
+        if len(dur_list) > len(self._notes):
+            raise Exception(f"{len(dur_list)} duration values passed, only {len(self._notes)} Notes in Rhythm object")
         
-        while len(dur_list) < len(self.notes):
+        while len(dur_list) < len(self._notes):
             dur_list.append(dur_list[-1])
         
-        for note, new in zip(self.notes, dur_list):
+        for note, new in zip(self._notes, dur_list):
             if not new: continue
-            note.duration = new
+            note.set_duration(new)
+
+        # Close gaps and overlaps left by the new durations
+        offset = 0
+        for note in self._notes:
+            self.setElementOffset(note, offset)
+            offset += note.duration.quarterLength
+        self.coreElementsChanged()
 
     #########################################
     #               Add Notes               #
@@ -64,8 +77,12 @@ class Rhythm(m21.stream.Stream):
 
     def add(self, *notes):
         ''' Add new Notes to the end of the Rhythm'''
-        # self._notes.extend([*notes])
-        [self.append(note) for note in notes]
+        self._notes.extend([*notes])
+
+        # Append without per Note cache updates, then update once
+        for note in notes:
+            self.coreAppend(note)
+        self.coreElementsChanged()
 
     def add_note(self, sticking=None, dur_mod=None, *mods, **kwargs):
         ''' Add a single Note by passing Note parameters '''
@@ -82,27 +99,82 @@ class Rhythm(m21.stream.Stream):
 
 
         if not sticking: raise Exception('Provide a sticking value')
-        note = Note(_duration, sticking, *_modifiers, **kwargs)
+        note = Note(_duration, sticking, _modifiers, **kwargs)
         
         self.add(note)
 
+    def insert_note(self, position, note):
+        ''' Insert a Note before position, later Notes move back by its length '''
+
+        position = min(position % (len(self._notes) + 1) if position < 0 else position, len(self._notes))
+        offset = self._notes[position].offset if position < len(self._notes) else self.highestTime
+        self.insertAndShift(offset, note)
+        self._notes.insert(position, note)
+
+        # Modulators after the Note move up one position, modulators on it are found again
+        for name, current in self._modulator_positions.items():
+            if current != None and current >= position:
+                self._modulator_positions[name] = current + 1
+            elif current == None and getattr(self.modulators[name], '_note', None) is note:
+                self._modulator_positions[name] = position
+
     #########################################
     #               Copy Notes              #
     #########################################
 
     def copy_note(self, flip=False):
         ''' Copy the most recent note '''
-        recent = deepcopy(self.notes[-1])
+        recent = deepcopy(self._notes[-1])
         if flip: recent.flip_sticking()
         self.add(recent)
 
+    def share(self, *positions):
+        ''' Copy the Rhythm, sharing Note objects with this one
+            Only the Notes at positions are deep copied, shared Notes should not be changed in place '''
+
+        notes = self._notes
+        positions = {position % len(notes) for position in positions}
+
+        rhythm = Rhythm(self._default_duration)
+        clones = {}
+        for i, note in enumerate(notes):
+            if i in positions:
+                clones[id(note)] = clone = deepcopy(note)
+                # music21 links a deepcopy to its origin, dropping it lets replaced Notes be collected
+                for obj in [clone, *clone.modifiers]:
+                    if hasattr(obj, '_derivation'): obj._derivation = None
+            rhythm.add(clones.get(id(note), note))
+
+        # Modulators on copied Notes follow their copy
+        for name, mod in self.modulators.items():
+            clone = clones.get(id(mod._note))
+            if clone != None:
+                mod = next(new for old, new in zip(mod._note.modifiers, clone.modifiers) if old is mod)
+            rhythm.modulators[name] = mod
+        rhythm._modulator_positions = {**self._modulator_positions}
+
+        return rhythm
+
     #########################################
     #              Remove Notes             #
     #########################################
 
     def remove_note(self, position=-1):
         ''' Remove Note from rhythm'''
-        return self.notes.pop(position)
+
+        position %= len(self._notes)
+        note = self._notes.pop(position)
+        self.remove(note, shiftOffsets=True)
+
+        # Modulators after the Note move down one position, modulators on it are left without a Note
+        for name, current in self._modulator_positions.items():
+            if current == None: continue
+            if current == position:
+                self._modulator_positions[name] = None
+            elif current > position:
+                self._modulator_positions[name] = current - 1
+
+        return note
 
     #########################################
     #           Modulate Modifiers          #
@@ -111,56 +183,94 @@ class Rhythm(m21.stream.Stream):
     def add_modulator(self, modifier, position=None, name=None):
         ''' Add modulator to the Rhythm '''
         
-        # Mark modifier to allow it to be moved across notes
+        # Mark modifier to allow it to be moved across notes, shared modifiers can not be marked
+        if modifier.shared: modifier = modifier.unshared()
         modifier.modulator = True 
         
         # Add to Note at specified index
         if position != None:
-            self.notes[position].add_modifier(modifier)
+            position %= len(self._notes)
+            self._notes[position].add_modifier(modifier)
         
         # Add to modulators dict
         name = name if name != None else modifier.id
         self.modulators[name] = modifier
+        self._modulator_positions[name] = position
 
-    def modulate(self, direction='forward', name=None):
-        ''' Move modulator forward or backward '''
+    def remove_modulator(self, name):
+        ''' Take a modulator off the Rhythm and its Note, returns (modifier, position) '''
 
-        # Get modulator
-        mods = [*self.modulators.values()] if not name else self.modulators[name]
+        position = self.get_modulator_position(name)
+        modifier = self.modulators.pop(name)
+        self._modulator_positions.pop(name, None)
+        if position != None: self._notes[position].pop_modifier(modifier)
 
-        # Determine current position and remove
-        for mod in mods:
-            
-            # Get position
-            for i, note in enumerate(self.notes):
-                if note == mod._note:
+        return modifier, position
+
+    def get_modulator_position(self, name):
+        ''' Index of the Note holding a modulator, None if it is not on a Note '''
+
+        mod = self.modulators[name]
+        position = self._modulator_positions.get(name)
+
+        # Modifier.move called outside of the Rhythm leaves the index stale, look it up again
+        if position == None or self._notes[position] is not mod._note:
+            for i, note in enumerate(self._notes):
+                if note is mod._note:
                     position = i
                     break
             else:
                 position = None
+            self._modulator_positions[name] = position
+
+        return position
+
+    def get_modulator_moves(self, direction='forward', name=None):
+        ''' Current and next Note position of each modulator without moving them
+            Returns list of (name, position, new_position), position is None if not on a Note '''
 
+        names = [*self.modulators] if not name else [name]
+
+        moves = []
+        for name in names:
+            
+            position = self.get_modulator_position(name)
 
             # Send in specified direction
             if direction == 'forward':
-                if position != None:
-                    position += 1
-                else:
-                    position = 0
+                new_position = position + 1 if position != None else 0
             elif direction == 'backward':
-                if position != None:
-                    position -= 1
-                else:
-                    position = -1
+                new_position = position - 1 if position != None else -1
             else:
                 raise Exception(f"position only accepts 'forward' or 'backward', value {direction} passed")
 
-            new_note = self.notes[position % len(self.notes)]
-            mod.move(new_note)
+            moves.append((name, position, new_position % len(self._notes)))
 
-                    
+        return moves
 
-    def set_modulator_position(self, position):
-        pass
+    def modulate(self, direction='forward', name=None):
+        ''' Move modulator forward or backward '''
+
+        for name, _, new_position in self.get_modulator_moves(direction, name):
+            self.set_modulator_position(new_position, name)
+
+    def modulated(self, direction='forward', name=None):
+        ''' Modulate a shared copy of the Rhythm, leaving this one unchanged '''
+
+        # Only copy the Notes the modulators leave and land on
+        moves = self.get_modulator_moves(direction, name)
+        rhythm = self.share(*[position for _, old, new in moves for position in (old, new) if position != None])
+        rhythm.modulate(direction, name)
+
+        return rhythm
+
+    def set_modulator_position(self, position, name=None):
+        ''' Move modulators to the Note at position '''
+
+        position %= len(self._notes)
+        for name in ([*self.modulators] if not name else [name]):
+            self.modulators[name].move(self._notes[position])
+            self._modulator_positions[name] = position
 
 
     #########################################
@@ -170,14 +280,14 @@ class Rhythm(m21.stream.Stream):
     @property
     def sticking(self):
         ''' Get the sticking of notes in the rhythm as a string '''
-        return''.join([note.sticking for note in self.notes])
+        return''.join([note.sticking for note in self._notes])
 
     def set_sticking(self, new_sticking):
         ''' Change the sticking of each note in the Rhythm from left to right
             If the string is shorter than the number of notes, predefined sticking will be maintained 
             Keep current value by passing "_" instead of a sticking value'''
         
-        for note, new in zip(self.notes, new_sticking):
+        for note, new in zip(self._notes, new_sticking):
             if new == '_': continue
             note.sticking = new
 
@@ -186,27 +296,6 @@ class Rhythm(m21.stream.Stream):
         pass
 
 
-def rhythm_duration(func):
-
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-       
-        rhythm = func(*args, **kwargs)
-
-        if args:
-            duration, *_ = args
-        else:
-            duration, *_ = func.__defaults__
-
-        if type(duration) in [float, int]:
-            duration = [duration / len(rhythm.notes)]
-        rhythm.set_duration(*duration)
-
-        return rhythm
-
-    return wrapper
-
-
 ###############################################################################
 #                                                                             #
 #                                                                             #
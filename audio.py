@@ -0,0 +1,149 @@
+''' Offline audio rendering of grids to WAV with NumPy
+
+    Every stroke of a Rhythm, MultiRhythm or their compact versions, grace strokes and tremolo
+    strokes included (see midi.get_strokes), is put in onset arrays. A sample buffer per stroke
+    kind is then mixed into one PCM array with a scatter-add per chunk of strokes, nothing loops
+    over samples in Python
+
+    write_wav(make_16th_note_grid(), 'grid.wav', bpm=100)
+
+    Stroke kinds
+        STROKE: Notes and diddle strokes
+        GRACE: flam and drag grace strokes
+        BUZZ: buzz strokes
+    NumPy is only needed when this module is used
+'''
+from collections import namedtuple
+import wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from .CompactRhythms import STICKING_NAMES, iter_compact
+    from .midi import get_strokes, to_velocity
+    from .utils import DYNAMICS, MODIFIER_CODES, TICKS_PER_WHOLE
+except ImportError:
+    from CompactRhythms import STICKING_NAMES, iter_compact
+    from midi import get_strokes, to_velocity
+    from utils import DYNAMICS, MODIFIER_CODES, TICKS_PER_WHOLE
+
+STROKE, GRACE, BUZZ = 0, 1, 2
+HAND_CODES = {'R': 0, 'L': 1}
+BUZZ_MASK = 1 << MODIFIER_CODES['buzz']
+
+SAMPLE_RATE = 44100
+
+# Sample buffer element count times strokes mixed per scatter-add, bounds the index arrays
+CHUNK_ELEMENTS = 1 << 22
+
+Onsets = namedtuple('Onsets', ['ticks', 'hands', 'dynamics', 'kinds', 'length'])
+
+
+def require_numpy():
+    if np == None: raise Exception('audio requires NumPy, install it with pip install numpy')
+
+def get_rhythm_onsets(rhythm, grace_dynamic=DYNAMICS['pp']):
+    ''' (ticks from the rhythm start, hand, dynamic, kind) rows of every stroke of a CompactRhythm '''
+
+    rows, onset = [], 0
+    for ticks, sticking, dynamic, mask in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, rhythm.get_masks()):
+        for offset, hand, stroke_dynamic in get_strokes(ticks, STICKING_NAMES[sticking], dynamic, mask, grace_dynamic):
+            kind = GRACE if offset < 0 else BUZZ if mask & BUZZ_MASK else STROKE
+            rows.append((onset + offset, HAND_CODES[hand], stroke_dynamic, kind))
+        onset += ticks
+
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+def get_onsets(source, grace_dynamic=DYNAMICS['pp']):
+    ''' Onsets of every stroke of a Rhythm, MultiRhythm or their compact versions, sorted by tick
+        length: ticks of the source, grace strokes of the first Note have negative ticks '''
+
+    require_numpy()
+
+    # Strokes of a rhythm are found once, copies only need their start
+    distinct = {} # id(rhythm): (stroke rows, [start, ...])
+    start = 0
+    for rhythm in iter_compact(source):
+        if id(rhythm) not in distinct:
+            distinct[id(rhythm)] = (get_rhythm_onsets(rhythm, grace_dynamic), [])
+        distinct[id(rhythm)][1].append(start)
+        start += sum(rhythm.ticks)
+
+    blocks = []
+    for rows, starts in distinct.values():
+        block = np.broadcast_to(rows, (len(starts), *rows.shape)).copy()
+        block[:, :, 0] += np.array(starts, dtype=np.int64)[:, None]
+        blocks.append(block.reshape(-1, 4))
+
+    rows = np.concatenate(blocks) if blocks else np.zeros((0, 4), dtype=np.int64)
+    rows = rows[np.argsort(rows[:, 0], kind='stable')]
+
+    return Onsets(rows[:, 0], rows[:, 1].astype(np.int8), rows[:, 2].astype(np.int8), rows[:, 3].astype(np.int8), start)
+
+def make_samples(sample_rate=SAMPLE_RATE, seed=0):
+    ''' {kind: float32 buffer} of synthesized snare hits, a noise burst over a drum head tone '''
+
+    require_numpy()
+    rng = np.random.default_rng(seed)
+
+    def hit(seconds, decay, tone_decay):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        noise = rng.uniform(-1, 1, len(t)) * np.exp(-t / decay)
+        tone = np.sin(2 * np.pi * 185 * t) * np.exp(-t / tone_decay)
+        return (.7 * noise + .5 * tone).astype(np.float32)
+
+    return {STROKE: hit(.15, .03, .05),
+            GRACE: hit(.08, .015, .02),
+            BUZZ: hit(.05, .008, .01)}
+
+def mix(pcm, positions, gains, sample):
+    ''' Add sample into pcm at every position scaled by its gain, in chunks of strokes '''
+
+    offsets = np.arange(len(sample))
+    chunk = max(1, CHUNK_ELEMENTS // max(1, len(sample)))
+    for i in range(0, len(positions), chunk):
+        indices = positions[i:i + chunk, None] + offsets
+        np.add.at(pcm, indices.ravel(), (gains[i:i + chunk, None] * sample).ravel())
+
+def render(source, bpm=120, sample_rate=SAMPLE_RATE, samples=None, grace_dynamic=DYNAMICS['pp']):
+    ''' Mono float32 PCM of a Rhythm, MultiRhythm or their compact versions, peaks scaled down to 1
+        samples: {kind: float buffer}, missing kinds use make_samples '''
+
+    require_numpy()
+    samples = {**make_samples(sample_rate), **(samples or {})}
+
+    onsets = get_onsets(source, grace_dynamic)
+
+    # A quarter note lasts 60 / bpm seconds
+    samples_per_tick = sample_rate * 240 / (bpm * TICKS_PER_WHOLE)
+    positions = np.maximum(0, np.round(onsets.ticks * samples_per_tick).astype(np.int64))
+    # Dynamics past ff play at ff and below 0 at 0, as to_velocity clamps them for MIDI
+    gains = np.array([to_velocity(dynamic) / 127 for dynamic in range(DYNAMICS['ff'] + 1)], dtype=np.float32)
+    gains = gains[np.clip(onsets.dynamics, 0, DYNAMICS['ff'])]
+
+    length = int(round(onsets.length * samples_per_tick))
+    if len(positions): length = max(length, int(positions[-1]) + max([len(sample) for sample in samples.values()]))
+    pcm = np.zeros(length, dtype=np.float32)
+
+    for kind, sample in samples.items():
+        selected = onsets.kinds == kind
+        mix(pcm, positions[selected], gains[selected], np.asarray(sample, dtype=np.float32))
+
+    peak = np.abs(pcm).max() if length else 0
+    if peak > 1: pcm /= peak
+
+    return pcm
+
+def write_wav(source, file, sample_rate=SAMPLE_RATE, **kwargs):
+    ''' Write 16 bit mono WAV to a path or binary file-like object, kwargs are passed to render '''
+
+    pcm = render(source, sample_rate=sample_rate, **kwargs)
+
+    with wave.open(file, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((pcm * 32767).astype('<i2').tobytes())
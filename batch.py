@@ -0,0 +1,124 @@
+''' Generate grids for every rudiment, duration, accent start position and grid template
+
+    Jobs are sharded across a process pool and come back in job order as CompactMultiRhythm objects,
+    so the output does not depend on the number of workers
+
+    python batch.py --workers 4 --output grids.pkl
+'''
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import os
+import pickle
+import time
+
+try:
+    from .MultiRhythms import *
+    from .CompactRhythms import CompactMultiRhythm
+except ImportError:
+    from MultiRhythms import *
+    from CompactRhythms import CompactMultiRhythm
+
+RUDIMENTS = {'paradiddle': make_paradiddle,
+             'paradiddlediddle': make_paradiddlediddle,
+             'flam_accent': make_flam_accent,
+             'flamacue': make_flamacue}
+
+TEMPLATES = {'16th_note_grid': make_16th_note_grid}
+
+DURATIONS = [1/4, 1/2]
+
+Job = namedtuple('Job', ['index', 'rudiment', 'duration', 'start', 'template'])
+GridResult = namedtuple('GridResult', ['job', 'grid', 'worker', 'seconds'])
+
+
+def get_jobs(rudiments=None, durations=None, templates=None):
+    ''' Every combination of the parameter space in a fixed order
+        One job per accent start position, the rudiment's Note count sets the positions '''
+
+    rudiments = [*RUDIMENTS] if rudiments == None else rudiments
+    durations = DURATIONS if durations == None else durations
+    templates = [*TEMPLATES] if templates == None else templates
+
+    note_counts = {rudiment: len(RUDIMENTS[rudiment]()._notes) for rudiment in rudiments}
+
+    jobs = []
+    for rudiment, duration, template in product(rudiments, durations, templates):
+        for start in range(note_counts[rudiment]):
+            jobs.append(Job(len(jobs), rudiment, duration, start, template))
+
+    return jobs
+
+def build_grid(job):
+    ''' Build one grid, runs in the worker processes '''
+
+    t = time.perf_counter()
+
+    rhythm = RUDIMENTS[job.rudiment](job.duration)
+    rhythm.add_modulator(Accent(), job.start, 'accent')
+    grid = TEMPLATES[job.template](rhythm, copy_on_write=True)
+
+    return GridResult(job, CompactMultiRhythm.from_multi_rhythm(grid), os.getpid(), time.perf_counter() - t)
+
+def generate(jobs=None, workers=None, chunksize=1):
+    ''' Yield a GridResult for every job, in job order as they finish
+        workers: process count, 0 builds in this process '''
+
+    jobs = get_jobs() if jobs == None else jobs
+
+    if workers == 0:
+        yield from map(build_grid, jobs)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(build_grid, jobs, chunksize=chunksize)
+
+
+class Throughput:
+    ''' Per worker grid counts and build time '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.workers = {} # pid: [grids, seconds]
+
+    def record(self, result):
+        counts = self.workers.setdefault(result.worker, [0, 0])
+        counts[0] += 1
+        counts[1] += result.seconds
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        lines = [f"worker {pid}: {grids} grids, {grids / seconds if seconds else 0:.1f} grids/s busy"
+                 for pid, (grids, seconds) in sorted(self.workers.items())]
+        total = sum(grids for grids, _ in self.workers.values())
+        lines.append(f"total: {total} grids in {elapsed:.2f}s, {total / elapsed if elapsed else 0:.1f} grids/s")
+        return '\n'.join(lines)
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Generate grids for the rudiment catalog')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, 0 runs in this process (default: cpu count)')
+    parser.add_argument('--chunksize', type=int, default=1, help='jobs sent to a worker at once')
+    parser.add_argument('--rudiments', nargs='+', choices=[*RUDIMENTS], default=None)
+    parser.add_argument('--durations', nargs='+', type=float, default=None)
+    parser.add_argument('--templates', nargs='+', choices=[*TEMPLATES], default=None)
+    parser.add_argument('--output', default=None, help='file to write pickled (job dict, CompactMultiRhythm) pairs to, one after another')
+    args = parser.parse_args(args)
+
+    jobs = get_jobs(args.rudiments, args.durations, args.templates)
+    throughput = Throughput()
+    output = open(args.output, 'wb') if args.output else None
+
+    try:
+        for result in generate(jobs, args.workers, args.chunksize):
+            throughput.record(result)
+            if output: pickle.dump((result.job._asdict(), result.grid), output)
+    finally:
+        if output: output.close()
+
+    print(throughput.report())
+
+if __name__ == '__main__':
+    main()
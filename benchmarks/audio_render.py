@@ -0,0 +1,39 @@
+''' Seconds to render long grids to WAV, a 5 minute exercise should take well under a second
+
+    python benchmarks/audio_render.py --minutes 5 --bpm 120
+'''
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio import get_onsets, write_wav
+from batch import RUDIMENTS
+from midi_export import long_grid
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=5)
+    parser.add_argument('--bpm', type=float, default=120)
+    args = parser.parse_args(args)
+
+    # 4/4 bars in the exercise length
+    bars = args.minutes * args.bpm / 4
+
+    results = {}
+    for rudiment in RUDIMENTS:
+        grid = long_grid(rudiment, bars)
+        start = time.perf_counter()
+        write_wav(grid, io.BytesIO(), bpm=args.bpm)
+        results[rudiment] = {'strokes': len(get_onsets(grid).ticks), 'seconds': time.perf_counter() - start}
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+''' Time and peak memory of merging an ensemble of long parts into time slices
+
+    Every part is a rudiment grid repeated to --bars 4/4 bars, the peak memory of the merge
+    should stay flat as --bars grows
+
+    python benchmarks/ensemble_merge.py --players 40 --bars 200
+'''
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch import RUDIMENTS
+from ensemble import Ensemble
+
+from midi_export import get_bars, long_grid
+
+def merge(ensemble):
+    ''' (notes, slices) walked '''
+
+    notes = slices = 0
+    for onset, part_notes in ensemble.iter_slices():
+        notes += len(part_notes)
+        slices += 1
+    return notes, slices
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--bars', type=int, default=200)
+    args = parser.parse_args(args)
+
+    rudiments = [*RUDIMENTS]
+    parts = {f"player_{i}": long_grid(rudiments[i % len(rudiments)], args.bars) for i in range(args.players)}
+    ensemble = Ensemble(parts)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    notes, slices = merge(ensemble)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(json.dumps({'players': args.players, 'bars': max([get_bars(part) for part in parts.values()]), 'notes': notes,
+                      'slices': slices, 'seconds': seconds, 'notes_per_second': notes / seconds, 'peak_kib': peak / 1024}, indent=2))
+
+if __name__ == '__main__':
+    main()
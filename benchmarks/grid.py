@@ -0,0 +1,181 @@
+''' Time and peak memory of the grid construction hot paths
+
+    Every case is timed over several runs (median seconds per call) and run once more under
+    tracemalloc for its peak allocation. Results can be saved as a baseline and later runs
+    compared against it, a case slower or larger than the tolerance is reported as a regression
+
+    python benchmarks/grid.py --json
+    python benchmarks/grid.py --save-baseline
+    python benchmarks/grid.py --compare
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MultiRhythms import *
+from core import fill_16th_note_grid
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Grid lengths, each length fills the 16th note grid that many times
+GRID_LENGTHS = [1, 2, 4, 8]
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Cases                                    #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+''' A case is a setup function returning the arguments for the timed function,
+    setup is not timed so only the hot path is measured '''
+
+def seed_rhythm():
+    rhythm = Rhythm(1/16)
+    for sticking in 'RLRL':
+        rhythm.add_note(sticking)
+    rhythm.add_modulator(Accent(), 0, 'accent')
+    return rhythm
+
+def grid(length, **kwargs):
+    multi_rhythm = make_16th_note_grid(seed_rhythm(), **kwargs)
+    for _ in range(length - 1):
+        fill_16th_note_grid(multi_rhythm)
+    return multi_rhythm
+
+def multi_rhythm_modulate(multi_rhythm):
+    multi_rhythm.modulate(copies=4)
+
+def get_cases(lengths=None):
+    ''' Case name: (setup, function) '''
+
+    lengths = GRID_LENGTHS if lengths == None else lengths
+
+    cases = {'Note.__init__': (lambda: (), lambda: Note(1/16, 'R', [Accent()])),
+             'Rhythm.add_note': (lambda: (Rhythm(1/16),), lambda rhythm: rhythm.add_note('R', Accent())),
+             'Rhythm.modulate': (lambda: (seed_rhythm(),), lambda rhythm: rhythm.modulate()),
+             'MultiRhythm.copy': (lambda: (MultiRhythm(seed_rhythm()),), lambda multi_rhythm: multi_rhythm.copy(4)),
+             'MultiRhythm.modulate': (lambda: (MultiRhythm(seed_rhythm()),), multi_rhythm_modulate)}
+
+    for factory in [make_paradiddle, make_paradiddlediddle, make_flam_accent, make_flamacue]:
+        cases[factory.__name__] = (lambda: (), factory)
+
+    for length in lengths:
+        cases[f"make_16th_note_grid[{length}]"] = (lambda length=length: (length,), grid)
+        cases[f"make_16th_note_grid[{length}, copy_on_write]"] = (lambda length=length: (length,), lambda length: grid(length, copy_on_write=True))
+
+    return cases
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Running                                   #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def measure(setup, function, runs=5, min_time=.05):
+    ''' Median seconds per call and peak tracemalloc bytes of one call '''
+
+    # Enough calls per run to rise above timer noise
+    args = setup()
+    t = time.perf_counter()
+    function(*args)
+    once = time.perf_counter() - t
+    calls = max(1, int(min_time / once)) if once else 1000
+
+    times = []
+    for _ in range(runs):
+        arg_sets = [setup() for _ in range(calls)]
+        t = time.perf_counter()
+        for args in arg_sets:
+            function(*args)
+        times.append((time.perf_counter() - t) / calls)
+
+    args = setup()
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'seconds': statistics.median(times), 'peak_bytes': peak, 'calls': calls}
+
+def run(names=None, runs=5, lengths=None):
+
+    cases = get_cases(lengths)
+    names = [*cases] if names == None else names
+
+    return {name: measure(*cases[name], runs=runs) for name in names}
+
+def compare(results, baseline, tolerance=.25):
+    ''' Cases whose time or peak memory is more than tolerance above the baseline
+        Returns [(case, metric, baseline value, new value)] '''
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline: continue
+        for metric in ['seconds', 'peak_bytes']:
+            if result[metric] > baseline[name][metric] * (1 + tolerance):
+                regressions.append((name, metric, baseline[name][metric], result[metric]))
+
+    return regressions
+
+def format_results(results, baseline=None):
+
+    baseline = {} if baseline == None else baseline
+    lines = []
+    for name, result in results.items():
+        line = f"{name:<42} {result['seconds'] * 1e6:12.1f} us {result['peak_bytes'] / 1024:10.1f} KiB"
+        if name in baseline:
+            line += (f"   x{result['seconds'] / baseline[name]['seconds']:.2f} time"
+                     f"   x{result['peak_bytes'] / max(baseline[name]['peak_bytes'], 1):.2f} memory")
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', default=None, help='case names to run (default: all)')
+    parser.add_argument('--lengths', nargs='+', type=int, default=None, help=f'grid lengths (default: {GRID_LENGTHS})')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true', help='exit with status 1 if a case regressed against the baseline')
+    parser.add_argument('--tolerance', type=float, default=.25, help='allowed slowdown or growth before a regression (default: .25)')
+    args = parser.parse_args(args)
+
+    results = run(args.cases, args.runs, args.lengths)
+
+    baseline = None
+    if args.compare and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    if args.json:
+        print(json.dumps({'python': sys.version.split()[0], 'results': results}, indent=2))
+    else:
+        print(format_results(results, baseline))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+            f.write('\n')
+
+    if baseline != None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"regression: {name} {metric} {old:.6g} -> {new:.6g}", file=sys.stderr)
+        if regressions: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
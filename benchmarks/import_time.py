@@ -0,0 +1,65 @@
+''' Import time of the music21 free core against the music21 backed modules
+
+    Every import runs in a fresh interpreter so nothing is cached between runs
+
+    python benchmarks/import_time.py --runs 5
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statement timed in a fresh interpreter, and a build + export run on top of it
+CASES = {'core': ('import core', 
+                  'core.to_json(core.compact_16th_note_grid())'),
+         'MultiRhythms': ('import MultiRhythms', 
+                          'MultiRhythms.make_16th_note_grid()')}
+
+SCRIPT = '''
+import sys, time
+t = time.perf_counter()
+{statement}
+imported = time.perf_counter() - t
+{build}
+print(imported, time.perf_counter() - t, 'music21' in sys.modules)
+'''
+
+def time_case(statement, build):
+    ''' Seconds to import, seconds to import and build, whether music21 was loaded '''
+
+    output = subprocess.run([sys.executable, '-c', SCRIPT.format(statement=statement, build=build)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    imported, built, music21 = output.split()
+    return float(imported), float(built), music21 == 'True'
+
+def run(runs=5):
+
+    results = {}
+    for name, (statement, build) in CASES.items():
+        times = [time_case(statement, build) for _ in range(runs)]
+        results[name] = {'import_s': statistics.median(t[0] for t in times),
+                         'import_and_build_s': statistics.median(t[1] for t in times),
+                         'music21_loaded': times[-1][2]}
+    return results
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(args)
+
+    results = run(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, result in results.items():
+        print(f"{name:<14} import {result['import_s'] * 1000:8.1f} ms   import + grid {result['import_and_build_s'] * 1000:8.1f} ms   music21 loaded: {result['music21_loaded']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+''' Bars per second of the direct MIDI writer on long grids, with music21's MIDI translation for comparison
+
+    Each rudiment grid is repeated until it is --bars 4/4 bars long. music21 is timed on a single
+    grid since it is orders of magnitude slower
+
+    python benchmarks/midi_export.py --bars 10000
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import music21 as m21
+
+from batch import RUDIMENTS, Job, build_grid
+from CompactRhythms import CompactMultiRhythm
+from midi import midi_bytes
+from utils import TICKS_PER_WHOLE
+
+def get_bars(grid):
+    return sum([sum(rhythm.ticks) for rhythm in grid.rhythms]) / TICKS_PER_WHOLE
+
+def long_grid(rudiment, bars):
+    ''' CompactMultiRhythm of a rudiment grid repeated to at least bars 4/4 bars '''
+
+    grid = build_grid(Job(0, rudiment, 1/4, 0, '16th_note_grid')).grid
+    repeats = max(1, round(bars / get_bars(grid)))
+    return CompactMultiRhythm(grid.default_rhythm, [*grid.actions], grid.rhythms * repeats)
+
+def bars_per_second(export, grid, rounds=3):
+    ''' Best of rounds '''
+
+    seconds = min([timed(export, grid) for _ in range(rounds)])
+    return get_bars(grid) / seconds
+
+def timed(export, grid):
+    start = time.perf_counter()
+    export(grid)
+    return time.perf_counter() - start
+
+def music21_midi(grid):
+    return m21.midi.translate.streamToMidiFile(grid.to_multi_rhythm()).writestr()
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=10000)
+    parser.add_argument('--no-music21', action='store_true', help='skip the music21 comparison')
+    args = parser.parse_args(args)
+
+    results = {}
+    for rudiment in RUDIMENTS:
+        grid = long_grid(rudiment, args.bars)
+        results[rudiment] = {'bars': get_bars(grid), 'bytes': len(midi_bytes(grid)), 'direct_bars_per_second': bars_per_second(midi_bytes, grid)}
+        if not args.no_music21:
+            single = long_grid(rudiment, 1)
+            results[rudiment]['music21_bars_per_second'] = bars_per_second(music21_midi, single, rounds=1)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
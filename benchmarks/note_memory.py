@@ -0,0 +1,128 @@
+''' Memory held per Note, measured with tracemalloc over a batch of Notes
+
+    Only memory still allocated once the batch is built is counted, so temporary objects do not
+    show up. Shared objects (flyweight modifiers, interned values) are counted once per batch.
+    Results can be saved as a baseline and later runs compared against it like benchmarks/grid.py,
+    a case that grew by more than the tolerance is reported as a regression
+
+    python benchmarks/note_memory.py --notes 2000
+    python benchmarks/note_memory.py --save-baseline
+    python benchmarks/note_memory.py --compare
+'''
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MultiRhythms import *
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'note_memory_baseline.json')
+
+# Modifiers put on every Note of a case, built fresh per Note the way the factories do
+CASES = {'plain': lambda: [],
+         'accent': lambda: [Accent()],
+         'flam': lambda: [Flam()],
+         'diddle': lambda: [Diddle()],
+         'flam_accent': lambda: [Flam(), Accent()],
+         'buzz_marcato': lambda: [Buzz(), Marcato()]}
+
+def bytes_per_note(modifiers, notes=2000):
+    ''' Retained bytes per Note for Notes built with modifiers() '''
+
+    # Warm up caches so they are not counted
+    Note(1/16, 'R', modifiers())
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    batch = [Note(1/16, 'R', modifiers()) for _ in range(notes)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    del batch
+    return retained / notes
+
+def bytes_per_grid_note():
+    ''' Retained bytes per Note of an eager 16th note grid of flam accents '''
+
+    rhythm = make_flam_accent()
+    rhythm.add_modulator(Accent(), 0, 'accent')
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    grid = make_16th_note_grid(rhythm)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return retained / sum(len(rhythm._notes) for rhythm in grid.rhythms)
+
+def run(notes=2000):
+
+    results = {name: bytes_per_note(modifiers, notes) for name, modifiers in CASES.items()}
+    results['flam_accent_grid'] = bytes_per_grid_note()
+
+    return results
+
+def compare(results, baseline, tolerance=.02):
+    ''' Cases holding more than tolerance above the baseline bytes per Note
+        Returns [(case, baseline value, new value)] '''
+
+    return [(name, baseline[name], size) for name, size in results.items()
+            if name in baseline and size > baseline[name] * (1 + tolerance)]
+
+def format_results(results, baseline=None):
+
+    baseline = {} if baseline == None else baseline
+    lines = []
+    for name, size in results.items():
+        line = f"{name:<20} {size:10.0f} bytes per Note"
+        if name in baseline:
+            line += f"   {size - baseline[name]:+8.0f} bytes   x{size / baseline[name]:.3f}"
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=2000, help='Notes built per case')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true', help='exit with status 1 if a case grew against the baseline')
+    parser.add_argument('--tolerance', type=float, default=.02, help='allowed growth before a regression (default: .02)')
+    args = parser.parse_args(args)
+
+    results = run(args.notes)
+
+    baseline = None
+    if args.compare and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    if args.json:
+        print(json.dumps({'python': sys.version.split()[0], 'results': results}, indent=2))
+    else:
+        print(format_results(results, baseline))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+            f.write('\n')
+
+    if baseline != None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"regression: {name} {old:.0f} -> {new:.0f} bytes per Note", file=sys.stderr)
+        if regressions: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
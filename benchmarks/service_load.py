@@ -0,0 +1,104 @@
+''' Load test of the grid service on localhost
+
+    Starts the service on a free port, opens concurrent keep alive connections and sends a mix
+    of grid requests, a share of them repeated so coalescing and the cache are exercised
+
+    python benchmarks/service_load.py --clients 32 --requests 2000 --workers 2
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from service import GridService, RUDIMENTS
+
+async def fetch(reader, writer, target):
+    ''' (status, body) of one GET on an open connection '''
+
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n': break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length': length = int(value)
+
+    return status, await reader.readexactly(length)
+
+def get_targets(requests, distinct, seed=0):
+    ''' Grid request targets, drawn from distinct different requests '''
+
+    rng = random.Random(seed)
+    pool = [f"/grid?rudiment={rng.choice([*RUDIMENTS])}&duration={rng.choice([0.25, 0.5, 1.0])}&start={rng.randrange(4)}"
+            for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(requests)]
+
+async def client(port, targets, latencies, statuses):
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for target in targets:
+        start = time.perf_counter()
+        status, _ = await fetch(reader, writer, target)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+    await writer.wait_closed()
+
+async def run(clients=32, requests=2000, distinct=64, workers=None):
+
+    service = GridService(workers=workers)
+    server = await service.start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    targets = get_targets(requests, distinct)
+    latencies, statuses = [], {}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, targets[i::clients], latencies, statuses) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    metrics = json.loads((await fetch(reader, writer, '/metrics'))[1])
+    writer.close()
+    await writer.wait_closed()
+
+    # Let the server see every connection close before shutting down
+    await asyncio.sleep(.1)
+
+    server.close()
+    await server.wait_closed()
+    service.close()
+
+    latencies.sort()
+    return {'requests': requests,
+            'seconds': elapsed,
+            'requests_per_second': requests / elapsed,
+            'latency_ms': {'p50': latencies[len(latencies) // 2] * 1000,
+                           'p99': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+                           'mean': statistics.mean(latencies) * 1000},
+            'statuses': statuses,
+            'server': metrics}
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32, help='concurrent connections')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=64, help='different requests in the mix')
+    parser.add_argument('--workers', type=int, default=None, help='service build processes (default: cpu count)')
+    args = parser.parse_args(args)
+
+    print(json.dumps(asyncio.run(run(args.clients, args.requests, args.distinct, args.workers)), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+''' Entry point that does not import music21
+
+    Rudiments and grids are built, modulated and exported with CompactRhythm and CompactMultiRhythm.
+    The music21 backed classes (Note, Rhythm, MultiRhythm, Modifiers) are still available from this
+    module, their modules are only imported the first time one of them is used.
+'''
+import importlib
+import json
+
+try:
+    from .CompactRhythms import CompactRhythm, CompactMultiRhythm
+    from .utils import rhythm_duration
+except ImportError:
+    from CompactRhythms import CompactRhythm, CompactMultiRhythm
+    from utils import rhythm_duration
+
+# Names loaded from the music21 backed modules on first use
+LAZY_MODULES = {'Notes': ['Note'],
+                'Rhythms': ['Rhythm', 'make_paradiddle', 'make_paradiddlediddle', 'make_flam_accent', 'make_flamacue'],
+                'MultiRhythms': ['MultiRhythm', 'make_16th_note_grid'],
+                'Modifiers': ['Modifier', 'Accent', 'Marcato', 'Staccato', 'Tenuto', 'Diddle', 'Buzz',
+                              'Flam', 'Drag', 'ThreeStrokeDrag', 'Dot', 'DoubleDot']}
+LAZY_NAMES = {name: module for module, names in LAZY_MODULES.items() for name in names}
+
+def __getattr__(name):
+    ''' Import music21 backed names the first time they are used '''
+
+    if name not in LAZY_NAMES: raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(f".{LAZY_NAMES[name]}", __package__) if __package__ else importlib.import_module(LAZY_NAMES[name])
+    value = getattr(module, name)
+    globals()[name] = value
+
+    return value
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                  Rudiments                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+''' CompactRhythm versions of the rudiments in Rhythms.py, names are prefixed with compact_
+    to keep them apart from the music21 factories served by __getattr__ '''
+
+@rhythm_duration
+def compact_paradiddle(duration=1/4, downbeat_accent=True):
+
+    paradiddle = CompactRhythm(1/16)
+    if downbeat_accent:
+        paradiddle.add_note('R', 'accent')
+    else:
+        paradiddle.add_note('R')
+    paradiddle.add_note('L')
+    paradiddle.add_note('R')
+    paradiddle.add_note('R')
+
+    return paradiddle
+
+@rhythm_duration
+def compact_paradiddlediddle(duration=1/4):
+    ''' Extend paradiddle rudiment '''
+
+    paradiddle = compact_paradiddle(4/24)
+    paradiddle.add_note('L')
+    paradiddle.add_note('L')
+
+    return paradiddle
+
+@rhythm_duration
+def compact_flam_accent(duration=1/4):
+
+    flam_accent = CompactRhythm(1/12)
+    flam_accent.add_note('R', ['flam', 'accent'])
+    flam_accent.add_note('L')
+    flam_accent.add_note('R')
+
+    return flam_accent
+
+@rhythm_duration
+def compact_flamacue(duration=5/16):
+
+    flamacue = CompactRhythm(1/16)
+    flamacue.add_note('R', 'flam')
+    flamacue.add_note('L', 'accent')
+    flamacue.add_note('R')
+    flamacue.add_note('L')
+    flamacue.add_note('R', 'flam')
+
+    return flamacue
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Grids                                    #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+# Actions of a 16th note grid, the first bar is filled out then the modulator moves one Note per copy group
+GRID_16TH_NOTE_ACTIONS = [('copy', (('copies', 3), ('_save_action', True))),
+                          *[('modulate', (('direction', 'forward'), ('name', None), ('copies', int(dur)), ('_save_action', True)))
+                            for dur in '4'*3 + '2'*4 + '1'*4]]
+
+def fill_16th_note_grid(multi_rhythm, closed_form=False):
+    ''' Copy and modulate a MultiRhythm or CompactMultiRhythm into a 16th note grid
+        closed_form: add every rhythm in one pass with apply_actions instead of modulating step by step '''
+
+    if closed_form:
+        multi_rhythm.apply_actions(GRID_16TH_NOTE_ACTIONS)
+        return multi_rhythm
+
+    multi_rhythm.copy(3) # Fill out first bar
+    [multi_rhythm.modulate(copies=int(dur)) for dur in '4'*3 + '2'*4 + '1'*4]
+
+    return multi_rhythm
+
+def compact_16th_note_grid(rhythm=None, closed_form=False):
+
+    # Define default rhythm and modulator
+    if not rhythm:
+        rhythm = CompactRhythm(1/16)
+        rhythm.add_note('R')
+        rhythm.add_note('L')
+        rhythm.add_note('R')
+        rhythm.add_note('L')
+        rhythm.add_modulator('accent', 0, 'accent')
+
+    return fill_16th_note_grid(CompactMultiRhythm(rhythm), closed_form)
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Export                                   #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def to_json(compact, **kwargs):
+    ''' JSON string for a CompactRhythm or CompactMultiRhythm, kwargs are passed to json.dumps '''
+    return json.dumps(compact.to_dict(), **kwargs)
+
+def from_json(text):
+    values = json.loads(text)
+    return CompactMultiRhythm.from_dict(values) if 'states' in values else CompactRhythm.from_dict(values)
@@ -0,0 +1,50 @@
+''' Interned duration values
+
+    Rhythms are built from a handful of lengths (1/16, 1/12, 1/24, their dotted versions, ...), so
+    one immutable DurationValue is kept per distinct length and shared by every Note that has it.
+    music21 Duration objects are mutable and linked to the Note that owns them, each Note still gets
+    its own, built from the interned value without copying another Duration
+
+    value = intern_duration(1/16, DURATION_MULTIPLIERS['dot'])
+    note.duration = value.to_m21()
+'''
+from collections import namedtuple
+import functools
+
+import music21 as m21
+
+try:
+    from .utils import duration_to_ticks
+except ImportError:
+    from utils import duration_to_ticks
+
+
+class DurationValue(namedtuple('DurationValue', ['duration', 'quarter_length', 'ticks'])):
+    ''' Immutable length of a Note
+        duration: float, quarter note would be .25
+        quarter_length: music21 quarterLength, a Fraction for tuplets
+        ticks: int, utils.TICKS_PER_WHOLE per whole note '''
+
+    __slots__ = ()
+
+    def to_m21(self):
+        ''' New music21 Duration of this length '''
+        return m21.duration.Duration(self.quarter_length)
+
+@functools.lru_cache(maxsize=None)
+def intern_duration(duration, multiplier=1):
+    ''' Shared DurationValue for a duration, multiplier is utils.DURATION_MULTIPLIERS for dotted lengths '''
+
+    quarter_length = m21.common.opFrac(m21.common.opFrac(duration * 4) * m21.common.opFrac(multiplier))
+    duration = float(quarter_length) / 4
+
+    # Equal lengths reached different ways share one value
+    return canonical_duration(duration, quarter_length)
+
+@functools.lru_cache(maxsize=None)
+def canonical_duration(duration, quarter_length):
+    return DurationValue(duration, quarter_length, duration_to_ticks(quarter_length / 4))
+
+def get_cache_info():
+    ''' functools cache statistics of the interning tables '''
+    return {'intern_duration': intern_duration.cache_info(), 'canonical_duration': canonical_duration.cache_info()}
@@ -0,0 +1,135 @@
+''' Ensemble of parts played together, snare, tenors and bass each as their own MultiRhythm
+
+    The parts are merged by onset with a k-way heap merge as they are walked. Nothing is concatenated
+    and no part is materialized, only the current rhythm of every part and one pending Note per part
+    are held, so memory grows with the number of parts and not with the length of the show
+
+    ensemble = Ensemble({'snare': make_16th_note_grid(), 'bass': bass_grid})
+    for onset, notes in ensemble.iter_slices():    # every Note starting at onset, in part order
+        ...
+    write_ensemble_midi(ensemble, f, parts={'bass': {'notes': {'R': 36, 'L': 36}}})
+
+    Onsets are integer ticks, see utils.TICKS_PER_WHOLE
+'''
+from collections import namedtuple
+import heapq
+from itertools import groupby
+from operator import attrgetter
+
+try:
+    from .CompactRhythms import STICKING_NAMES, iter_compact
+    from .midi import DIVISION, MidiWriter, event_order, merge_voices
+except ImportError:
+    from CompactRhythms import STICKING_NAMES, iter_compact
+    from midi import DIVISION, MidiWriter, event_order, merge_voices
+
+# One Note of a part, mask includes modulators as CompactRhythm.get_masks
+PartNote = namedtuple('PartNote', ['onset', 'part', 'index', 'ticks', 'sticking', 'dynamic', 'mask'])
+
+
+def iter_part_notes(part, source):
+    ''' Yield a PartNote for every Note of a Rhythm, MultiRhythm or their compact versions
+        index counts Notes from the start of the part '''
+
+    onset, index = 0, 0
+    last, rows = None, None
+    for rhythm in iter_compact(source):
+        # Copies of a shared rhythm reuse its rows
+        if rhythm is not last:
+            last, rows = rhythm, [(ticks, STICKING_NAMES[code], dynamic, mask) for ticks, code, dynamic, mask
+                                  in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, rhythm.get_masks())]
+
+        for ticks, sticking, dynamic, mask in rows:
+            yield PartNote(onset, part, index, ticks, sticking, dynamic, mask)
+            onset += ticks
+            index += 1
+
+
+class Ensemble:
+    ''' Parts played together from the same start
+
+        Parameters
+            parts: {part name: Rhythm, MultiRhythm or their compact versions}
+                parts are walked in this order, a lazy MultiRhythm is streamed as it is rebuilt '''
+
+    def __init__(self, parts=None):
+
+        self.parts = {}
+        for name, source in (parts or {}).items():
+            self.add_part(name, source)
+
+    def __repr__(self):
+        return f"Ensemble(parts={[*self.parts]})"
+
+    def __len__(self):
+        return len(self.parts)
+
+    def add_part(self, name, source):
+        if name in self.parts: raise Exception(f"Part {name} is already in the Ensemble")
+        self.parts[name] = source
+
+    def remove_part(self, name):
+        return self.parts.pop(name)
+
+    #########################################
+    #                 Merge                 #
+    #########################################
+
+    def iter_notes(self):
+        ''' Yield the PartNote of every part in onset order, Notes starting together come in part order '''
+
+        # heapq.merge keeps one Note per part and is stable, ties stay in part order
+        return heapq.merge(*[iter_part_notes(name, source) for name, source in self.parts.items()], key=attrgetter('onset'))
+
+    def iter_slices(self):
+        ''' Yield (onset, [PartNote]) for every onset at least one part starts a Note on '''
+
+        for onset, notes in groupby(self.iter_notes(), key=attrgetter('onset')):
+            yield onset, [*notes]
+
+    def get_ticks(self):
+        ''' Length of the longest part in utils.TICKS_PER_WHOLE, walks every part once '''
+        return max([sum([sum(rhythm.ticks) for rhythm in iter_compact(source)]) for source in self.parts.values()], default=0)
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                     MIDI                                    #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class EnsembleWriter(MidiWriter):
+    ''' MidiWriter of an Ensemble, events of every part are merged into one track
+
+        Parameters
+            parts: {part name: MidiWriter kwargs}, note numbers and channels of each part
+                parts not listed are written with the kwargs of the EnsembleWriter
+            kwargs: see midi.MidiWriter '''
+
+    def __init__(self, parts=None, **kwargs):
+
+        super().__init__(**kwargs)
+        self.default_writer = MidiWriter(**kwargs)
+        self.part_writers = {name: MidiWriter(**{**kwargs, **settings}) for name, settings in (parts or {}).items()}
+
+    def iter_events(self, ensemble):
+        ''' Yield (tick, message) of every part in time order
+            Parts on the same key, as every part is by default, are merged after the parts are, a
+            stroke of one part never cuts off a stroke of another, see midi.merge_voices
+            heapq.merge needs every part sorted by the same key, MidiWriter.iter_strokes yields them by event_order '''
+
+        strokes = [self.part_writers.get(name, self.default_writer).iter_strokes(source) for name, source in ensemble.parts.items()]
+        return merge_voices(heapq.merge(*strokes, key=event_order))
+
+
+def ensemble_midi_bytes(ensemble, bpm=120, time_signature=(4, 4), title=None, **kwargs):
+    ''' Standard MIDI File bytes of an Ensemble, kwargs are passed to EnsembleWriter '''
+
+    header = b'MThd' + (6).to_bytes(4, 'big') + (0).to_bytes(2, 'big') + (1).to_bytes(2, 'big') + DIVISION.to_bytes(2, 'big')
+    return header + EnsembleWriter(**kwargs).track(ensemble, bpm, time_signature, title)
+
+def write_ensemble_midi(ensemble, file, **kwargs):
+    ''' Write an Ensemble to a binary file-like object, kwargs are passed to ensemble_midi_bytes '''
+    file.write(ensemble_midi_bytes(ensemble, **kwargs))
@@ -0,0 +1,184 @@
+''' Undo and redo for editing rudiments
+
+    Every edit made through a Journal is applied and recorded with its inverse, so undo and redo
+    only redo the work of that one edit, no history is replayed and nothing is snapshotted.
+    The oldest edits are dropped once max_edits are kept
+
+    journal = Journal()
+    journal.set_sticking(rhythm, 'RLRL')
+    journal.add_modifier(rhythm.notes[0], Accent())
+    journal.undo()   # back to no Accent
+    journal.redo()
+
+    Edits change Rhythm and Note objects in place, detach copies shared by a copy on write
+    MultiRhythm before editing them. Edits made without the Journal are not undone
+'''
+from collections import deque, namedtuple
+
+# One recorded edit, undo and redo are (function, args)
+Edit = namedtuple('Edit', ['name', 'undo', 'redo'])
+
+
+def move_modulator(rhythm, name, position):
+    ''' Move one modulator to the Note at position
+        Returns (old position, old Note, index in its modifiers, index in its articulations)
+        The old Note is kept as well as the position, a modulator left on a removed Note is taken off it '''
+
+    old = rhythm.get_modulator_position(name)
+    modifier = rhythm.modulators[name]
+    note = getattr(modifier, '_note', None)
+    indices = (None, None)
+    if note != None:
+        indices = (next(i for i, mod in enumerate(note.modifiers) if mod is modifier),
+                   next((i for i, art in enumerate(note.articulations) if art is modifier), None))
+
+    rhythm.set_modulator_position(position, name)
+    return (old, note, *indices)
+
+def restore_modulator(rhythm, name, position, old, note, index, articulation_index):
+    ''' Inverse of move_modulator, puts the modulator back in its place on the old Note '''
+
+    modifier = rhythm.modulators[name]
+    rhythm._notes[position].pop_modifier(modifier)
+    if note != None: note.insert_modifier(index, modifier, articulation_index)
+    rhythm._modulator_positions[name] = old
+
+def run(*calls):
+    for function, args in calls:
+        function(*args)
+
+
+class Journal:
+    ''' Edits with their inverses, max_edits caps how many are kept for undo '''
+
+    def __init__(self, max_edits=1000):
+
+        self.undo_edits = deque(maxlen=max_edits)
+        self.redo_edits = []
+
+    def __len__(self):
+        return len(self.undo_edits)
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_edits)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_edits)
+
+    def record(self, name, undo, redo):
+        ''' Keep an edit that has already been applied, a new edit ends the redo history '''
+
+        self.undo_edits.append(Edit(name, undo, redo))
+        self.redo_edits.clear()
+
+    def undo(self):
+        ''' Undo the last edit, returns its name or None when there is nothing to undo '''
+
+        if not self.undo_edits: return None
+        edit = self.undo_edits.pop()
+        function, args = edit.undo
+        function(*args)
+        self.redo_edits.append(edit)
+        return edit.name
+
+    def redo(self):
+        ''' Redo the last undone edit, returns its name or None when there is nothing to redo '''
+
+        if not self.redo_edits: return None
+        edit = self.redo_edits.pop()
+        function, args = edit.redo
+        function(*args)
+        self.undo_edits.append(edit)
+        return edit.name
+
+    def clear(self):
+        self.undo_edits.clear()
+        self.redo_edits.clear()
+
+    #########################################
+    #             Rhythm Edits              #
+    #########################################
+
+    def add_note(self, rhythm, *args, **kwargs):
+        ''' Rhythm.add_note '''
+
+        rhythm.add_note(*args, **kwargs)
+        note = rhythm._notes[-1]
+        self.record('add_note', (rhythm.remove_note, (len(rhythm._notes) - 1,)), (rhythm.add, (note,)))
+        return note
+
+    def remove_note(self, rhythm, position=-1):
+        ''' Rhythm.remove_note '''
+
+        position %= len(rhythm._notes)
+        note = rhythm.remove_note(position)
+        self.record('remove_note', (rhythm.insert_note, (position, note)), (rhythm.remove_note, (position,)))
+        return note
+
+    def set_sticking(self, rhythm, new_sticking):
+        ''' Rhythm.set_sticking '''
+
+        old_sticking = rhythm.sticking
+        rhythm.set_sticking(new_sticking)
+        self.record('set_sticking', (rhythm.set_sticking, (old_sticking,)), (rhythm.set_sticking, (new_sticking,)))
+
+    def set_duration(self, rhythm, *new_durations):
+        ''' Rhythm.set_duration '''
+
+        old_durations = [note._duration_default.duration for note in rhythm._notes]
+        rhythm.set_duration(*new_durations)
+        self.record('set_duration', (rhythm.set_duration, old_durations), (rhythm.set_duration, new_durations))
+
+    def add_modulator(self, rhythm, modifier, position=None, name=None):
+        ''' Rhythm.add_modulator, a modulator it replaces is put back by undo '''
+
+        replaced = (rhythm.modulators[name], rhythm._modulator_positions.get(name)) if name in rhythm.modulators else None
+        rhythm.add_modulator(modifier, position, name)
+
+        # Shared modifiers are replaced by their own copy, redo adds that copy again
+        name = name if name != None else next(reversed(rhythm.modulators))
+        added = rhythm.modulators[name]
+
+        def undo():
+            if replaced == None:
+                rhythm.remove_modulator(name)
+                return
+
+            # Set the name back in place, modulators keep their order
+            position = rhythm.get_modulator_position(name)
+            if position != None: rhythm._notes[position].pop_modifier(added)
+            rhythm.modulators[name], rhythm._modulator_positions[name] = replaced
+
+        self.record('add_modulator', (undo, ()), (rhythm.add_modulator, (added, position, name)))
+
+    def modulate(self, rhythm, direction='forward', name=None):
+        ''' Rhythm.modulate, undo puts every modulator back in its place on the Note it left '''
+
+        moves = rhythm.get_modulator_moves(direction, name)
+        restores = [(restore_modulator, (rhythm, modulator, new, *move_modulator(rhythm, modulator, new)))
+                    for modulator, _, new in moves]
+
+        self.record('modulate', (run, restores[::-1]), (run, [(move_modulator, (rhythm, modulator, new)) for modulator, _, new in moves]))
+
+    #########################################
+    #              Note Edits               #
+    #########################################
+
+    def add_modifier(self, note, modifier):
+        ''' Note.add_modifier '''
+
+        note.add_modifier(modifier)
+        index = max([i for i, mod in enumerate(note.modifiers) if mod is modifier])
+        self.record('add_modifier', (note.pop_modifier, (modifier, index)), (note.add_modifier, (modifier,)))
+
+    def remove_modifier(self, note, name):
+        ''' Note.remove_modifier '''
+
+        modifier = next((mod for mod in note.modifiers if mod.name == name), None)
+        if modifier == None: raise Exception(f"No {name} modifier on {note}")
+
+        index, articulation_index = note.pop_modifier(modifier)
+        self.record('remove_modifier', (note.insert_modifier, (index, modifier, articulation_index)), (note.pop_modifier, (modifier,)))
+        return modifier
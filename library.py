@@ -0,0 +1,256 @@
+''' Versioned binary library of rhythms and grids, read through mmap
+
+    A library is written once and opened without reading it, entries are decoded one at a time
+    as they are indexed, so a multi GB file opens instantly
+
+    with LibraryWriter('grids.gbl') as writer:
+        writer.add(make_16th_note_grid(rhythm, copy_on_write=True), 'paradiddle grid')
+
+    with Library('grids.gbl') as library:
+        grid = library[0]                   # CompactMultiRhythm
+        grid.to_multi_rhythm()              # music21 backed MultiRhythm
+
+    Layout, little endian
+        header      HEADER: magic, version, entry count, index offset
+        entries     one after another, see ENTRY
+        index       entry offsets, uint64 each
+
+    Entry
+        ENTRY       kind, modulator count, name length, Note count, action count, default duration
+        name        utf-8
+        modulators  MODULATOR (modifier code, name type, name length) + utf-8 name, ids are their order
+                    name type is NAME_TYPES of the Rhythm.modulators key, str or int (modifier.id)
+        notes       NOTE per Note of the seed rhythm: ticks, sticking, dynamic, modulator ids bitmask, modifier bitmask
+        actions     ACTION per MultiRhythm action: operation, direction, modulator id or -1 for all, copies
+
+    Grids are stored as their seed rhythm and actions log, rhythms are rebuilt by replaying the actions
+    Version 1 modulators have no name type, their names are read as str
+'''
+import mmap
+import struct
+
+try:
+    from .CompactRhythms import CompactRhythm, CompactMultiRhythm
+except ImportError:
+    from CompactRhythms import CompactRhythm, CompactMultiRhythm
+
+MAGIC = b'GBLB'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHHIQ') # magic, version, reserved, entry count, index offset
+ENTRY = struct.Struct('<BBHIId') # kind, modulator count, name length, Note count, action count, default duration
+MODULATOR = struct.Struct('<BBH') # modifier code, name type, name length
+MODULATOR_V1 = struct.Struct('<BH') # modifier code, name length
+NOTE = struct.Struct('<iBbHI') # ticks, sticking code, dynamic, modulator ids, modifier bitmask
+ACTION = struct.Struct('<BBhI') # operation, direction, modulator id, copies
+OFFSET = struct.Struct('<Q')
+
+# Entry kinds
+RHYTHM, MULTI_RHYTHM = 0, 1
+
+OPERATIONS = {'copy': 0, 'modulate': 1}
+OPERATION_NAMES = {code: name for name, code in OPERATIONS.items()}
+DIRECTIONS = {'forward': 0, 'backward': 1}
+DIRECTION_NAMES = {code: name for name, code in DIRECTIONS.items()}
+NAME_TYPES = {str: 0, int: 1}
+NAME_TYPE_CODES = {code: name_type for name_type, code in NAME_TYPES.items()}
+
+# Modulator ids are bits of NOTE's uint16
+MAX_MODULATORS = 16
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Writing                                   #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def to_compact(item):
+    ''' CompactRhythm or CompactMultiRhythm for any rhythm type '''
+
+    if isinstance(item, (CompactRhythm, CompactMultiRhythm)): return item
+    if hasattr(item, 'actions'):
+        # Only the seed and actions are stored, the rhythms do not need converting
+        return CompactMultiRhythm(CompactRhythm.from_rhythm(item.default_rhythm), [*item.actions])
+    return CompactRhythm.from_rhythm(item)
+
+def encode_entry(item, name=''):
+    ''' Bytes of one entry '''
+
+    compact = to_compact(item)
+    multi = isinstance(compact, CompactMultiRhythm)
+    rhythm = compact.default_rhythm if multi else compact
+    actions = compact.actions if multi else []
+
+    if len(rhythm.modulators) > MAX_MODULATORS:
+        raise Exception(f"{len(rhythm.modulators)} modulators in rhythm, the library format holds up to {MAX_MODULATORS}")
+
+    modulator_ids = {modulator_name: i for i, modulator_name in enumerate(rhythm.modulators)}
+    modulator_bits = [0] * len(rhythm)
+    modulators = []
+    for modulator_name, (code, position) in rhythm.modulators.items():
+        if type(modulator_name) not in NAME_TYPES:
+            raise Exception(f"Modulator name {modulator_name!r} is a {type(modulator_name).__name__}, the library format holds str and int names")
+        encoded = str(modulator_name).encode()
+        modulators.append(MODULATOR.pack(code, NAME_TYPES[type(modulator_name)], len(encoded)) + encoded)
+        if position != None: modulator_bits[position] |= 1 << modulator_ids[modulator_name]
+
+    encoded_name = name.encode()
+    parts = [ENTRY.pack(MULTI_RHYTHM if multi else RHYTHM, len(modulators), len(encoded_name), len(rhythm), len(actions), rhythm.default_duration),
+             encoded_name, *modulators]
+
+    parts.extend([NOTE.pack(*note) for note in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, modulator_bits, rhythm.modifier_masks)])
+
+    for operation, call in actions:
+        call = dict(call)
+        modulator = call.get('name')
+        parts.append(ACTION.pack(OPERATIONS[operation], DIRECTIONS[call.get('direction', 'forward')],
+                                 -1 if modulator == None else modulator_ids[modulator], call.get('copies', 1)))
+
+    return b''.join(parts)
+
+
+class LibraryWriter:
+    ''' Write entries to a new library file one at a time, the index is written on close '''
+
+    def __init__(self, path):
+
+        self.file = open(path, 'wb')
+        self.offsets = []
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, item, name=''):
+        ''' Add a Rhythm, MultiRhythm or their compact versions, returns its index in the library '''
+
+        self.offsets.append(self.file.tell())
+        self.file.write(encode_entry(item, name))
+        return len(self.offsets) - 1
+
+    def close(self):
+        if self.file.closed: return
+
+        index_offset = self.file.tell()
+        self.file.write(b''.join([OFFSET.pack(offset) for offset in self.offsets]))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), index_offset))
+        self.file.close()
+
+def write_library(path, items):
+    ''' Write a library of items, each a rhythm or a (name, rhythm) pair '''
+
+    with LibraryWriter(path) as writer:
+        for item in items:
+            writer.add(*(item[::-1] if type(item) == tuple else (item,)))
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Reading                                   #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class Library:
+    ''' Read only view of a library file, entries are decoded when indexed '''
+
+    def __init__(self, path):
+
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, _, self.count, self.index_offset = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise Exception(f"{path} is not a rhythm library")
+        if self.version > VERSION:
+            self.close()
+            raise Exception(f"{path} is library version {self.version}, this reader supports up to {VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def __getitem__(self, index):
+
+        if index < 0: index += self.count
+        if not 0 <= index < self.count: raise IndexError(f"library index {index} out of range")
+
+        return self.decode(self.get_offset(index))[1]
+
+    def get_offset(self, index):
+        return OFFSET.unpack_from(self.data, self.index_offset + index * OFFSET.size)[0]
+
+    def get_name(self, index):
+        offset = self.get_offset(index)
+        name_length = ENTRY.unpack_from(self.data, offset)[2]
+        return bytes(self.data[offset + ENTRY.size:offset + ENTRY.size + name_length]).decode()
+
+    def names(self):
+        return [self.get_name(i) for i in range(self.count)]
+
+    def decode(self, offset):
+        ''' (name, CompactRhythm or CompactMultiRhythm) of the entry at offset '''
+
+        kind, modulator_count, name_length, note_count, action_count, default_duration = ENTRY.unpack_from(self.data, offset)
+        offset += ENTRY.size
+        name = bytes(self.data[offset:offset + name_length]).decode()
+        offset += name_length
+
+        modulators = []
+        for _ in range(modulator_count):
+            if self.version == 1:
+                (code, length), name_type = MODULATOR_V1.unpack_from(self.data, offset), NAME_TYPES[str]
+                offset += MODULATOR_V1.size
+            else:
+                code, name_type, length = MODULATOR.unpack_from(self.data, offset)
+                offset += MODULATOR.size
+            modulators.append((NAME_TYPE_CODES[name_type](bytes(self.data[offset:offset + length]).decode()), code))
+            offset += length
+
+        rhythm = CompactRhythm(default_duration)
+        positions = [None] * modulator_count
+        end = offset + note_count * NOTE.size
+        for i, (ticks, sticking, dynamic, modulator_bits, mask) in enumerate(NOTE.iter_unpack(self.data[offset:end])):
+            rhythm.ticks.append(ticks)
+            rhythm.sticking_codes.append(sticking)
+            rhythm.dynamics.append(dynamic)
+            rhythm.modifier_masks.append(mask)
+            while modulator_bits:
+                bit = modulator_bits & -modulator_bits
+                positions[bit.bit_length() - 1] = i
+                modulator_bits ^= bit
+        rhythm.modulators = {modulator_name: (code, position) for (modulator_name, code), position in zip(modulators, positions)}
+
+        if kind == RHYTHM: return name, rhythm
+
+        actions = []
+        for operation, direction, modulator, copies in ACTION.iter_unpack(self.data[end:end + action_count * ACTION.size]):
+            if OPERATION_NAMES[operation] == 'copy':
+                call = (('copies', copies), ('_save_action', True))
+            else:
+                call = (('direction', DIRECTION_NAMES[direction]), ('name', None if modulator == -1 else modulators[modulator][0]),
+                        ('copies', copies), ('_save_action', True))
+            actions.append((OPERATION_NAMES[operation], call))
+
+        return name, CompactMultiRhythm.replay(rhythm, actions)
+
+    def close(self):
+        if not self.data.closed: self.data.close()
+        self.file.close()
@@ -0,0 +1,374 @@
+''' Opt-in memory instrumentation of grid builds with tracemalloc
+
+    Nothing here runs unless a build is measured, grids built without it are not slowed down
+
+    grid, report = measure(make_16th_note_grid, make_flam_accent(), name='flam_accent')
+    save_report(report, 'flam_accent.json')
+    print(format_diff(diff_reports(load_report('before.json'), report)))
+
+    python memory.py --rudiment flam_accent --copy-on-write --output after.json
+    python memory.py --diff before.json after.json
+
+    Report
+        peak_bytes, retained_bytes: highest and final traced memory of the build
+        classes: retained bytes by the code that allocated them, the innermost method of Note, Rhythm,
+            MultiRhythm or a modifier class on the stack, music21.Duration for music21's duration
+            module and other for the rest. A deep copy counts toward the method that made it
+        actions: calls, net bytes and peak bytes above the start of every outermost MultiRhythm action
+        retained_actions: retained bytes allocated under copy, modulate and apply_actions
+        deepcopy: retained bytes allocated under the copy module
+        instances: live objects left by the build per class, every modifier subclass separately,
+            bytes are shallow sizes of the object and its __dict__
+        top_sites: source lines holding the most retained bytes
+'''
+import argparse
+import copy
+import gc
+import inspect
+import json
+import os
+import sys
+import tracemalloc
+
+import music21 as m21
+
+try:
+    from .MultiRhythms import *
+    from .Modifiers import BaseModifier
+    from .batch import RUDIMENTS
+    from .core import fill_16th_note_grid
+    from . import utils
+except ImportError:
+    from MultiRhythms import *
+    from Modifiers import BaseModifier
+    from batch import RUDIMENTS
+    from core import fill_16th_note_grid
+    import utils
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Frames kept per allocation, deep enough to reach the action from inside music21
+TRACEBACK_FRAMES = 64
+TOP_SITES = 20
+
+ACTIONS = ['copy', 'modulate', 'apply_actions']
+DURATION_FILE = m21.duration.__file__
+COPY_FILE = copy.__file__
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                 Attribution                                 #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def get_tracked_classes():
+    ''' Note, Rhythm, MultiRhythm and every modifier class '''
+
+    modifiers, pending = [], [BaseModifier]
+    while pending:
+        cls = pending.pop(0)
+        modifiers.append(cls)
+        pending.extend([sub for sub in cls.__subclasses__() if sub not in modifiers and sub not in pending])
+
+    return [Note, Rhythm, MultiRhythm, *modifiers]
+
+def get_code_ranges(function):
+    ''' (filename, first line, last line) of a function, decorators are unwrapped '''
+
+    code = getattr(inspect.unwrap(function), '__code__', None)
+    if code == None: return []
+    lines = [line for *_, line in code.co_lines() if line != None]
+    return [(code.co_filename, code.co_firstlineno, max(lines, default=code.co_firstlineno))]
+
+def get_class_ranges(cls):
+    ''' Code ranges of every function defined in the class body '''
+
+    ranges = []
+    for value in vars(cls).values():
+        if isinstance(value, (staticmethod, classmethod)): value = value.__func__
+        functions = [value.fget, value.fset, value.fdel] if isinstance(value, property) else [value]
+        for function in functions:
+            if callable(function): ranges.extend(get_code_ranges(function))
+    return ranges
+
+
+class Attribution:
+    ''' Maps allocation tracebacks to the class and action that made them '''
+
+    def __init__(self):
+
+        self.classes = {} # filename: [(first line, last line, class name)]
+        for cls in get_tracked_classes():
+            for filename, first, last in get_class_ranges(cls):
+                self.classes.setdefault(filename, []).append((first, last, cls.__name__))
+
+        self.actions = {}
+        for name in ACTIONS:
+            for filename, first, last in get_code_ranges(getattr(MultiRhythm, name)):
+                self.actions.setdefault(filename, []).append((first, last, name))
+
+        self._cache = {}
+
+    def lookup(self, scopes, frame):
+        key = (id(scopes), frame.filename, frame.lineno)
+        if key not in self._cache:
+            self._cache[key] = next((name for first, last, name in scopes.get(frame.filename, []) if first <= frame.lineno <= last), None)
+        return self._cache[key]
+
+    def get_class(self, traceback):
+        ''' Innermost tracked class on the stack '''
+
+        for frame in reversed(traceback):
+            if frame.filename == DURATION_FILE: return 'music21.Duration'
+            name = self.lookup(self.classes, frame)
+            if name != None: return name
+        return 'other'
+
+    def get_action(self, traceback):
+        ''' Outermost action on the stack, modulate copies inside its own call '''
+
+        for frame in traceback:
+            name = self.lookup(self.actions, frame)
+            if name != None: return name
+        return None
+
+
+def count_instances():
+    ''' {class name: [live objects, shallow bytes]} of tracked classes and music21 Durations '''
+
+    tracked = (*get_tracked_classes(), m21.duration.Duration)
+    counts = {}
+    for obj in gc.get_objects():
+        if not isinstance(obj, tracked): continue
+        name = 'music21.Duration' if isinstance(obj, m21.duration.Duration) else type(obj).__name__
+        count = counts.setdefault(name, [0, 0])
+        count[0] += 1
+        count[1] += sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+    return counts
+
+def short_path(filename):
+    if filename.startswith(ROOT): return os.path.relpath(filename, ROOT)
+    return os.path.join(*filename.split(os.sep)[-2:])
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Tracking                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class MemoryTracker:
+    ''' Context manager tracing allocations of everything run inside it, the report is built on exit
+
+        with MemoryTracker('grid') as tracker:
+            grid = make_16th_note_grid()
+        tracker.report
+
+        Objects have to be alive at exit to count as retained '''
+
+    def __init__(self, name=None, frames=TRACEBACK_FRAMES, top=TOP_SITES):
+
+        self.name = name
+        self.frames = frames
+        self.top = top
+        self.report = None
+
+    def __enter__(self):
+
+        if tracemalloc.is_tracing(): raise Exception('tracemalloc is already tracing, MemoryTracker can not be nested')
+
+        gc.collect()
+        self._instances = count_instances()
+
+        self.peak = 0
+        self.actions = {} # name: {calls, allocated_bytes, peak_bytes}
+        self._depth = 0
+        self._action_start = 0
+
+        utils.ACTION_HOOKS.append(self.on_action)
+        tracemalloc.start(self.frames)
+        self._start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+
+        utils.ACTION_HOOKS.remove(self.on_action)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, __file__),
+                                                              tracemalloc.Filter(False, tracemalloc.__file__)])
+        tracemalloc.stop()
+
+        self.report = self.build_report(snapshot, current)
+        return False
+
+    def on_action(self, name, phase, multi_rhythm):
+        ''' utils.ACTION_HOOKS hook, actions called by another action count toward it '''
+
+        if phase == 'start':
+            self._depth += 1
+            if self._depth > 1: return
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            tracemalloc.reset_peak()
+            self._action_start = current
+        else:
+            self._depth -= 1
+            if self._depth: return
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            stats = self.actions.setdefault(name, {'calls': 0, 'allocated_bytes': 0, 'peak_bytes': 0})
+            stats['calls'] += 1
+            stats['allocated_bytes'] += current - self._action_start
+            stats['peak_bytes'] = max(stats['peak_bytes'], peak - self._action_start)
+
+    def build_report(self, snapshot, current):
+
+        attribution = Attribution()
+        classes, actions, deepcopy_stats = {}, {}, {'bytes': 0, 'blocks': 0}
+        for trace in snapshot.traces:
+            for stats in [classes.setdefault(attribution.get_class(trace.traceback), {'bytes': 0, 'blocks': 0}),
+                          actions.setdefault(attribution.get_action(trace.traceback) or 'none', {'bytes': 0, 'blocks': 0}),
+                          *([deepcopy_stats] if any([frame.filename == COPY_FILE for frame in trace.traceback]) else [])]:
+                stats['bytes'] += trace.size
+                stats['blocks'] += 1
+
+        after = count_instances()
+        instances = {}
+        for name, (count, size) in after.items():
+            old_count, old_size = self._instances.get(name, (0, 0))
+            if count != old_count: instances[name] = {'count': count - old_count, 'bytes': size - old_size}
+
+        top_sites = [{'site': f"{short_path(stat.traceback[-1].filename)}:{stat.traceback[-1].lineno}", 'bytes': stat.size, 'blocks': stat.count}
+                     for stat in snapshot.statistics('lineno')[:self.top]]
+
+        return {'name': self.name,
+                'python': sys.version.split()[0],
+                'peak_bytes': self.peak - self._start,
+                'retained_bytes': current - self._start,
+                'classes': sort_stats(classes),
+                'actions': self.actions,
+                'retained_actions': sort_stats(actions),
+                'deepcopy': deepcopy_stats,
+                'instances': sort_stats(instances),
+                'top_sites': top_sites}
+
+
+def sort_stats(stats):
+    return dict(sorted(stats.items(), key=lambda item: -item[1]['bytes']))
+
+def measure(function, *args, name=None, **kwargs):
+    ''' Call function under a MemoryTracker, returns (result, report) '''
+
+    with MemoryTracker(name or getattr(function, '__name__', None)) as tracker:
+        result = function(*args, **kwargs)
+    return result, tracker.report
+
+def build(rudiment='flam_accent', duration=1/4, length=1, copy_on_write=False, lazy=False, closed_form=False):
+    ''' 16th note grid of a rudiment with an accent modulator, filled length times '''
+
+    rhythm = RUDIMENTS[rudiment](duration)
+    rhythm.add_modulator(Accent(), 0, 'accent')
+    grid = make_16th_note_grid(rhythm, copy_on_write, lazy, closed_form)
+    for _ in range(length - 1):
+        fill_16th_note_grid(grid, closed_form)
+    return grid
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Reports                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+def diff_stats(old, new, metrics):
+    ''' {name: {metric: new - old}} of every name in either, unchanged names are left out '''
+
+    diff = {}
+    for name in [*old, *[name for name in new if name not in old]]:
+        change = {metric: new.get(name, {}).get(metric, 0) - old.get(name, {}).get(metric, 0) for metric in metrics}
+        if any(change.values()): diff[name] = change
+    return diff
+
+def diff_reports(old, new):
+    ''' Change from an old report to a new one, positive values are growth '''
+
+    return {'old': old['name'],
+            'new': new['name'],
+            'peak_bytes': new['peak_bytes'] - old['peak_bytes'],
+            'retained_bytes': new['retained_bytes'] - old['retained_bytes'],
+            'classes': diff_stats(old['classes'], new['classes'], ['bytes', 'blocks']),
+            'actions': diff_stats(old['actions'], new['actions'], ['calls', 'allocated_bytes', 'peak_bytes']),
+            'retained_actions': diff_stats(old['retained_actions'], new['retained_actions'], ['bytes', 'blocks']),
+            'deepcopy': diff_stats({'deepcopy': old['deepcopy']}, {'deepcopy': new['deepcopy']}, ['bytes', 'blocks']).get('deepcopy', {}),
+            'instances': diff_stats(old['instances'], new['instances'], ['count', 'bytes'])}
+
+def format_report(report):
+
+    lines = [f"{report['name']}: peak {report['peak_bytes'] / 1024:.1f} KiB, retained {report['retained_bytes'] / 1024:.1f} KiB",
+             f"  deepcopy {report['deepcopy']['bytes'] / 1024:10.1f} KiB retained"]
+    lines += [f"  class  {name:<24} {stats['bytes'] / 1024:10.1f} KiB {stats['blocks']:8} blocks" for name, stats in report['classes'].items()]
+    lines += [f"  action {name:<24} {stats['calls']:6} calls {stats['allocated_bytes'] / 1024:10.1f} KiB net {stats['peak_bytes'] / 1024:10.1f} KiB peak"
+              for name, stats in report['actions'].items()]
+    lines += [f"  live   {name:<24} {stats['count']:8} {stats['bytes'] / 1024:10.1f} KiB" for name, stats in report['instances'].items()]
+    lines += [f"  site   {site['site']:<48} {site['bytes'] / 1024:10.1f} KiB" for site in report['top_sites']]
+    return '\n'.join(lines)
+
+def format_diff(diff):
+
+    lines = [f"{diff['old']} -> {diff['new']}: peak {diff['peak_bytes'] / 1024:+.1f} KiB, retained {diff['retained_bytes'] / 1024:+.1f} KiB"]
+    for section in ['classes', 'actions', 'retained_actions', 'instances']:
+        for name, change in diff[section].items():
+            lines.append(f"  {section:<16} {name:<24} " + ' '.join([f"{metric} {value:+}" for metric, value in change.items()]))
+    if diff['deepcopy']:
+        lines.append(f"  deepcopy bytes {diff['deepcopy']['bytes']:+} blocks {diff['deepcopy']['blocks']:+}")
+    return '\n'.join(lines)
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Memory report of a grid build, or the difference between two reports')
+    parser.add_argument('--rudiment', choices=[*RUDIMENTS], default='flam_accent')
+    parser.add_argument('--duration', type=float, default=1/4)
+    parser.add_argument('--length', type=int, default=1, help='times the grid is filled')
+    parser.add_argument('--copy-on-write', action='store_true')
+    parser.add_argument('--lazy', action='store_true')
+    parser.add_argument('--closed-form', action='store_true')
+    parser.add_argument('--name', default=None, help='report name (default: the build settings)')
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'), default=None, help='compare two saved reports instead of building')
+    args = parser.parse_args(args)
+
+    if args.diff:
+        diff = diff_reports(*[load_report(path) for path in args.diff])
+        print(json.dumps(diff, indent=2) if args.json else format_diff(diff))
+        return
+
+    settings = {'rudiment': args.rudiment, 'duration': args.duration, 'length': args.length,
+                'copy_on_write': args.copy_on_write, 'lazy': args.lazy, 'closed_form': args.closed_form}
+    name = args.name or ' '.join([f"{key}={value}" for key, value in settings.items()])
+    grid, report = measure(build, name=name, **settings)
+
+    if args.output: save_report(report, args.output)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+''' Direct Standard MIDI File writer for snare parts, without music21
+
+    Walks a Rhythm, MultiRhythm or their compact versions in one pass and writes a format 0 file.
+    Every Note becomes its strokes: grace strokes before the beat for flams and drags, tremolo
+    strokes for diddles and buzzes and one stroke per hand for 'B'. Velocities come from the Note
+    dynamic, modifier dynamics and accents
+
+    with open('grid.mid', 'wb') as f:
+        write_midi(make_16th_note_grid(), f, bpm=90, notes={'R': 38, 'L': 40})
+
+    Events of a rhythm are built once, copies of a shared rhythm only shift them in time
+'''
+from functools import lru_cache
+import heapq
+
+try:
+    from .CompactRhythms import STICKING_NAMES, iter_compact
+    from .utils import (ACCENT_BOOST, DYNAMICS, GRACE_NOTES, GRACE_TICKS, MODIFIER_CODES, MODIFIER_DYNAMICS,
+                        TICKS_PER_WHOLE, TREMOLO_STROKES)
+except ImportError:
+    from CompactRhythms import STICKING_NAMES, iter_compact
+    from utils import (ACCENT_BOOST, DYNAMICS, GRACE_NOTES, GRACE_TICKS, MODIFIER_CODES, MODIFIER_DYNAMICS,
+                       TICKS_PER_WHOLE, TREMOLO_STROKES)
+
+# Ticks per quarter note, one MIDI tick per tick so timing is exact
+DIVISION = TICKS_PER_WHOLE // 4
+
+# General MIDI acoustic snare on the percussion channel
+NOTES = {'R': 38, 'L': 38}
+CHANNELS = {'R': 9, 'L': 9}
+
+# Ticks a stroke sounds for, shorter than the closest grace strokes
+GATE_TICKS = GRACE_TICKS // 2
+
+HANDS = {'R': ('R',), 'L': ('L',), 'B': ('R', 'L')}
+OTHER_HAND = {'R': ('L',), 'L': ('R',), 'B': ('R', 'L')}
+
+ACCENT = 1 << MODIFIER_CODES['accent']
+GRACES = [(1 << MODIFIER_CODES[name], count) for name, count in GRACE_NOTES.items()]
+TREMOLOS = [(1 << MODIFIER_CODES[name], count) for name, count in TREMOLO_STROKES.items()]
+SET_DYNAMICS = [(1 << MODIFIER_CODES[name], dynamic) for name, dynamic in MODIFIER_DYNAMICS.items()]
+
+# Grace strokes of a Note start at most this many ticks before it
+MAX_LEAD = max(GRACE_NOTES.values()) * GRACE_TICKS
+
+NOTE_OFF, NOTE_ON = 0x80, 0x90
+
+
+def event_order(event):
+    ''' Sort key of (tick, message) events, note offs before note ons at the same tick '''
+    return event[0], event[1][0] & 0xF0 == NOTE_ON
+
+def merge_voices(events):
+    ''' Yield (tick, message) of events sorted by event_order with every key sounding at most once
+
+        Strokes on the same channel and note at the same tick are sent as one, the first. A key
+        struck while it sounds is sent a note off and struck again, and its note off is sent with
+        the last note off of the strokes sounding on it, so no stroke is cut short by another's '''
+
+    sounding = {} # channel << 7 | note: strokes sounding
+    struck, struck_tick = set(), None # keys struck at struck_tick
+    for tick, message in events:
+        key = (message[0] & 0x0F) << 7 | message[1]
+
+        if message[0] & 0xF0 != NOTE_ON:
+            count = sounding[key] - 1
+            if count: sounding[key] = count
+            else:
+                del sounding[key]
+                yield tick, message
+            continue
+
+        if tick != struck_tick: struck, struck_tick = set(), tick
+        count = sounding.get(key, 0)
+        sounding[key] = count + 1
+        if key in struck: continue
+        struck.add(key)
+
+        if count: yield tick, bytes([NOTE_OFF | message[0] & 0x0F, message[1], 0])
+        yield tick, message
+
+
+def get_strokes(ticks, sticking='R', dynamic=3, mask=0, grace_dynamic=DYNAMICS['pp']):
+    ''' (offset in ticks from the Note start, hand, dynamic) of every stroke a Note plays
+        mask: modifier bitmask with modulators included, see CompactRhythm.get_masks '''
+
+    # Modulators are not applied to the dynamics column, modifier dynamics are set again here
+    for bit, value in SET_DYNAMICS:
+        if mask & bit: dynamic = value
+    if mask & ACCENT: dynamic = min(DYNAMICS['ff'], dynamic + ACCENT_BOOST)
+
+    strokes = []
+    for bit, count in GRACES:
+        if mask & bit:
+            strokes.extend([(-i * GRACE_TICKS, hand, grace_dynamic) for i in range(count, 0, -1) for hand in OTHER_HAND[sticking]])
+
+    count = 1
+    for bit, tremolo in TREMOLOS:
+        if mask & bit: count = tremolo
+    strokes.extend([(i * ticks // count, hand, dynamic) for i in range(count) for hand in HANDS[sticking]])
+
+    return strokes
+
+def to_velocity(dynamic):
+    ''' MIDI velocity of a utils.DYNAMICS value, ff is 127 '''
+    return max(1, min(127, round(dynamic * 127 / DYNAMICS['ff'])))
+
+@lru_cache(maxsize=None)
+def encode_varlen(value):
+    ''' MIDI variable length quantity '''
+
+    data = [value & 0x7F]
+    value >>= 7
+    while value:
+        data.append(0x80 | value & 0x7F)
+        value >>= 7
+    return bytes(data[::-1])
+
+def meta_event(kind, data):
+    return b'\x00\xff' + bytes([kind]) + encode_varlen(len(data)) + data
+
+
+class MidiWriter:
+    ''' Builds MIDI events of rhythms, settings are validated once
+
+        Parameters
+            notes: {'R': note number, 'L': note number}
+            channels: {'R': channel, 'L': channel}, 0 based, 9 is General MIDI percussion
+            grace_dynamic: utils.DYNAMICS value of grace strokes
+            gate: ticks every stroke sounds for '''
+
+    def __init__(self, notes=None, channels=None, grace_dynamic=DYNAMICS['pp'], gate=GATE_TICKS):
+
+        self.notes = {**NOTES, **(notes or {})}
+        self.channels = {**CHANNELS, **(channels or {})}
+        for hand in ['R', 'L']:
+            if not 0 <= self.notes[hand] < 128: raise Exception(f"Invalid note number {self.notes[hand]} for {hand}")
+            if not 0 <= self.channels[hand] < 16: raise Exception(f"Invalid channel {self.channels[hand]} for {hand}")
+        if gate < 1: raise Exception(f"gate must be at least 1 tick, value {gate} passed")
+
+        self.grace_dynamic = grace_dynamic
+        self.gate = gate
+
+    def get_rhythm_events(self, rhythm):
+        ''' (sorted (tick, order, message) from the rhythm start, rhythm length in ticks)
+            Grace strokes before the first Note have negative ticks, note offs sort before note ons '''
+
+        events, onset = [], 0
+        for ticks, sticking, dynamic, mask in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, rhythm.get_masks()):
+            for offset, hand, stroke_dynamic in get_strokes(ticks, STICKING_NAMES[sticking], dynamic, mask, self.grace_dynamic):
+                channel, note = self.channels[hand], self.notes[hand]
+                events.append((onset + offset, 1, bytes([NOTE_ON | channel, note, to_velocity(stroke_dynamic)])))
+                events.append((onset + offset + self.gate, 0, bytes([NOTE_OFF | channel, note, 0])))
+            onset += ticks
+
+        events.sort()
+        return events, onset
+
+    def iter_events(self, source):
+        ''' Yield (tick, message) in time order for a Rhythm, MultiRhythm or their compact versions
+            Strokes sharing a key, 'B' when R and L are the same note, are merged, see merge_voices '''
+        return merge_voices(self.iter_strokes(source))
+
+    def iter_strokes(self, source):
+        ''' Yield (tick, message) of every stroke, strokes on the same key can overlap
+            Events are sorted by event_order, at the same tick note offs come first
+            Grace strokes before the start of the source are dropped with their note offs, the
+            first Note plays on tick 0 without them '''
+
+        pending, start = [], 0
+        last, events, length = None, None, 0
+        for rhythm in iter_compact(source):
+            if rhythm is not last:
+                last, (events, length) = rhythm, self.get_rhythm_events(rhythm)
+
+            # Nothing from this rhythm on starts earlier than its grace strokes
+            while pending and pending[0][0] < start - MAX_LEAD:
+                tick, _, message = heapq.heappop(pending)
+                yield tick, message
+
+            for tick, order, message in events:
+                # Note offs are gate ticks after their stroke
+                if start < MAX_LEAD and start + tick - (0 if order else self.gate) < 0: continue
+                heapq.heappush(pending, (start + tick, order, message))
+            start += length
+
+        while pending:
+            tick, _, message = heapq.heappop(pending)
+            yield tick, message
+
+    def track(self, source, bpm=120, time_signature=(4, 4), title=None):
+        ''' Bytes of the MTrk chunk '''
+
+        beats, beat_unit = time_signature
+        data = bytearray()
+        if title: data += meta_event(0x03, title.encode())
+        data += meta_event(0x51, round(60_000_000 / bpm).to_bytes(3, 'big'))
+        data += meta_event(0x58, bytes([beats, beat_unit.bit_length() - 1, 24, 8]))
+
+        last = 0
+        for tick, message in self.iter_events(source):
+            data += encode_varlen(tick - last)
+            data += message
+            last = tick
+
+        data += meta_event(0x2F, b'')
+        return b'MTrk' + len(data).to_bytes(4, 'big') + bytes(data)
+
+
+def midi_bytes(source, bpm=120, time_signature=(4, 4), title=None, **kwargs):
+    ''' Standard MIDI File bytes for a Rhythm, MultiRhythm or their compact versions, kwargs are passed to MidiWriter '''
+
+    header = b'MThd' + (6).to_bytes(4, 'big') + (0).to_bytes(2, 'big') + (1).to_bytes(2, 'big') + DIVISION.to_bytes(2, 'big')
+    return header + MidiWriter(**kwargs).track(source, bpm, time_signature, title)
+
+def write_midi(source, file, **kwargs):
+    ''' Write a Standard MIDI File to a binary file-like object, kwargs are passed to midi_bytes '''
+    file.write(midi_bytes(source, **kwargs))
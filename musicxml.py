@@ -0,0 +1,143 @@
+''' Streaming MusicXML writer for unpitched snare parts
+
+    Walks a Rhythm, MultiRhythm or their compact versions one rhythm at a time and yields one
+    measure of MusicXML at a time, so memory does not grow with the length of the grid
+
+    with open('grid.musicxml', 'w') as f:
+        write_musicxml(make_16th_note_grid(), f)
+'''
+from fractions import Fraction
+from xml.sax.saxutils import escape
+
+try:
+    from .CompactRhythms import DOT_CODES, STICKING_NAMES, iter_compact, mask_codes
+    from .utils import DYNAMICS, DURATION_MULTIPLIERS, GRACE_NOTES, MODIFIER_CODES, TICKS_PER_WHOLE
+except ImportError:
+    from CompactRhythms import DOT_CODES, STICKING_NAMES, iter_compact, mask_codes
+    from utils import DYNAMICS, DURATION_MULTIPLIERS, GRACE_NOTES, MODIFIER_CODES, TICKS_PER_WHOLE
+
+# One division per tick, a tick count is also the MusicXML duration
+DIVISIONS = TICKS_PER_WHOLE // 4
+
+NOTE_TYPES = {Fraction(1, 2 ** power): name for power, name in enumerate(['whole', 'half', 'quarter', 'eighth', '16th', '32nd', '64th', '128th'])}
+
+# MusicXML element for each modifier code
+ARTICULATIONS = {MODIFIER_CODES['accent']: '<accent/>',
+                 MODIFIER_CODES['marcato']: '<strong-accent type="up"/>',
+                 MODIFIER_CODES['tenuto']: '<tenuto/>',
+                 MODIFIER_CODES['staccato']: '<staccato/>'}
+TREMOLOS = {MODIFIER_CODES['diddle']: '<tremolo type="single">1</tremolo>',
+            MODIFIER_CODES['buzz']: '<tremolo type="unmeasured">0</tremolo>'}
+GRACES = {MODIFIER_CODES[name]: count for name, count in GRACE_NOTES.items()}
+
+DYNAMIC_NAMES = {value: name for name, value in DYNAMICS.items()}
+OTHER_HAND = {'R': 'L', 'L': 'R', 'B': 'B'}
+
+UNPITCHED = '<unpitched><display-step>C</display-step><display-octave>5</display-octave></unpitched>'
+
+HEADER = '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" "http://www.musicxml.org/dtds/partwise.dtd">
+<score-partwise version="4.0">
+{title}  <part-list>
+    <score-part id="P1"><part-name>{part_name}</part-name></score-part>
+  </part-list>
+  <part id="P1">
+'''
+FOOTER = '''  </part>
+</score-partwise>
+'''
+
+
+def get_note_type(ticks, codes):
+    ''' MusicXML type, dot count and (actual, normal) tuplet ratio or None for a Note length '''
+
+    length = Fraction(ticks, TICKS_PER_WHOLE)
+    dots = 0
+    for code, multiplier in DOT_CODES.items():
+        if code in codes:
+            length /= Fraction(multiplier)
+            dots = 1 if multiplier == DURATION_MULTIPLIERS['dot'] else 2
+
+    # Tuplets: the odd part of the denominator is played in the time of the next lower power of two
+    actual = length.denominator
+    while actual % 2 == 0: actual //= 2
+    normal = 2 ** (actual.bit_length() - 1)
+    written = length * actual / normal
+
+    if written not in NOTE_TYPES:
+        raise Exception(f"Note length {length} has no MusicXML note type")
+
+    return NOTE_TYPES[written], dots, (actual, normal) if actual > 1 else None
+
+def note_musicxml(ticks, sticking='R', mask=0, dynamic=None):
+    ''' MusicXML for one Note and the grace notes in front of it
+        dynamic: add a dynamics direction before the Note, one of the utils.DYNAMICS values '''
+
+    codes = mask_codes(mask)
+    note_type, dots, tuplet = get_note_type(ticks, codes)
+    parts = []
+
+    if dynamic in DYNAMIC_NAMES:
+        parts.append(f'<direction placement="below"><direction-type><dynamics><{DYNAMIC_NAMES[dynamic]}/></dynamics></direction-type></direction>')
+
+    # Grace notes are played by the other hand
+    for code, count in GRACES.items():
+        if code not in codes: continue
+        for i in range(count):
+            parts.append(f'<note><grace slash="{"yes" if count == 1 else "no"}"/>{UNPITCHED}<voice>1</voice><type>{"eighth" if count == 1 else "16th"}</type>'
+                         f'<stem>up</stem><lyric><text>{OTHER_HAND[sticking].lower()}</text></lyric></note>')
+
+    note = [f'<note>{UNPITCHED}<duration>{ticks}</duration><voice>1</voice><type>{note_type}</type>', '<dot/>' * dots]
+    if tuplet:
+        note.append(f'<time-modification><actual-notes>{tuplet[0]}</actual-notes><normal-notes>{tuplet[1]}</normal-notes></time-modification>')
+    note.append('<stem>up</stem>')
+
+    articulations = ''.join([ARTICULATIONS[code] for code in codes if code in ARTICULATIONS])
+    tremolos = ''.join([TREMOLOS[code] for code in codes if code in TREMOLOS])
+    if articulations or tremolos:
+        note.append('<notations>')
+        if articulations: note.append(f'<articulations>{articulations}</articulations>')
+        if tremolos: note.append(f'<ornaments>{tremolos}</ornaments>')
+        note.append('</notations>')
+
+    note.append(f'<lyric><text>{sticking}</text></lyric></note>')
+    parts.append(''.join(note))
+
+    return ''.join(parts)
+
+def iter_musicxml(source, time_signature=(4, 4), title=None, part_name='Snare'):
+    ''' Yield MusicXML text for a Rhythm, MultiRhythm or their compact versions, one measure at a time
+        Notes start in the measure they fall in, a Note crossing a bar line is not split '''
+
+    beats, beat_unit = time_signature
+    measure_ticks = TICKS_PER_WHOLE * beats // beat_unit
+
+    title = f"  <work><work-title>{escape(title)}</work-title></work>\n" if title else ''
+    yield HEADER.format(title=title, part_name=escape(part_name))
+
+    attributes = (f'<attributes><divisions>{DIVISIONS}</divisions><key><fifths>0</fifths></key>'
+                  f'<time><beats>{beats}</beats><beat-type>{beat_unit}</beat-type></time>'
+                  f'<clef><sign>percussion</sign></clef><staff-details><staff-lines>1</staff-lines></staff-details></attributes>')
+
+    measure, offset, number, dynamic = [], 0, 1, None
+    for rhythm in iter_compact(source):
+        for ticks, sticking, note_dynamic, mask in zip(rhythm.ticks, rhythm.sticking_codes, rhythm.dynamics, rhythm.get_masks()):
+
+            if offset >= measure_ticks:
+                yield f'    <measure number="{number}">{attributes if number == 1 else ""}{"".join(measure)}</measure>\n'
+                measure, offset, number = [], offset - measure_ticks, number + 1
+
+            measure.append(note_musicxml(ticks, STICKING_NAMES[sticking], mask, note_dynamic if note_dynamic != dynamic else None))
+            offset += ticks
+            dynamic = note_dynamic
+
+    if measure:
+        yield f'    <measure number="{number}">{attributes if number == 1 else ""}{"".join(measure)}</measure>\n'
+
+    yield FOOTER
+
+def write_musicxml(source, file, **kwargs):
+    ''' Write MusicXML to a text file-like object as it is generated, kwargs are passed to iter_musicxml '''
+
+    for text in iter_musicxml(source, **kwargs):
+        file.write(text)
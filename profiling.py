@@ -0,0 +1,290 @@
+''' Wall time and note counts of MultiRhythm actions and rudiment factories
+
+    Off by default. Enabling adds hooks to the utils.action and utils.rhythm_duration decorators, while
+    disabled the decorators only check that their hook list is empty. Every call is sent to the sinks
+    as a CallRecord, calls made inside another action or factory count toward it, a modulate includes
+    the copy it makes and make_paradiddlediddle the make_paradiddle it starts from
+
+    profiler = Profiler(MemorySink(), JsonLinesSink('calls.jsonl'))
+    with profiler:
+        make_16th_note_grid(make_flam_accent())
+    profiler.sinks[0].stats()
+
+    sink = PrometheusSink()
+    Profiler(sink).enable()
+    sink.serve(port=9100)   # GET /metrics
+
+    Sinks
+        MemorySink: histograms of seconds and notes per call, call counts and totals
+        JsonLinesSink: one JSON object per call written to a file
+        PrometheusSink: MemorySink with its histograms served in the Prometheus text format
+'''
+from bisect import bisect_left
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+try:
+    from . import utils
+except ImportError:
+    import utils
+
+# kind is 'action' or 'factory', notes are Notes added to the MultiRhythm or in the rhythm built
+CallRecord = namedtuple('CallRecord', ['time', 'kind', 'name', 'seconds', 'notes'])
+
+# Histogram upper bounds, 1 2.5 5 steps from a microsecond to 10 seconds and powers of 2 Notes
+SECONDS_BUCKETS = tuple(float(f"{base}e{exponent}") for exponent in range(-6, 1) for base in [1, 2.5, 5]) + (10.,)
+NOTE_BUCKETS = tuple(2 ** exponent for exponent in range(17))
+
+METRIC_PREFIX = 'grid_builder'
+
+
+class Histogram:
+    ''' Counts of values at or below each bound, values above the last bound are counted in +Inf '''
+
+    def __init__(self, bounds):
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        ''' [(bound, values at or below it)], the last bound is inf '''
+
+        total, buckets = 0, []
+        for bound, count in zip([*self.bounds, float('inf')], self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'buckets': {str(bound): count for bound, count in self.cumulative()}}
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Sinks                                    #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class MemorySink:
+    ''' Histograms of call seconds and Notes per (kind, name), safe to read while calls are recorded '''
+
+    def __init__(self, seconds_buckets=SECONDS_BUCKETS, note_buckets=NOTE_BUCKETS):
+
+        self.seconds_buckets = seconds_buckets
+        self.note_buckets = note_buckets
+        self.histograms = {} # (kind, name): (seconds Histogram, notes Histogram)
+        self.lock = threading.Lock()
+
+    def record(self, call):
+
+        with self.lock:
+            key = (call.kind, call.name)
+            if key not in self.histograms:
+                self.histograms[key] = (Histogram(self.seconds_buckets), Histogram(self.note_buckets))
+            seconds, notes = self.histograms[key]
+            seconds.observe(call.seconds)
+            notes.observe(call.notes)
+
+    def stats(self):
+        ''' {kind: {name: {calls, seconds, notes, seconds_histogram, notes_histogram}}} '''
+
+        with self.lock:
+            stats = {}
+            for (kind, name), (seconds, notes) in self.histograms.items():
+                stats.setdefault(kind, {})[name] = {'calls': seconds.count,
+                                                    'seconds': seconds.sum,
+                                                    'notes': notes.sum,
+                                                    'seconds_histogram': seconds.to_dict(),
+                                                    'notes_histogram': notes.to_dict()}
+            return stats
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    ''' Writes every call as a line of JSON
+        file: path, opened for appending, or a text file-like object, which is not closed by close '''
+
+    def __init__(self, file):
+
+        self.owned = isinstance(file, str)
+        self.file = open(file, 'a') if self.owned else file
+        self.lock = threading.Lock()
+
+    def record(self, call):
+
+        line = json.dumps(call._asdict()) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+
+        with self.lock:
+            if self.owned: self.file.close()
+            else: self.file.flush()
+
+
+class PrometheusSink(MemorySink):
+    ''' MemorySink exported in the Prometheus text format, render() or serve() it '''
+
+    def render(self):
+        ''' Prometheus text exposition of the histograms '''
+
+        with self.lock:
+            histograms = [(kind, name, seconds, notes) for (kind, name), (seconds, notes) in self.histograms.items()]
+
+        lines = []
+        for metric, index, help_text in [('call_seconds', 2, 'Wall time of MultiRhythm actions and rudiment factories'),
+                                         ('call_notes', 3, 'Notes added by MultiRhythm actions and built by rudiment factories')]:
+            metric = f"{METRIC_PREFIX}_{metric}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for entry in histograms:
+                labels = f'kind="{entry[0]}",name="{entry[1]}"'
+                histogram = entry[index]
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{labels},le="{format_bound(bound)}"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, host='127.0.0.1', port=9100):
+        ''' Serve GET /metrics from a daemon thread, returns the server, call shutdown() on it to stop '''
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = sink.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Profiler                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class Profiler:
+    ''' Times actions and rudiment factories while enabled and sends every call to the sinks
+        Calls are timed per thread, a MemorySink is used when no sink is given
+        Calls already running when it is enabled or disabled are not recorded '''
+
+    def __init__(self, *sinks):
+
+        self.sinks = [*sinks] or [MemorySink()]
+        self.local = threading.local()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    @property
+    def enabled(self):
+        return self.on_action in utils.ACTION_HOOKS
+
+    def enable(self):
+        if self.enabled: return
+        utils.ACTION_HOOKS.append(self.on_action)
+        utils.FACTORY_HOOKS.append(self.on_factory)
+
+    def disable(self):
+        if not self.enabled: return
+        utils.ACTION_HOOKS.remove(self.on_action)
+        utils.FACTORY_HOOKS.remove(self.on_factory)
+        # Calls still running never send their end, drop their entries in every thread
+        self.local = threading.local()
+
+    def close(self):
+        ''' Disable and close the sinks '''
+
+        self.disable()
+        for sink in self.sinks:
+            sink.close()
+
+    def get_stack(self):
+        if not hasattr(self.local, 'stack'): self.local.stack = []
+        return self.local.stack
+
+    def pop_entry(self, kind):
+        ''' Stack entry of the call ending, None when it is inside another call of its kind
+            A call that started before the profiler was enabled has no entry and is not recorded '''
+
+        stack = self.get_stack()
+        if not stack or stack[-1][0] != kind: return None
+        entry = stack.pop()
+        return None if any([other[0] == kind for other in stack]) else entry
+
+    def on_action(self, name, phase, multi_rhythm):
+        ''' utils.ACTION_HOOKS hook, Notes are the rhythms added times the Notes per rhythm '''
+
+        if phase == 'start':
+            self.get_stack().append(('action', time.perf_counter(), len(multi_rhythm.rhythms)))
+            return
+
+        entry = self.pop_entry('action')
+        if entry == None: return
+        _, start, rhythms = entry
+        seconds = time.perf_counter() - start
+        self.record('action', name, seconds, (len(multi_rhythm.rhythms) - rhythms) * len(multi_rhythm.default_rhythm))
+
+    def on_factory(self, name, phase, rhythm):
+        ''' utils.FACTORY_HOOKS hook, rhythm is None until it is built '''
+
+        if phase == 'start':
+            self.get_stack().append(('factory', time.perf_counter(), 0))
+            return
+
+        entry = self.pop_entry('factory')
+        if entry == None: return
+        _, start, _ = entry
+        seconds = time.perf_counter() - start
+        self.record('factory', name, seconds, 0 if rhythm == None else len(rhythm))
+
+    def record(self, kind, name, seconds, notes):
+
+        call = CallRecord(time.time(), kind, name, seconds, notes)
+        for sink in self.sinks:
+            sink.record(call)
@@ -0,0 +1,220 @@
+''' HTML table of a Rhythm or MultiRhythm in the layout of Rudiment.html
+
+    One column per Note (partial) with a Stroke row (multistroke, volume, buzz and flam selectors)
+    and a Sticking row (R/L/B checkboxes). Every cell has an id, so after an edit only the cells
+    whose Note changed are sent and swapped in the page with applyFragments
+
+    renderer = GridRenderer(multi_rhythm)
+    page = renderer.render_page('Paradiddle grid')
+    ...
+    multi_rhythm.rhythms[3].set_sticking('LRLL')
+    fragments = renderer.update(multi_rhythm) # {cell id: new cell HTML}
+'''
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+try:
+    from .CompactRhythms import CompactRhythm, STICKING_NAMES
+    from .utils import MODIFIER_CODES
+except ImportError:
+    from CompactRhythms import CompactRhythm, STICKING_NAMES
+    from utils import MODIFIER_CODES
+
+# Selector options of Rudiment.html, the first option of each is the default
+MULTISTROKE_OPTIONS = ['none', 'diddle', 'three stroke']
+VOLUME_OPTIONS = ['tap', 'accent', 'tenuto (half-accent)']
+BUZZ_OPTIONS = ['none', 'buzz', 'press buzz']
+FLAM_OPTIONS = ['none', 'flam', 'drag/ruff']
+
+# Option chosen by each modifier code, later entries win when a Note has more than one
+MULTISTROKES = {MODIFIER_CODES['diddle']: 'diddle'}
+VOLUMES = {MODIFIER_CODES['tenuto']: 'tenuto (half-accent)',
+           MODIFIER_CODES['staccato']: 'tenuto (half-accent)',
+           MODIFIER_CODES['accent']: 'accent',
+           MODIFIER_CODES['marcato']: 'accent'}
+BUZZES = {MODIFIER_CODES['buzz']: 'buzz'}
+FLAMS = {MODIFIER_CODES['flam']: 'flam',
+         MODIFIER_CODES['drag']: 'drag/ruff',
+         MODIFIER_CODES['three_stroke']: 'drag/ruff'}
+
+TABLE_ID = 'rudiment_grid'
+
+HEAD = '''<!DOCTYPE html>
+<html lang="en">
+
+<head>
+    <meta charset="utf-8" />
+    <title>{title}</title>
+    <!--Bootstrap CSS-->
+    <link href="https://stackpath.bootstrapcdn.com/bootstrap/4.1.3/css/bootstrap.min.css" rel="stylesheet" integrity="sha384-MCw98/SFnGE8fJT3GXwEOngsV7Zt27NXFoaoApmYm81iuXoPkFOJwJ8ERdknLPMO" crossorigin="anonymous">
+</head>
+
+<body>
+    <div class="table-responsive">
+'''
+FOOT = '''    </div>
+    <script type="text/javascript">
+        function onlyOne(checkbox) {
+            var checkboxes = document.getElementsByName(checkbox.name);
+            checkboxes.forEach((item) => {
+                if (item !== checkbox) item.checked = false
+            });
+        };
+        // Swap in cells sent by GridRenderer.update, {cell id: cell HTML}
+        function applyFragments(fragments) {
+            for (const [id, html] of Object.entries(fragments)) {
+                document.getElementById(id).outerHTML = html;
+            }
+        };
+    </script>
+</body>
+</html>
+'''
+
+CellState = namedtuple('CellState', ['sticking', 'multistroke', 'volume', 'buzz', 'flam'])
+
+
+def get_option(mask, options):
+    option = None
+    for code, name in options.items():
+        if mask & (1 << code): option = name
+    return option
+
+def get_cell_state(sticking, mask):
+    ''' Everything a column shows for a Note with a sticking name and modifier bitmask '''
+    return CellState(sticking,
+                     get_option(mask, MULTISTROKES) or MULTISTROKE_OPTIONS[0],
+                     get_option(mask, VOLUMES) or VOLUME_OPTIONS[0],
+                     get_option(mask, BUZZES) or BUZZ_OPTIONS[0],
+                     get_option(mask, FLAMS) or FLAM_OPTIONS[0])
+
+def get_note_state(note):
+    ''' CellState of a Note, modulators included '''
+
+    mask = 0
+    for modifier in note.modifiers:
+        mask |= 1 << modifier.code
+    return get_cell_state(note.sticking, mask)
+
+def get_cell_states(source):
+    ''' CellState of every Note in a Rhythm, MultiRhythm or their compact versions
+        Copies of a shared rhythm are read once '''
+
+    rhythms = source.rhythms if hasattr(source, 'rhythms') else [source]
+
+    states, last, rhythm_states = [], None, None
+    for rhythm in rhythms:
+        if rhythm is not last:
+            if isinstance(rhythm, CompactRhythm):
+                rhythm_states = [get_cell_state(STICKING_NAMES[sticking], mask) for sticking, mask in zip(rhythm.sticking_codes, rhythm.get_masks())]
+            else:
+                rhythm_states = [get_note_state(note) for note in rhythm._notes]
+            last = rhythm
+        states.extend(rhythm_states)
+
+    return states
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Cells                                    #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def select_html(select_id, label, options, selected):
+
+    choices = ''.join([f'<option{" selected" if option == selected else ""}>{escape(option)}</option>' for option in options])
+    return (f'<div class="form-group"><label for="{select_id}">{label}</label>'
+            f'<select class="form-control" id="{select_id}">{choices}</select></div>')
+
+def stroke_cell(column, state):
+    ''' Stroke row cell, column is the 1 based partial number '''
+
+    return (f'<td id="p{column}_stroke">'
+            f'{select_html(f"p{column}m", "Multistroke", MULTISTROKE_OPTIONS, state.multistroke)}'
+            f'{select_html(f"p{column}v", "Volume", VOLUME_OPTIONS, state.volume)}'
+            f'{select_html(f"p{column}b", "Buzz", BUZZ_OPTIONS, state.buzz)}'
+            f'{select_html(f"p{column}f", "Flam", FLAM_OPTIONS, state.flam)}'
+            '</td>')
+
+def sticking_cell(column, state):
+    ''' Sticking row cell, one checkbox per hand with the Note's sticking checked '''
+
+    boxes = ''.join([f'<div class="form-check"><label class="form-check-label">'
+                     f'<input type="checkbox" class="form-check-input" name="check{column}_1" value="{hand}1" onclick="onlyOne(this)"'
+                     f'{" checked" if hand == state.sticking else ""}>{hand}1</label></div>'
+                     for hand in ['R', 'L', 'B']])
+
+    return f'<td id="p{column}_sticking"><div class="container"><div class="row"><div class="col border">{boxes}</div></div></div></td>'
+
+def render_table(states):
+    ''' Table for a list of CellState '''
+
+    columns = range(1, len(states) + 1)
+    header = ''.join([f'<th scope="col"><center>{column}</center></th>' for column in columns])
+    strokes = ''.join([stroke_cell(column, state) for column, state in zip(columns, states)])
+    stickings = ''.join([sticking_cell(column, state) for column, state in zip(columns, states)])
+
+    return (f'        <table class="table table-border" id="{TABLE_ID}">\n'
+            f'            <thead><tr><th><center>Partial</center></th>{header}</tr></thead>\n'
+            f'            <tbody>\n'
+            f'                <tr><th scope="row"><center>Stroke</center></th>{strokes}</tr>\n'
+            f'                <tr><th scope="row"><center>Sticking</center></th>{stickings}</tr>\n'
+            f'            </tbody>\n'
+            f'        </table>\n')
+
+
+class GridRenderer:
+    ''' Renders a rhythm once and then only the cells that change
+
+        Parameters
+            source: Rhythm, MultiRhythm, CompactRhythm or CompactMultiRhythm '''
+
+    def __init__(self, source):
+
+        self.states = get_cell_states(source)
+
+    def render(self):
+        ''' HTML table of the current state '''
+        return render_table(self.states)
+
+    def render_page(self, title='Rudiment Builder'):
+        return HEAD.format(title=escape(title)) + self.render() + FOOT
+
+    def update(self, source):
+        ''' {cell id: cell HTML} for every cell that changed since the last render or update
+            A change in the number of Notes re-renders the table under its id '''
+
+        states = get_cell_states(source)
+        if len(states) != len(self.states):
+            self.states = states
+            return {TABLE_ID: self.render()}
+
+        fragments = {}
+        for column, (old, new) in enumerate(zip(self.states, states), 1):
+            if old == new: continue
+            fragments.update(self.get_column_fragments(column, old, new))
+
+        self.states = states
+        return fragments
+
+    def update_note(self, position, note):
+        ''' Fragments for one Note that is known to have changed, skips reading the rest of the grid
+            position: index of the Note in the whole grid '''
+
+        state = get_note_state(note)
+        old = self.states[position]
+        self.states[position] = state
+
+        return self.get_column_fragments(position + 1, old, state)
+
+    def get_column_fragments(self, column, old, new):
+
+        fragments = {}
+        if old.sticking != new.sticking:
+            fragments[f"p{column}_sticking"] = sticking_cell(column, new)
+        if old[1:] != new[1:]:
+            fragments[f"p{column}_stroke"] = stroke_cell(column, new)
+
+        return fragments
@@ -0,0 +1,228 @@
+''' Search a library of rhythms by sticking and modifier positions
+
+    Every distinct rhythm (sticking and modifier bitmasks) is a pattern. Grids repeat a few
+    patterns many times and a library repeats a few stickings many times, so the sticking
+    indexes are built over the distinct sticking strings only
+        suffixes: sorted (suffix, sticking id) of every distinct sticking, for substring queries
+        prefixes: sorted (sticking, sticking id), for prefix queries
+        reversed: sorted (reversed sticking, sticking id), for suffix queries
+        modifiers: {(modifier code, position): pattern ids}, positions from the end are negative
+    Inserts are buffered and merged into the sorted lists by the next query, so a run of
+    inserts costs one merge and nothing is rebuilt
+
+    index = RhythmIndex()
+    index.add(make_16th_note_grid(rhythm), 'paradiddle grid')
+    index.search(contains='RLRR', modifiers={0: 'accent'})  # pattern ids
+    index.search(modifiers={-1: 'flam'})                     # patterns ending in a flam
+    index.get_items(ids)                                    # {item key: [rhythm index, ...]}
+'''
+from bisect import bisect_left, insort
+
+try:
+    from .CompactRhythms import STICKING_NAMES, iter_compact
+    from .utils import MODIFIER_CODES
+except ImportError:
+    from CompactRhythms import STICKING_NAMES, iter_compact
+    from utils import MODIFIER_CODES
+
+# Up to this many new entries are inserted one by one, more are merged with a sort
+INSORT_LIMIT = 256
+
+# Sorts after every sticking character, closes a prefix range
+END = '\uffff'
+
+
+def merge(entries, new):
+    ''' Add new entries to a sorted list
+        A few are inserted in place, more are sorted and appended, sorting two sorted runs is a linear merge '''
+
+    if len(new) <= INSORT_LIMIT:
+        for entry in new:
+            insort(entries, entry)
+    else:
+        entries.extend(sorted(new))
+        entries.sort()
+
+
+class RhythmIndex:
+    ''' Index of rhythms, patterns and the items (Rhythm, MultiRhythm or compact versions) they come from '''
+
+    def __init__(self):
+
+        self.patterns = {} # (sticking, masks): pattern id
+        self.pattern_keys = [] # pattern id: (sticking, masks)
+        self.pattern_stickings = [] # pattern id: sticking id
+        self.occurrences = [] # pattern id: [(item id, rhythm index)]
+
+        self.stickings = {} # sticking: sticking id
+        self.sticking_patterns = [] # sticking id: set of pattern ids
+        self.suffixes = [] # sorted (suffix, sticking id)
+        self.prefixes = [] # sorted (sticking, sticking id)
+        self.reversed = [] # sorted (reversed sticking, sticking id)
+        self.pending = [] # stickings not merged into the sorted lists yet
+
+        self.modifiers = {} # (code, position): set of pattern ids
+
+        self.items = [] # item id: key
+
+    def __len__(self):
+        return len(self.patterns)
+
+    #########################################
+    #                Inserts                #
+    #########################################
+
+    def add(self, item, key=None):
+        ''' Index every rhythm of an item, key identifies it in results (default: its item id) '''
+
+        item_id = len(self.items)
+        self.items.append(item_id if key == None else key)
+
+        last, pattern_id = None, None
+        for i, rhythm in enumerate(iter_compact(item)):
+            # Copies of a shared rhythm are the same object
+            if rhythm is not last:
+                last, pattern_id = rhythm, self.add_pattern(''.join([STICKING_NAMES[code] for code in rhythm.sticking_codes]), tuple(rhythm.get_masks()))
+            self.occurrences[pattern_id].append((item_id, i))
+
+        return item_id
+
+    def add_pattern(self, sticking, masks):
+        ''' Pattern id of a sticking and its Note bitmasks, indexed the first time it is seen '''
+
+        pattern_id = self.patterns.get((sticking, masks))
+        if pattern_id != None: return pattern_id
+
+        pattern_id = self.patterns[(sticking, masks)] = len(self.pattern_keys)
+        self.pattern_keys.append((sticking, masks))
+        self.occurrences.append([])
+
+        sticking_id = self.stickings.get(sticking)
+        if sticking_id == None:
+            sticking_id = self.stickings[sticking] = len(self.sticking_patterns)
+            self.sticking_patterns.append(set())
+            self.pending.append((sticking, sticking_id))
+
+        self.pattern_stickings.append(sticking_id)
+        self.sticking_patterns[sticking_id].add(pattern_id)
+
+        for position, mask in enumerate(masks):
+            while mask:
+                bit = mask & -mask
+                code = bit.bit_length() - 1
+                self.modifiers.setdefault((code, position), set()).add(pattern_id)
+                self.modifiers.setdefault((code, position - len(masks)), set()).add(pattern_id)
+                mask ^= bit
+
+        return pattern_id
+
+    def merge_pending(self):
+        ''' Merge buffered stickings into the sorted lists '''
+
+        if not self.pending: return
+
+        pending = self.pending
+        self.pending = []
+        merge(self.suffixes, [(sticking[start:], sticking_id) for sticking, sticking_id in pending for start in range(len(sticking))])
+        merge(self.prefixes, pending)
+        merge(self.reversed, [(sticking[::-1], sticking_id) for sticking, sticking_id in pending])
+
+    #########################################
+    #                Queries                #
+    #########################################
+
+    def find_stickings(self, text, suffixes):
+        ''' Sticking ids with an entry in suffixes starting with text '''
+
+        start = bisect_left(suffixes, (text,))
+        end = bisect_left(suffixes, (text + END,), start)
+        return {sticking_id for _, sticking_id in suffixes[start:end]}
+
+    def get_patterns(self, sticking_ids):
+        return set().union(*[self.sticking_patterns[sticking_id] for sticking_id in sticking_ids])
+
+    def search(self, contains=None, prefix=None, suffix=None, sticking=None, modifiers=None):
+        ''' Set of pattern ids matching every query passed
+
+            Parameters
+                contains, prefix, suffix: str
+                    sticking substring, start or end
+                sticking: str
+                    whole sticking
+                modifiers: dict
+                    {position: modifier name or code, or a list of them}, negative positions count from the end '''
+
+        candidates = None
+        def narrow(found):
+            nonlocal candidates
+            candidates = found if candidates == None else candidates & found
+
+        # Cheapest queries first, the first empty result ends the search
+        for position, names in (modifiers or {}).items():
+            for name in names if type(names) in [list, tuple, set] else [names]:
+                narrow(self.modifiers.get((MODIFIER_CODES.get(name, name), position), set()))
+                if not candidates: return set()
+
+        if sticking != None:
+            narrow(self.sticking_patterns[self.stickings[sticking]] if sticking in self.stickings else set())
+
+        self.merge_pending()
+
+        sticking_ids = None
+        for text, suffixes in [(contains, self.suffixes), (prefix, self.prefixes), (suffix[::-1] if suffix else None, self.reversed)]:
+            if text == None: continue
+            found = self.find_stickings(text, suffixes)
+            sticking_ids = found if sticking_ids == None else sticking_ids & found
+            if not sticking_ids: return set()
+
+        if sticking_ids != None:
+            if candidates == None:
+                return self.get_patterns(sticking_ids)
+
+            # Walk the smaller side
+            if sum([len(self.sticking_patterns[sticking_id]) for sticking_id in sticking_ids]) < len(candidates):
+                return self.get_patterns(sticking_ids) & candidates
+            return {pattern_id for pattern_id in candidates if self.pattern_stickings[pattern_id] in sticking_ids}
+
+        return set() if candidates == None else set(candidates)
+
+    def search_at_match(self, contains, modifiers):
+        ''' Pattern ids containing a sticking with modifiers at positions inside the match
+            modifiers: {offset in contains: modifier name or code}, offsets from 0 to len(contains) - 1
+            e.g. search_at_match('RLRR', {0: 'accent'}) is an accented RLRR anywhere in the rhythm '''
+
+        for offset in modifiers:
+            if not 0 <= offset < len(contains):
+                raise Exception(f"Offset {offset} is outside the {len(contains)} Notes of {contains}")
+
+        codes = [(offset, MODIFIER_CODES.get(name, name)) for offset, name in modifiers.items()]
+
+        found = set()
+        for pattern_id in self.search(contains=contains):
+            sticking, masks = self.get_pattern(pattern_id)
+            start = sticking.find(contains)
+            while start != -1:
+                if all(masks[start + offset] & (1 << code) for offset, code in codes):
+                    found.add(pattern_id)
+                    break
+                start = sticking.find(contains, start + 1)
+
+        return found
+
+    #########################################
+    #                Results                #
+    #########################################
+
+    def get_pattern(self, pattern_id):
+        ''' (sticking, Note bitmasks) of a pattern '''
+        return self.pattern_keys[pattern_id]
+
+    def get_items(self, pattern_ids):
+        ''' {item key: sorted rhythm indices} holding any of the patterns '''
+
+        items = {}
+        for pattern_id in pattern_ids:
+            for item_id, i in self.occurrences[pattern_id]:
+                items.setdefault(self.items[item_id], []).append(i)
+
+        return {key: sorted(indices) for key, indices in items.items()}
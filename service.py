@@ -0,0 +1,343 @@
+''' Asyncio HTTP service for grids and rudiments, standard library only
+
+    Grid builds are CPU bound and run in a process pool so the event loop keeps serving.
+    Identical requests that arrive while one is building wait for that build, finished
+    responses are cached by their canonical request key with a TTL and LRU eviction
+
+    python service.py --port 8000 --workers 4
+
+    GET /grid?rudiment=paradiddle&duration=0.25&start=0&template=16th_note_grid&format=json
+    GET /rudiment?rudiment=flamacue&duration=0.3125&format=musicxml
+    GET /metrics
+    GET /health
+'''
+import argparse
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import inspect
+import io
+import json
+import multiprocessing
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    from .batch import RUDIMENTS, TEMPLATES, Job, build_grid
+    from .CompactRhythms import CompactRhythm
+    from .core import to_json
+    from .musicxml import write_musicxml
+    from .utils import duration_to_ticks, ticks_to_duration
+except ImportError:
+    from batch import RUDIMENTS, TEMPLATES, Job, build_grid
+    from CompactRhythms import CompactRhythm
+    from core import to_json
+    from musicxml import write_musicxml
+    from utils import duration_to_ticks, ticks_to_duration
+
+FORMATS = {'json': 'application/json',
+           'musicxml': 'application/vnd.recordare.musicxml+xml'}
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# Latencies kept for percentiles
+LATENCY_WINDOW = 4096
+
+
+class RequestError(Exception):
+    ''' Client error, sent back as a 400 response '''
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                   Requests                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def get_default_duration(rudiment):
+    return inspect.signature(RUDIMENTS[rudiment]).parameters['duration'].default
+
+@lru_cache(maxsize=None)
+def get_note_count(rudiment):
+    ''' Notes in a rudiment, the same for every duration '''
+    return len(RUDIMENTS[rudiment]()._notes)
+
+def get_key(path, params):
+    ''' Canonical request key, equal requests written differently share a key
+        ('grid', rudiment, duration, start, template, format) or ('rudiment', rudiment, duration, format)
+        duration is rounded to whole ticks and start taken modulo the rudiment's Note count '''
+
+    endpoint = path.strip('/')
+    if endpoint not in ['grid', 'rudiment']: raise LookupError(path)
+
+    rudiment = params.get('rudiment', 'paradiddle')
+    if rudiment not in RUDIMENTS: raise RequestError(f"Unknown rudiment {rudiment}, one of {[*RUDIMENTS]}")
+
+    output = params.get('format', 'json')
+    if output not in FORMATS: raise RequestError(f"Unknown format {output}, one of {[*FORMATS]}")
+
+    try:
+        duration = float(params['duration']) if 'duration' in params else get_default_duration(rudiment)
+        start = int(params.get('start', 0))
+    except ValueError as e:
+        raise RequestError(str(e))
+    if not duration > 0: raise RequestError(f"duration must be positive, value {duration} passed")
+    try:
+        ticks = duration_to_ticks(duration)
+    except OverflowError:
+        raise RequestError(f"duration must be finite, value {duration} passed")
+    except Exception as e:
+        raise RequestError(str(e))
+    if ticks == 0: raise RequestError(f"duration {duration} is shorter than a tick")
+    duration = ticks_to_duration(ticks)
+
+    if endpoint == 'rudiment':
+        return ('rudiment', rudiment, duration, output)
+
+    template = params.get('template', '16th_note_grid')
+    if template not in TEMPLATES: raise RequestError(f"Unknown template {template}, one of {[*TEMPLATES]}")
+    if start < 0: raise RequestError(f"start must not be negative, value {start} passed")
+
+    return ('grid', rudiment, duration, start % get_note_count(rudiment), template, output)
+
+def build(key):
+    ''' Response body for a request key, runs in the worker processes '''
+
+    if key[0] == 'grid':
+        _, rudiment, duration, start, template, output = key
+        compact = build_grid(Job(0, rudiment, duration, start, template)).grid
+    else:
+        _, rudiment, duration, output = key
+        compact = CompactRhythm.from_rhythm(RUDIMENTS[rudiment](duration))
+
+    if output == 'json':
+        return to_json(compact).encode()
+
+    text = io.StringIO()
+    write_musicxml(compact, text, title=rudiment)
+    return text.getvalue().encode()
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                    Service                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+class ResponseCache:
+    ''' LRU cache of response bodies, entries expire ttl seconds after they are stored '''
+
+    def __init__(self, maxsize=1024, ttl=300):
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict() # key: (expires, body)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+
+        entry = self.entries.get(key)
+        if entry == None: return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def store(self, key, body):
+
+        if self.maxsize == 0: return
+        self.entries[key] = (time.monotonic() + self.ttl, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+class Metrics:
+    ''' Request counts, cache outcomes and latency percentiles '''
+
+    def __init__(self):
+
+        self.counts = {'requests': 0, 'errors': 0, 'cache_hits': 0, 'coalesced': 0, 'builds': 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.build_seconds = deque(maxlen=LATENCY_WINDOW)
+
+    def count(self, name):
+        self.counts[name] += 1
+
+    def report(self, queue_depth, in_flight, cached):
+
+        def percentiles(values):
+            values = sorted(values)
+            if not values: return {}
+            return {f"p{p}": values[min(len(values) - 1, len(values) * p // 100)] * 1000 for p in [50, 90, 99]}
+
+        return {**self.counts,
+                'queue_depth': queue_depth,
+                'in_flight': in_flight,
+                'cached': cached,
+                'latency_ms': percentiles(self.latencies),
+                'build_ms': percentiles(self.build_seconds)}
+
+
+class GridService:
+    ''' Request handling, coalescing and caching, independent of the socket server
+
+        Parameters
+            workers: int
+                build processes, 0 builds in a thread of this process
+            cache_size, ttl: ResponseCache parameters '''
+
+    def __init__(self, workers=None, cache_size=1024, ttl=300):
+
+        # Forked workers would hold copies of open client sockets and keep connections from closing
+        self.executor = ThreadPoolExecutor(1) if workers == 0 else ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self.cache = ResponseCache(cache_size, ttl)
+        self.metrics = Metrics()
+        self.in_flight = {} # key: Future of the build
+        self.queue_depth = 0 # builds submitted and not finished
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def get(self, key):
+        ''' Response body for a request key, from the cache, a build already running or a new build '''
+
+        body = self.cache.get(key)
+        if body != None:
+            self.metrics.count('cache_hits')
+            return body
+
+        future = self.in_flight.get(key)
+        if future != None:
+            self.metrics.count('coalesced')
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The request building it was cancelled and not this one, build it again
+                if not future.cancelled(): raise
+                return await self.get(key)
+
+        future = self.in_flight[key] = asyncio.get_running_loop().create_future()
+        self.queue_depth += 1
+        start = time.perf_counter()
+        try:
+            body = await asyncio.get_running_loop().run_in_executor(self.executor, build, key)
+        except Exception as e:
+            future.set_exception(e)
+            # Waiting requests get the exception, avoid an unretrieved exception warning when there are none
+            future.exception()
+            raise
+        else:
+            self.cache.store(key, body)
+            future.set_result(body)
+            return body
+        finally:
+            # Cancelled builds, a client disconnecting or the server shutting down, never set the future
+            if not future.done(): future.cancel()
+            self.queue_depth -= 1
+            self.metrics.build_seconds.append(time.perf_counter() - start)
+            self.metrics.count('builds')
+            del self.in_flight[key]
+
+    async def handle(self, method, target):
+        ''' (status, content type, body) for a request '''
+
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+
+        if method != 'GET':
+            return 405, 'text/plain', b'Only GET is supported'
+        if url.path == '/health':
+            return 200, 'text/plain', b'ok'
+        if url.path == '/metrics':
+            report = self.metrics.report(self.queue_depth, len(self.in_flight), len(self.cache))
+            return 200, 'application/json', json.dumps(report).encode()
+
+        try:
+            key = get_key(url.path, params)
+        except LookupError:
+            return 404, 'text/plain', f"No endpoint {url.path}".encode()
+        except RequestError as e:
+            return 400, 'text/plain', str(e).encode()
+
+        return 200, FORMATS[key[-1]], await self.get(key)
+
+    async def serve_connection(self, reader, writer):
+        ''' HTTP/1.1 with keep alive, one request at a time per connection '''
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line: break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in [b'\r\n', b'\n', b'']: break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                self.metrics.count('requests')
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    status, content_type, body = await self.handle(method, target)
+                except ValueError:
+                    status, content_type, body, version = 400, 'text/plain', b'Malformed request line', 'HTTP/1.0'
+                except Exception as e:
+                    status, content_type, body = 500, 'text/plain', repr(e).encode()
+                if status >= 400: self.metrics.count('errors')
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+                await writer.drain()
+                self.metrics.latencies.append(time.perf_counter() - start)
+
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8000):
+        ''' Start listening, returns the asyncio Server '''
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+async def serve(host='127.0.0.1', port=8000, **kwargs):
+
+    service = GridService(**kwargs)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Serve grids and rudiments over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help='build processes, 0 builds in a thread (default: cpu count)')
+    parser.add_argument('--cache-size', type=int, default=1024, help='responses kept')
+    parser.add_argument('--ttl', type=float, default=300, help='seconds a response is kept')
+    args = parser.parse_args(args)
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, cache_size=args.cache_size, ttl=args.ttl))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
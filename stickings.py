@@ -0,0 +1,240 @@
+''' Generate rudiments by enumerating every sticking of a number of Notes
+
+    A sticking of N Notes is held as two bitmasks, bit i is Note i
+        right: Notes played R
+        both: Notes played B
+    every other Note is L (utils.STICKING). Stickings are enumerated as NumPy arrays of masks in
+    chunks, constraints are applied to a whole chunk at once and only the survivors are turned
+    into strings or Rhythm objects
+
+    for rhythm in make_rudiments(8, max_consecutive=2, max_imbalance=0, accents=[0], limit=10):
+        ...
+
+    R/L stickings are 2 ** N, B multiplies that by the ways of placing it, so B is limited with
+    max_both (default 0). NumPy is only needed when this module is used
+'''
+from itertools import combinations
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from .utils import STICKING
+except ImportError:
+    from utils import STICKING
+
+# Masks are uint64, a cyclic check needs two copies of the sticking
+MAX_NOTES = 32
+
+CHUNK_SIZE = 1 << 20
+
+
+def require_numpy():
+    if np == None: raise Exception('stickings requires NumPy, install it with pip install numpy')
+
+def popcount(masks):
+    ''' Set bits of every mask in a uint64 array '''
+
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(masks)
+
+    masks = masks - ((masks >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    masks = (masks & np.uint64(0x3333333333333333)) + ((masks >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    masks = (masks + (masks >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+    return (masks * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+def longest_run_exceeds(masks, length, notes, cyclic=False):
+    ''' True for masks with more than length consecutive set bits
+        cyclic: runs continue from the last Note to the first, as when the rudiment repeats '''
+
+    if cyclic: masks = masks | (masks << np.uint64(notes))
+
+    runs = masks.copy()
+    for shift in range(1, length + 1):
+        runs &= masks >> np.uint64(shift)
+
+    return runs != 0
+
+def get_position_mask(positions, notes):
+    mask = 0
+    for position in positions:
+        mask |= 1 << (position % notes)
+    return mask
+
+def get_segments(positions):
+    ''' Runs of consecutive positions as (first counter bit, first position, length) '''
+
+    segments = []
+    for bit, position in enumerate(positions):
+        if segments and segments[-1][1] + segments[-1][2] == position:
+            segments[-1][2] += 1
+        else:
+            segments.append([bit, position, 1])
+
+    return segments
+
+def get_hand_masks(right, both, full):
+    ''' Bitmasks of the Notes each hand plays, B is played by both '''
+    return right | both, full ^ right
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                 Enumeration                                 #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def iter_stickings(notes, prefix='', max_both=0, max_consecutive=None, max_imbalance=None,
+                   accents=(), flams=(), accent_hand=None, flam_hand=None, cyclic=False, chunk_size=CHUNK_SIZE):
+    ''' Yield (right, both) uint64 arrays of the stickings that pass every constraint, one chunk at a time
+
+        Parameters
+            notes: int
+                Notes in the rudiment, up to MAX_NOTES
+            prefix: str
+                fixed sticking of the first Notes, '_' leaves a Note free
+            max_both: int
+                most B Notes in a sticking
+            max_consecutive: int
+                most Notes in a row played by one hand, B counts for both hands
+            max_imbalance: int
+                largest difference between the Notes played by each hand
+            accents, flams: list
+                Note positions that get an Accent or Flam, flams are never B
+            accent_hand, flam_hand: str
+                'R' or 'L', hand that must play the accents or flams
+            cyclic: bool
+                max_consecutive also counts runs across the end of the rudiment into its start '''
+
+    require_numpy()
+    if notes > MAX_NOTES:
+        raise Exception(f"{notes} Notes passed, stickings supports up to {MAX_NOTES}")
+    if len(prefix) > notes:
+        raise Exception(f"prefix {prefix} is longer than {notes} Notes")
+
+    full = (1 << notes) - 1
+    flam_mask = get_position_mask(flams, notes)
+
+    # Notes fixed by the prefix
+    fixed_right, fixed_both, fixed = 0, 0, 0
+    for i, sticking in enumerate(prefix):
+        if sticking == '_': continue
+        if sticking not in STICKING: raise Exception(f"Invalid sticking {sticking} in prefix {prefix}")
+        fixed |= 1 << i
+        if STICKING[sticking] == STICKING['R']: fixed_right |= 1 << i
+        if STICKING[sticking] == STICKING['B']: fixed_both |= 1 << i
+
+    if fixed_both & flam_mask: return
+
+    # Hand requirements are fixed bits too, a required L is a fixed Note that is not R
+    for positions, hand in [(accents, accent_hand), (flams, flam_hand)]:
+        if hand == None: continue
+        if hand not in ['R', 'L']: raise Exception(f"Hand must be 'R' or 'L', value {hand} passed")
+        mask = get_position_mask(positions, notes)
+        required = mask if hand == 'R' else 0
+        if (fixed_right ^ required) & fixed & mask or fixed_both & mask: return
+        fixed_right |= required
+        fixed |= mask
+
+    # B can go on any Note that is not fixed or flammed
+    open_positions = [i for i in range(notes) if not (fixed | flam_mask) >> i & 1]
+    both_masks = [fixed_both | get_position_mask(positions, notes)
+                  for count in range(max_both - bin(fixed_both).count('1') + 1)
+                  for positions in combinations(open_positions, count)]
+
+    for both in both_masks:
+
+        # Every Note that is not fixed or B is free to be R or L
+        free = [i for i in range(notes) if not (fixed | both) >> i & 1]
+        total = 1 << len(free)
+        segments = get_segments(free)
+
+        for start in range(0, total, chunk_size):
+
+            # Spread each counter's bits over the free Note positions, a run of free Notes at a time
+            counter = np.arange(start, min(start + chunk_size, total), dtype=np.uint64)
+            right = np.full(len(counter), fixed_right, dtype=np.uint64)
+            for bit, position, length in segments:
+                right |= ((counter >> np.uint64(bit)) & np.uint64((1 << length) - 1)) << np.uint64(position)
+
+            keep = np.ones(len(right), dtype=bool)
+            right_hand, left_hand = get_hand_masks(right, np.uint64(both), np.uint64(full))
+
+            if max_consecutive != None:
+                keep &= ~longest_run_exceeds(right_hand, max_consecutive, notes, cyclic)
+                keep &= ~longest_run_exceeds(left_hand, max_consecutive, notes, cyclic)
+            if max_imbalance != None:
+                keep &= np.abs(popcount(right_hand).astype(np.int64) - popcount(left_hand).astype(np.int64)) <= max_imbalance
+
+            if keep.any():
+                right = right[keep]
+                yield right, np.full(len(right), both, dtype=np.uint64)
+
+def count_stickings(notes, **constraints):
+    ''' Number of stickings that pass the constraints, constraints are iter_stickings parameters '''
+    return sum(len(right) for right, _ in iter_stickings(notes, **constraints))
+
+def decode(right, both, notes):
+    ''' Sticking strings for arrays of masks, first Note first '''
+
+    require_numpy()
+    bits = np.uint64(1) << np.arange(notes, dtype=np.uint64)
+    codes = np.full((len(right), notes), STICKING['L'], dtype=np.uint8)
+    codes[(right[:, None] & bits) != 0] = STICKING['R']
+    codes[(both[:, None] & bits) != 0] = STICKING['B']
+
+    letters = np.zeros(max(STICKING.values()) + 1, dtype=np.uint8)
+    for sticking, code in STICKING.items():
+        letters[code] = ord(sticking)
+
+    return [text.decode() for text in letters[codes].view(f"S{notes}").ravel()]
+
+def get_stickings(notes, limit=None, **constraints):
+    ''' List of sticking strings that pass the constraints, at most limit of them '''
+
+    stickings = []
+    for right, both in iter_stickings(notes, **constraints):
+        if limit != None: right, both = right[:limit - len(stickings)], both[:limit - len(stickings)]
+        stickings.extend(decode(right, both, notes))
+        if limit != None and len(stickings) >= limit: break
+
+    return stickings
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                  Rudiments                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def make_rudiments(notes, duration=None, limit=None, **constraints):
+    ''' Yield a Rhythm for every sticking that passes the constraints
+        duration: of the whole rudiment, quarter note would be .25, default is a 16th note per Note
+        Accents and Flams are added at the accents and flams positions '''
+
+    try:
+        from .Rhythms import Rhythm
+        from .Modifiers import Accent, Flam
+    except ImportError:
+        from Rhythms import Rhythm
+        from Modifiers import Accent, Flam
+
+    note_duration = 1/16 if duration == None else duration / notes
+    accents = {position % notes for position in constraints.get('accents', ())}
+    flams = {position % notes for position in constraints.get('flams', ())}
+
+    made = 0
+    for right, both in iter_stickings(notes, **constraints):
+        for sticking in decode(right, both, notes):
+            if limit != None and made >= limit: return
+
+            rhythm = Rhythm(note_duration)
+            for i, stroke in enumerate(sticking):
+                modifiers = ([Flam()] if i in flams else []) + ([Accent()] if i in accents else [])
+                rhythm.add_note(stroke, modifiers)
+
+            made += 1
+            yield rhythm
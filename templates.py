@@ -0,0 +1,122 @@
+''' LRU cache of rudiment templates
+
+    Templates are kept as CompactRhythm objects. A CompactRhythm factory's hits get an array copy,
+    a Rhythm factory's hits get CompactRhythm.to_rhythm() of it, a new Rhythm with its own Notes,
+    so a hit can be edited in place like the factory's own result without changing later hits
+
+    paradiddle = cached_rudiment(make_paradiddle)
+    paradiddle(1/4, downbeat_accent=False)
+    rudiment_cache.cache_info()
+
+    The size of the default cache is read from the GRID_BUILDER_TEMPLATE_CACHE environment variable
+'''
+from collections import namedtuple, OrderedDict
+import functools
+import inspect
+import os
+
+try:
+    from .CompactRhythms import CompactRhythm
+except ImportError:
+    from CompactRhythms import CompactRhythm
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+
+@functools.lru_cache(maxsize=None)
+def get_signature(factory):
+    return inspect.signature(factory)
+
+def make_key(factory, args, kwargs):
+    ''' Hashable key for a factory call, defaults are filled in so equal calls share a key '''
+
+    bound = get_signature(factory).bind(*args, **kwargs)
+    bound.apply_defaults()
+    values = tuple((name, tuple(value) if type(value) == list else value) for name, value in bound.arguments.items())
+
+    return (factory.__module__, factory.__qualname__, values)
+
+
+class TemplateCache:
+    ''' Least recently used cache of factory results
+
+        Parameters
+            maxsize: int
+                templates to keep, None for no limit, 0 disables the cache '''
+
+    def __init__(self, maxsize=128):
+
+        self.maxsize = maxsize
+        self._templates = OrderedDict() # key: (CompactRhythm template, True when the factory returns a Rhythm)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"TemplateCache({self.cache_info()})"
+
+    def get(self, factory, *args, **kwargs):
+        ''' Call factory(*args, **kwargs) through the cache
+            Returns a new object of the type the factory returns, nothing in it is shared with the template '''
+
+        key = make_key(factory, args, kwargs)
+
+        if key in self._templates:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            template, rhythm = self._templates[key]
+            return template.to_rhythm() if rhythm else template.copy()
+
+        self.misses += 1
+        result = factory(*args, **kwargs)
+        if isinstance(result, CompactRhythm):
+            self._store(key, (result.copy(), False))
+        else:
+            self._store(key, (CompactRhythm.from_rhythm(result), True))
+        return result
+
+    def _store(self, key, value):
+
+        if self.maxsize == 0: return
+
+        self._templates[key] = value
+        while self.maxsize != None and len(self._templates) > self.maxsize:
+            self._templates.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        ''' Change the size limit, evicting the least recently used templates if needed '''
+
+        self.maxsize = maxsize
+        if maxsize == 0:
+            self.evictions += len(self._templates)
+            self._templates.clear()
+        while maxsize != None and len(self._templates) > maxsize:
+            self._templates.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        ''' Drop every template and reset statistics '''
+
+        self._templates.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._templates))
+
+
+rudiment_cache = TemplateCache(int(os.environ.get('GRID_BUILDER_TEMPLATE_CACHE', 128)))
+
+def cached_rudiment(factory, cache=None):
+    ''' Wrap a rudiment factory so calls go through a TemplateCache, rudiment_cache by default '''
+
+    cache = rudiment_cache if cache == None else cache
+
+    @functools.wraps(factory)
+    def wrapper(*args, **kwargs):
+        return cache.get(factory, *args, **kwargs)
+
+    wrapper.cache = cache
+
+    return wrapper
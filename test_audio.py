@@ -0,0 +1,48 @@
+import wave
+
+import numpy as np
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm
+from audio import GRACE, STROKE, SAMPLE_RATE, get_onsets, render, write_wav
+from utils import TICKS_PER_WHOLE
+
+
+def test_onsets():
+
+    grid = make_16th_note_grid(make_flam_accent())
+    rhythm = CompactRhythm.from_rhythm(grid.rhythms[0])
+    onsets = get_onsets(grid)
+
+    assert onsets.length == len(grid.rhythms) * sum(rhythm.ticks)
+    assert (np.diff(onsets.ticks) >= 0).all()
+    assert onsets.ticks[0] < 0 and onsets.kinds[0] == GRACE
+    assert (onsets.kinds == STROKE).sum() == len(grid.rhythms) * len(rhythm)
+
+@pytest.mark.parametrize('dynamic', [-5, 0, 15, 20, 127])
+def test_dynamics_out_of_range(dynamic):
+
+    rhythm = CompactRhythm()
+    rhythm.append_note(TICKS_PER_WHOLE // 4, 'R', dynamic)
+    rhythm.append_note(TICKS_PER_WHOLE // 4, 'L', 'ff')
+    pcm = render(rhythm, bpm=120)
+
+    quarter = SAMPLE_RATE // 2
+    first, second = np.abs(pcm[:quarter]).max(), np.abs(pcm[quarter:]).max()
+    assert 0 < first <= second + 1e-6
+
+def test_write_wav(tmp_path):
+
+    grid = make_16th_note_grid(make_paradiddle())
+    path = str(tmp_path / 'grid.wav')
+    write_wav(grid, path, bpm=100, sample_rate=22050)
+
+    with wave.open(path, 'rb') as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (1, 2, 22050)
+        frames = f.getnframes()
+        data = np.frombuffer(f.readframes(frames), dtype='<i2')
+
+    # A whole note lasts 4 beats
+    assert frames >= round(get_onsets(grid).length / TICKS_PER_WHOLE * 4 * 60 / 100 * 22050)
+    assert np.abs(data).max() > 0
@@ -0,0 +1,58 @@
+import pickle
+
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactMultiRhythm
+from batch import RUDIMENTS, get_jobs, generate, main
+
+JOBS = get_jobs(['paradiddle', 'flamacue'], [1/4, 1/8])
+
+
+def serial_grid(job):
+    ''' The grid a job stands for, built the plain way '''
+
+    rhythm = RUDIMENTS[job.rudiment](job.duration)
+    rhythm.add_modulator(Accent(), job.start, 'accent')
+    return CompactMultiRhythm.from_multi_rhythm(make_16th_note_grid(rhythm))
+
+
+def test_jobs():
+
+    assert [job.index for job in JOBS] == list(range(len(JOBS)))
+    assert len(JOBS) == 2 * (len(make_paradiddle()._notes) + len(make_flamacue()._notes))
+    assert len(set([job[1:] for job in JOBS])) == len(JOBS)
+
+def test_in_process_matches_serial():
+
+    results = [*generate(JOBS, workers=0)]
+    assert [result.job for result in results] == JOBS
+    assert [result.grid for result in results] == [serial_grid(job) for job in JOBS]
+
+@pytest.mark.parametrize('workers, chunksize', [(1, 1), (3, 1), (3, 4)])
+def test_workers_match_in_process(workers, chunksize):
+
+    expected = [result.grid for result in generate(JOBS, workers=0)]
+    results = [*generate(JOBS, workers=workers, chunksize=chunksize)]
+
+    assert [result.job for result in results] == JOBS
+    assert [result.grid for result in results] == expected
+    assert len(set([result.worker for result in results])) <= workers
+
+def test_output(tmp_path, capsys):
+
+    path = tmp_path / 'grids.pkl'
+    main(['--workers', '2', '--rudiments', 'paradiddle', '--durations', '0.25', '--output', str(path)])
+    assert 'total: 4 grids' in capsys.readouterr().out
+
+    pairs = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                pairs.append(pickle.load(f))
+            except EOFError:
+                break
+
+    jobs = get_jobs(['paradiddle'], [0.25])
+    assert [job for job, _ in pairs] == [job._asdict() for job in jobs]
+    assert [grid for _, grid in pairs] == [serial_grid(job) for job in jobs]
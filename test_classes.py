@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import Classes
+from Classes import OffsetIndex, Sheet
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm
+from utils import TICKS_PER_WHOLE
+
+
+def test_star_import():
+
+    names = {}
+    exec('from Classes import *', names)
+    assert sorted(name for name in names if name != '__builtins__') == sorted(Classes.__all__)
+
+def test_offset_index():
+
+    lengths = [random.Random(i).randrange(1, 100) for i in range(50)]
+    index = OffsetIndex()
+    for length in lengths:
+        index.append(length)
+    index.add(10, 25)
+    lengths[10] += 25
+
+    assert [index.prefix(i) for i in range(len(lengths) + 1)] == [sum(lengths[:i]) for i in range(len(lengths) + 1)]
+    for ticks in [0, 1, 99, sum(lengths[:10]), sum(lengths) - 1]:
+        i = index.find(ticks)
+        assert sum(lengths[:i]) <= ticks < sum(lengths[:i + 1])
+    assert index.find(sum(lengths)) == len(lengths)
+
+def test_notes_in_order():
+
+    grid = make_16th_note_grid(make_paradiddle())
+    sheet = Sheet.from_rhythm(grid)
+    compact = [CompactRhythm.from_rhythm(rhythm) for rhythm in grid.rhythms]
+
+    assert [note.sticking for _, _, note in sheet.iter_notes()] == [*''.join(rhythm.sticking for rhythm in compact)]
+    assert sheet.ticks == sum(sum(rhythm.ticks) for rhythm in compact)
+    for ticks, bar, note in sheet.iter_notes():
+        assert sheet.get_note_at_ticks(ticks) == (bar, note)
+        assert sheet.get_note_at_ticks(ticks + note.ticks - 1)[1] is note
+
+def test_time_signature_change_moves_later_bars():
+
+    sheet = Sheet.from_rhythm(make_16th_note_grid(make_paradiddle()))
+    starts = [ticks for ticks, _, _ in sheet.iter_notes()]
+    sheet.get_bar(2).set_time_signature(5, 4)
+
+    delta = TICKS_PER_WHOLE // 4
+    assert [ticks for ticks, _, _ in sheet.iter_notes()] == [ticks + delta if ticks >= 2 * TICKS_PER_WHOLE else ticks for ticks in starts]
+    assert sheet.get_bar_at(2.2).number == 2 and sheet.get_bar_at(2.3).number == 3
+    with pytest.raises(Exception):
+        sheet.get_bar(2).set_time_signature(1, 4)
+
+def test_note_across_bar_lines():
+    ''' A whole note in 1/4 bars carries on through four bar lines '''
+
+    sheet = Sheet(1, 4)
+    sheet.add_note(TICKS_PER_WHOLE // 8)
+    sheet.add_note(TICKS_PER_WHOLE, 'L')
+
+    assert [len(bar) for bar in sheet] == [2, 0, 0, 0, 0]
+    whole = sheet.bars[0].notes[1]
+    for offset in [.125, .3, .6, .9, 1.1]:
+        assert sheet.get_note_at(offset) == (sheet.bars[0], whole)
+    assert sheet.get_note_at(1.125) == None
+
+    sheet.add_note(TICKS_PER_WHOLE // 4)
+    assert [len(bar) for bar in sheet] == [2, 0, 0, 0, 1, 0]
+    assert sheet.get_note_at(1.2)[0] is sheet.bars[4]
+    assert sheet.get_note_at(1.4) == None
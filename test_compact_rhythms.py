@@ -0,0 +1,79 @@
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm, CompactMultiRhythm
+from core import (compact_16th_note_grid, compact_flam_accent, compact_flamacue, compact_paradiddle,
+                  compact_paradiddlediddle)
+
+FACTORIES = [(make_paradiddle, compact_paradiddle),
+             (make_paradiddlediddle, compact_paradiddlediddle),
+             (make_flam_accent, compact_flam_accent),
+             (make_flamacue, compact_flamacue)]
+
+
+def note_values(rhythm):
+    ''' Everything a Note carries that CompactRhythm keeps '''
+    return [(note.sticking, note.dynamic, note.duration.quarterLength, sorted(mod.name for mod in note.modifiers if not mod.modulator))
+            for note in rhythm.notes]
+
+def modulator_values(rhythm):
+    return {name: (mod.code, rhythm.get_modulator_position(name)) for name, mod in rhythm.modulators.items()}
+
+
+@pytest.mark.parametrize('factory', [factory for factory, _ in FACTORIES])
+def test_rhythm_round_trip(factory):
+
+    rhythm = factory()
+    rhythm.add_modulator(Accent(), 1, 'accent')
+    rebuilt = CompactRhythm.from_rhythm(rhythm).to_rhythm()
+
+    assert note_values(rebuilt) == note_values(rhythm)
+    assert modulator_values(rebuilt) == modulator_values(rhythm)
+    assert CompactRhythm.from_rhythm(rebuilt) == CompactRhythm.from_rhythm(rhythm)
+
+def test_dotted_round_trip():
+
+    rhythm = Rhythm(1/8)
+    rhythm.add_note('R', dotted=True)
+    rhythm.add_note('L', dotted='double')
+    rhythm.add_note('B', Marcato())
+
+    compact = CompactRhythm.from_rhythm(rhythm)
+    assert note_values(compact.to_rhythm()) == note_values(rhythm)
+    assert CompactRhythm.from_dict(compact.to_dict()) == compact
+
+@pytest.mark.parametrize('cls', [Marcato, Staccato, Tenuto])
+def test_modifier_dynamics_round_trip(cls):
+
+    rhythm = Rhythm(1/16)
+    rhythm.add_note('R', cls(), dynamic=6)
+    rhythm.add_note('L', dynamic=9)
+    rhythm.add_modulator(Marcato(), 1, 'marcato')
+    compact = CompactRhythm.from_rhythm(rhythm)
+
+    # The column holds the Note's own dynamic, modifiers set theirs again when played
+    assert [*compact.dynamics] == [6, 9]
+    rebuilt = compact.to_rhythm()
+    assert note_values(rebuilt) == note_values(rhythm)
+
+    # Taking the modifier off goes back to the Note's own dynamic
+    for note in [rhythm.notes[0], rebuilt.notes[0]]:
+        note.pop_modifier(next(mod for mod in note.modifiers if isinstance(mod, cls)))
+        assert note.dynamic == 6
+
+    # Adding the Note to a CompactRhythm stores the same values
+    added = CompactRhythm(1/16)
+    added.add_note('R', cls.name.lower(), dynamic=6)
+    assert [*added.dynamics] == [6]
+    assert added.to_rhythm().notes[0].dynamic == Note(1/16, 'R', [cls()], dynamic=6).dynamic
+
+@pytest.mark.parametrize('factory, compact_factory', FACTORIES)
+def test_compact_factories_match(factory, compact_factory):
+    assert compact_factory() == CompactRhythm.from_rhythm(factory())
+    assert compact_factory(1/2) == CompactRhythm.from_rhythm(factory(1/2))
+
+def test_grid_matches_music21_grid():
+
+    grid = CompactMultiRhythm.from_multi_rhythm(make_16th_note_grid())
+    assert grid.rhythms == compact_16th_note_grid().rhythms
+    assert grid.actions == compact_16th_note_grid().actions
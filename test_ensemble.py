@@ -0,0 +1,74 @@
+from music21 import converter
+
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm
+from ensemble import Ensemble, EnsembleWriter, ensemble_midi_bytes
+from midi import NOTE_ON, MidiWriter, event_order
+
+
+def make_ensemble():
+    return Ensemble({'snare': make_16th_note_grid(make_flam_accent()),
+                     'tenor': make_16th_note_grid(make_paradiddle(), lazy=True),
+                     'bass': CompactRhythm.from_rhythm(make_flamacue())})
+
+def test_notes_in_onset_order():
+
+    ensemble = make_ensemble()
+    notes = [*ensemble.iter_notes()]
+
+    assert [note.onset for note in notes] == sorted(note.onset for note in notes)
+    for name, source in ensemble.parts.items():
+        part = [note for note in notes if note.part == name]
+        assert [note.index for note in part] == [*range(len(part))]
+    assert max(note.onset + note.ticks for note in notes) == ensemble.get_ticks()
+
+    for onset, slice_notes in ensemble.iter_slices():
+        assert {note.onset for note in slice_notes} == {onset}
+        assert [note.part for note in slice_notes] == [part for part in ensemble.parts if part in {note.part for note in slice_notes}]
+
+def test_events_sorted_with_grace_strokes():
+    ''' Flams on the first Note of a part start before tick 0 and are dropped, not clamped '''
+
+    ensemble = make_ensemble()
+    writer = EnsembleWriter({'tenor': {'notes': {'R': 45, 'L': 45}}, 'bass': {'notes': {'R': 36, 'L': 36}, 'channels': {'R': 8, 'L': 8}}})
+    events = [*writer.iter_events(ensemble)]
+
+    assert events == sorted(events, key=event_order)
+    assert events[0][0] == 0
+    counts = {}
+    for _, message in events:
+        key = (message[0] & 0x0F, message[1])
+        counts[key] = counts.get(key, 0) + (1 if message[0] & 0xF0 == NOTE_ON else -1)
+        assert counts[key] in [0, 1]
+
+    # Every part's own events are in the merge
+    assert len(events) == sum(len([*MidiWriter().iter_events(source)]) for source in ensemble.parts.values())
+
+def test_midi_parses():
+
+    data = ensemble_midi_bytes(make_ensemble(), bpm=100, title='ensemble', parts={'bass': {'notes': {'R': 36, 'L': 36}}})
+    score = converter.parse(data, format='midi')
+    notes = [*score.flatten().notes]
+    assert notes and notes[0].offset == 0
+    assert all([note.quarterLength > 0 for note in notes])
+
+def test_default_parts_share_a_key():
+    ''' Every part is note 38 on channel 9 by default, strokes together are sent once and none is cut short '''
+
+    grid = make_16th_note_grid(make_paradiddle())
+    ensemble = Ensemble({'snare': grid, 'tenor': make_16th_note_grid(make_paradiddle())})
+    writer = EnsembleWriter()
+    events = [*writer.iter_events(ensemble)]
+
+    on_ticks = [tick for tick, message in events if message[0] & 0xF0 == NOTE_ON]
+    assert on_ticks == sorted(set(on_ticks))
+    assert on_ticks == [tick for tick, message in MidiWriter().iter_events(grid) if message[0] & 0xF0 == NOTE_ON]
+
+    sounding = None
+    for tick, message in events:
+        if message[0] & 0xF0 == NOTE_ON:
+            assert sounding == None
+            sounding = tick
+        else:
+            assert tick - sounding == writer.gate
+            sounding = None
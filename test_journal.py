@@ -0,0 +1,95 @@
+import pytest
+
+from MultiRhythms import *
+from Notes import LOCATIONS
+from journal import Journal
+
+
+def note_state(note):
+    ''' Everything an edit can change on a Note, modifiers by identity '''
+    return (note.sticking, note.dynamic, note.duration.quarterLength, [id(mod) for mod in note.modifiers],
+            [id(art) for art in note.articulations], [[id(mod) for mod in getattr(note, location)] for location in LOCATIONS])
+
+def rhythm_state(rhythm):
+    return ([id(note) for note in rhythm.notes], [note_state(note) for note in rhythm.notes],
+            {name: (id(mod), rhythm.get_modulator_position(name)) for name, mod in rhythm.modulators.items()})
+
+def check_undo_redo(journal, rhythm, edits):
+    ''' Apply edits, undo them all back to the start, then redo them all '''
+
+    states = [rhythm_state(rhythm)]
+    for edit in edits:
+        edit()
+        states.append(rhythm_state(rhythm))
+
+    for state in states[-2::-1]:
+        assert journal.undo() != None
+        assert rhythm_state(rhythm) == state
+    assert journal.undo() == None
+
+    for state in states[1:]:
+        assert journal.redo() != None
+        assert rhythm_state(rhythm) == state
+    assert journal.redo() == None
+
+
+def test_rhythm_edits():
+
+    rhythm = make_paradiddle()
+    journal = Journal()
+    check_undo_redo(journal, rhythm, [lambda: journal.set_sticking(rhythm, 'LRLL'),
+                                      lambda: journal.add_note(rhythm, 'R'),
+                                      lambda: journal.set_duration(rhythm, 1/8),
+                                      lambda: journal.remove_note(rhythm, 1),
+                                      lambda: journal.remove_note(rhythm)])
+
+def test_modifier_edits():
+
+    rhythm = make_flam_accent()
+    note = rhythm.notes[1]
+    journal = Journal()
+    check_undo_redo(journal, rhythm, [lambda: journal.add_modifier(note, Accent()),
+                                      lambda: journal.add_modifier(note, Diddle()),
+                                      lambda: journal.add_modifier(note, Diddle()),
+                                      lambda: journal.remove_modifier(rhythm.notes[0], 'Flam'),
+                                      lambda: journal.remove_modifier(note, 'Accent')])
+
+def test_remove_modifier_resets_note():
+
+    note = make_paradiddle().notes[0]
+    plain = note_state(note)
+    journal = Journal()
+    journal.add_modifier(note, Flam())
+    assert note.left
+
+    journal.remove_modifier(note, 'Flam')
+    assert note_state(note) == plain and not note.left
+    with pytest.raises(Exception):
+        journal.remove_modifier(note, 'Flam')
+
+def test_modulator_edits():
+
+    rhythm = make_paradiddle()
+    journal = Journal()
+    check_undo_redo(journal, rhythm, [lambda: journal.add_modulator(rhythm, Accent(), 0, 'accent'),
+                                      lambda: journal.add_modulator(rhythm, Tenuto(), None, 'tenuto'),
+                                      lambda: journal.modulate(rhythm),
+                                      lambda: journal.modulate(rhythm, 'backward', 'accent'),
+                                      lambda: journal.modulate(rhythm, name='tenuto'),
+                                      lambda: journal.add_modulator(rhythm, Marcato(), 2, 'accent'),
+                                      lambda: journal.modulate(rhythm)])
+
+def test_history():
+
+    rhythm = make_paradiddle()
+    journal = Journal(max_edits=2)
+    for sticking in ['LRLL', 'RRLL', 'LLRR']:
+        journal.set_sticking(rhythm, sticking)
+    assert len(journal) == 2
+
+    assert journal.undo() == 'set_sticking' and journal.undo() == 'set_sticking'
+    assert rhythm.sticking == 'LRLL' and not journal.can_undo
+
+    journal.redo()
+    journal.add_note(rhythm, 'L')
+    assert not journal.can_redo and rhythm.sticking == 'RRLLL'
@@ -0,0 +1,69 @@
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm, CompactMultiRhythm
+import library
+from library import Library, LibraryWriter, write_library
+
+
+def test_round_trip(tmp_path):
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Accent(), 1, 'accent')
+    grid = make_16th_note_grid(rhythm, copy_on_write=True)
+    grid.modulate(name='accent')
+
+    path = str(tmp_path / 'grids.gbl')
+    write_library(path, [('paradiddle', rhythm), ('grid', grid)])
+
+    with Library(path) as lib:
+        assert lib.names() == ['paradiddle', 'grid']
+        assert lib[0] == CompactRhythm.from_rhythm(rhythm)
+        assert lib[1].rhythms == CompactMultiRhythm.from_multi_rhythm(grid).rhythms
+
+def test_modulator_name_types(tmp_path):
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Accent(), 1)               # named by modifier.id, an int
+    rhythm.add_modulator(Accent(), 2, 'accent')
+    rhythm.add_modulator(Accent(), 3, '12')         # a str that looks like an int stays a str
+    grid = make_16th_note_grid(rhythm)
+    grid.modulate(name=[*rhythm.modulators][0])
+
+    path = str(tmp_path / 'names.gbl')
+    write_library(path, [rhythm, grid])
+
+    with Library(path) as lib:
+        assert [*lib[0].modulators] == [*rhythm.modulators]
+        assert [type(name) for name in lib[0].modulators] == [int, str, str]
+        assert lib[1].rhythms == CompactMultiRhythm.from_multi_rhythm(grid).rhythms
+
+def test_unsupported_modulator_name(tmp_path):
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Accent(), 1, ('accent', 1))
+
+    with LibraryWriter(str(tmp_path / 'bad.gbl')) as writer:
+        with pytest.raises(Exception, match='str and int names'):
+            writer.add(rhythm)
+
+class ModulatorV1:
+    ''' Writes version 1 modulators, without the name type '''
+
+    def pack(self, code, name_type, length):
+        return library.MODULATOR_V1.pack(code, length)
+
+def test_version_1(tmp_path, monkeypatch):
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Accent(), 1, 'accent')
+
+    path = str(tmp_path / 'v1.gbl')
+    monkeypatch.setattr(library, 'VERSION', 1)
+    monkeypatch.setattr(library, 'MODULATOR', ModulatorV1())
+    write_library(path, [rhythm])
+    monkeypatch.undo()
+
+    with Library(path) as lib:
+        assert lib.version == 1
+        assert lib[0] == CompactRhythm.from_rhythm(rhythm)
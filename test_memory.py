@@ -0,0 +1,87 @@
+import json
+import tracemalloc
+
+import pytest
+
+from MultiRhythms import *
+import memory
+from memory import MemoryTracker, build, diff_reports, format_diff, format_report, load_report, main, measure, save_report
+import utils
+
+REPORT_KEYS = ['name', 'python', 'peak_bytes', 'retained_bytes', 'classes', 'actions', 'retained_actions',
+               'deepcopy', 'instances', 'top_sites']
+
+
+@pytest.fixture(autouse=True)
+def no_hooks_left():
+    yield
+    assert not utils.ACTION_HOOKS and not utils.FACTORY_HOOKS
+    assert not tracemalloc.is_tracing()
+
+@pytest.fixture(scope='module')
+def measured():
+    ''' (grid, report) of a measured paradiddle grid, tracing is slow so it is shared '''
+    return measure(build, 'paradiddle', name='paradiddle')
+
+def test_report(measured):
+
+    grid, report = measured
+
+    assert [*report] == REPORT_KEYS
+    assert report['name'] == 'paradiddle'
+    assert report['peak_bytes'] >= report['retained_bytes'] > 0
+    assert {*report['deepcopy']} == {'bytes', 'blocks'}
+    assert report['instances']['Note']['count'] >= len(grid.default_rhythm)
+    assert 'Note' in report['classes'] and len(report['top_sites']) <= memory.TOP_SITES
+
+    # Every recorded action is counted once, however many actions it calls
+    calls = {name: values['calls'] for name, values in report['actions'].items()}
+    assert calls == {name: sum([1 for action, _ in grid.actions if action == name]) for name, _ in grid.actions}
+    assert all([{*values} == {'calls', 'allocated_bytes', 'peak_bytes'} for values in report['actions'].values()])
+
+    assert format_report(report).startswith('paradiddle: peak')
+
+def test_tracker_stops_on_error():
+
+    tracker = MemoryTracker('error')
+    with pytest.raises(ZeroDivisionError):
+        with tracker:
+            make_16th_note_grid()
+            1 / 0
+    assert [*tracker.report] == REPORT_KEYS
+
+def test_trackers_do_not_nest():
+
+    with MemoryTracker():
+        with pytest.raises(Exception, match='already tracing'):
+            with MemoryTracker():
+                pass
+
+def test_diff(measured):
+
+    _, old = measured
+    _, new = measure(build, 'paradiddle', copy_on_write=True, name='new')
+    diff = diff_reports(old, new)
+
+    assert diff['retained_bytes'] == new['retained_bytes'] - old['retained_bytes']
+    assert diff['instances']['Note']['count'] == new['instances']['Note']['count'] - old['instances']['Note']['count'] < 0
+    assert format_diff(diff).startswith('paradiddle -> new')
+
+    same = diff_reports(old, old)
+    assert same['peak_bytes'] == same['retained_bytes'] == 0
+    assert not same['classes'] and not same['actions'] and not same['instances'] and not same['deepcopy']
+
+def test_cli(measured, tmp_path, capsys):
+
+    paths = [str(tmp_path / 'old.json'), str(tmp_path / 'new.json')]
+    save_report(measured[1], paths[0])
+    main(['--rudiment', 'paradiddle', '--copy-on-write', '--output', paths[1], '--json'])
+    assert json.loads(capsys.readouterr().out) == load_report(paths[1])
+
+    reports = [load_report(path) for path in paths]
+    assert [[*report] for report in reports] == [REPORT_KEYS, REPORT_KEYS]
+    assert 'copy_on_write=True' in reports[1]['name']
+
+    main(['--diff', *paths, '--json'])
+    diff = json.loads(capsys.readouterr().out)
+    assert diff == diff_reports(*reports)
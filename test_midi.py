@@ -0,0 +1,87 @@
+from music21 import converter
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm
+from midi import GRACE_TICKS, NOTE_OFF, NOTE_ON, MidiWriter, midi_bytes
+
+
+def get_notes(events):
+    ''' [(on tick, off tick, channel, note)] pairing every note on with the next note off of its key '''
+
+    sounding, notes = {}, []
+    for tick, message in events:
+        key = (message[0] & 0x0F, message[1])
+        if message[0] & 0xF0 == NOTE_ON:
+            assert key not in sounding, f"{key} struck again at {tick} before its note off"
+            sounding[key] = tick
+        else:
+            assert message[0] & 0xF0 == NOTE_OFF
+            notes.append((sounding.pop(key), tick, *key))
+    assert not sounding
+    return sorted(notes)
+
+@pytest.mark.parametrize('factory', [make_paradiddle, make_paradiddlediddle, make_flam_accent, make_flamacue])
+def test_events(factory):
+
+    writer = MidiWriter()
+    events = [*writer.iter_events(make_16th_note_grid(factory()))]
+    ticks = [tick for tick, _ in events]
+
+    assert ticks == sorted(ticks)
+    assert ticks[0] >= 0
+    assert all([off - on == writer.gate for on, off, _, _ in get_notes(events)])
+
+def test_leading_grace_strokes():
+    ''' A flam on the first Note of the source loses its grace stroke, later flams keep theirs '''
+
+    rhythm = make_flam_accent()
+    assert CompactRhythm.from_rhythm(rhythm).get_masks()[0] != 0
+
+    notes = get_notes(MidiWriter().iter_events(make_16th_note_grid(rhythm)))
+    assert notes[0][0] == 0 and notes[1][0] > 0
+    length = sum(CompactRhythm.from_rhythm(rhythm).ticks)
+    assert (length - GRACE_TICKS, length - GRACE_TICKS + MidiWriter().gate, 9, 38) in notes
+
+def test_music21_parse():
+
+    rhythm = make_flamacue()
+    data = midi_bytes(rhythm, bpm=90, title='flamacue')
+    assert data[:4] == b'MThd'
+
+    score = converter.parse(data, format='midi')
+    notes = [*score.flatten().notes]
+    assert notes[0].offset == 0
+    assert all([note.quarterLength > 0 for note in notes])
+    strokes = get_notes(MidiWriter().iter_events(rhythm))
+    # music21 quantizes strokes close together into chords
+    assert len(strokes) == sum([len(getattr(note, 'notes', [note])) for note in notes])
+
+def both_hands():
+    rhythm = CompactRhythm()
+    for sticking in 'BRBL':
+        rhythm.append_note(5040, sticking, 'mf')
+    return rhythm
+
+def test_both_hands_on_one_key():
+    ''' R and L are both note 38 by default, 'B' sends one stroke '''
+
+    events = [*MidiWriter().iter_events(both_hands())]
+    assert [tick for tick, message in events if message[0] & 0xF0 == NOTE_ON] == [0, 5040, 10080, 15120]
+    get_notes(events)
+
+def test_both_hands_on_two_keys():
+
+    events = [*MidiWriter(notes={'L': 40}).iter_events(both_hands())]
+    assert sorted((tick, message[1]) for tick, message in events if message[0] & 0xF0 == NOTE_ON) == \
+        [(0, 38), (0, 40), (5040, 38), (10080, 38), (10080, 40), (15120, 40)]
+
+def test_overlapping_strokes_are_struck_again():
+    ''' A stroke shorter than the gate: the key is struck again and sounds until the last note off '''
+
+    rhythm = CompactRhythm()
+    rhythm.append_note(100)
+    rhythm.append_note(100)
+    writer = MidiWriter()
+    events = [(tick, message[0] & 0xF0) for tick, message in writer.iter_events(rhythm)]
+    assert events == [(0, NOTE_ON), (100, NOTE_OFF), (100, NOTE_ON), (100 + writer.gate, NOTE_OFF)]
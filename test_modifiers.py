@@ -0,0 +1,58 @@
+from copy import deepcopy
+import pickle
+
+import pytest
+
+from MultiRhythms import *
+
+SHARED = [Diddle, Buzz, Flam, Drag, ThreeStrokeDrag]
+
+
+@pytest.mark.parametrize('cls', SHARED)
+def test_shared_instances_are_frozen(cls):
+
+    modifier = cls()
+    assert modifier is cls() and modifier.shared
+
+    for change in [lambda: setattr(modifier, 'dynamic', 15), lambda: setattr(modifier, 'modulator', True),
+                   lambda: setattr(modifier, 'location', 'head'), lambda: delattr(modifier, 'location')]:
+        with pytest.raises(AttributeError):
+            change()
+
+    assert (modifier.dynamic, modifier.modulator) == (0, False)
+    with pytest.raises(Exception):
+        modifier.remove()
+
+@pytest.mark.parametrize('cls', SHARED)
+def test_shared_instances_survive_copies(cls):
+
+    note = Note(1/16, 'R', [cls()])
+    assert deepcopy(note).modifiers[0] is cls()
+    assert pickle.loads(pickle.dumps(cls())) is cls()
+
+def test_unshared_copies_can_change():
+
+    flam = Flam().unshared()
+    flam.dynamic = 12
+
+    assert not flam.shared and Flam().dynamic == 0
+
+def test_modulators_are_unshared():
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Flam(), 0, 'flam')
+    rhythm.modulate()
+
+    assert rhythm.modulators['flam'] is not Flam()
+    assert rhythm.modulators['flam'].modulator and not Flam().modulator
+    assert Flam() not in rhythm.notes[0].modifiers
+
+def test_locations_are_only_set_when_used():
+
+    plain = Note(1/16, 'R', [Accent()])
+    dotted = Note(1/16, 'R', [Accent()], dotted=True)
+
+    assert '_locations' not in vars(plain) and plain.right == ()
+    assert [mod.name for mod in dotted.right] == ['Dot']
+    for copy in [deepcopy(dotted), pickle.loads(pickle.dumps(dotted))]:
+        assert [mod.name for mod in copy.right] == ['Dot'] and copy.head == ()
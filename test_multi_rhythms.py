@@ -0,0 +1,163 @@
+import random
+import subprocess
+import sys
+
+import pytest
+
+from MultiRhythms import *
+from core import GRID_16TH_NOTE_ACTIONS
+import utils
+
+FACTORIES = [make_paradiddle, make_paradiddlediddle, make_flam_accent, make_flamacue]
+
+
+def seed(factory=make_paradiddle, modulator=Accent, position=0):
+    rhythm = factory()
+    rhythm.add_modulator(modulator(), position, 'accent')
+    return rhythm
+
+def note_values(rhythm):
+    return [(note.sticking, note.dynamic, note.duration.quarterLength, [mod.name for mod in note.modifiers],
+             [type(art).__name__ for art in note.articulations]) for note in rhythm.notes]
+
+def grid_values(multi_rhythm):
+    return [note_values(rhythm) for rhythm in multi_rhythm.rhythms], note_values(multi_rhythm.current_rhythm), multi_rhythm.actions
+
+
+#########################################
+#                 Lazy                  #
+#########################################
+
+@pytest.mark.parametrize('factory', FACTORIES)
+def test_lazy_matches_eager(factory):
+
+    eager = make_16th_note_grid(seed(factory))
+    lazy = make_16th_note_grid(seed(factory), lazy=True)
+
+    assert grid_values(lazy) == grid_values(eager)
+    assert note_values(lazy.rhythms[5]) == note_values(eager.rhythms[5])
+
+def test_lazy_current_rhythm():
+
+    lazy = MultiRhythm(seed(), lazy=True)
+    assert lazy.current_rhythm is lazy.default_rhythm
+
+    lazy.modulate(copies=2)
+    assert lazy.current_rhythm.get_modulator_position('accent') == 1
+
+def test_lazy_modulate_checks_arguments():
+
+    lazy = MultiRhythm(seed(), lazy=True)
+    with pytest.raises(Exception):
+        lazy.modulate(direction='sideways')
+    with pytest.raises(KeyError):
+        lazy.modulate(name='missing')
+
+    assert lazy.actions == []
+    assert len(lazy.rhythms) == 1
+
+def test_lazy_detach():
+
+    lazy = make_16th_note_grid(seed(), lazy=True)
+    shared = lazy.rhythms[4]
+
+    detached = lazy.detach(4)
+    detached.set_sticking('LLLL')
+
+    assert lazy.rhythms[4] is detached
+    assert [*lazy.rhythms][4] is detached
+    assert lazy.rhythms[5].sticking == shared.sticking == 'RLRR'
+
+def test_copy_on_write_detach():
+
+    grid = make_16th_note_grid(seed(), copy_on_write=True)
+    assert grid.rhythms[0] is grid.rhythms[1]
+
+    grid.detach(1).set_sticking('LLLL')
+    assert grid.rhythms[0].sticking == 'RLRR'
+
+
+def test_copy_on_write_modulator_not_on_a_note():
+
+    def seeded():
+        rhythm = make_paradiddle()
+        rhythm.add_modulator(Accent(), None, 'accent')
+        return rhythm
+
+    grid = MultiRhythm(seeded(), copy_on_write=True)
+    grid.modulate(name='accent')
+    grid.modulate(name='accent', direction='backward')
+    eager = MultiRhythm.replay(seeded(), grid.actions)
+
+    assert [rhythm.get_modulator_position('accent') for rhythm in grid.rhythms] == [None, 0, 3]
+    assert grid_values(grid) == grid_values(eager)
+
+#########################################
+#              Closed Form              #
+#########################################
+
+def random_plan(rng, names):
+    actions = []
+    for _ in range(rng.randint(1, 12)):
+        if rng.random() < .3:
+            actions.append(('copy', (('copies', rng.randint(1, 3)), ('_save_action', True))))
+        else:
+            actions.append(('modulate', (('direction', rng.choice(['forward', 'backward'])), ('name', rng.choice([None, *names])),
+                                         ('copies', rng.randint(1, 3)), ('_save_action', True))))
+    return actions
+
+@pytest.mark.parametrize('factory', FACTORIES)
+@pytest.mark.parametrize('copy_on_write', [False, True])
+def test_closed_form_grid(factory, copy_on_write):
+
+    replayed = make_16th_note_grid(seed(factory), copy_on_write=copy_on_write)
+    closed = make_16th_note_grid(seed(factory), copy_on_write=copy_on_write, closed_form=True)
+    assert grid_values(closed) == grid_values(replayed)
+
+@pytest.mark.parametrize('trial', range(20))
+def test_closed_form_matches_replay(trial):
+    ''' Several modulators, some not on a Note, against calling the actions one by one '''
+
+    rng = random.Random(trial)
+    factory = rng.choice(FACTORIES)
+    positions = [rng.choice([None, *range(len(factory().notes))]) for _ in range(rng.randint(1, 3))]
+    modifiers = [rng.choice([Accent, Tenuto, Diddle, Flam]) for _ in positions]
+
+    def seeded():
+        rhythm = factory()
+        for i, (modifier, position) in enumerate(zip(modifiers, positions)):
+            rhythm.add_modulator(modifier(), position, f"m{i}")
+        return rhythm
+
+    actions = random_plan(rng, [f"m{i}" for i in range(len(positions))])
+    copy_on_write = rng.random() < .5
+
+    replayed = MultiRhythm.replay(seeded(), actions, copy_on_write=copy_on_write)
+    closed = MultiRhythm(seeded(), copy_on_write=copy_on_write)
+    closed.apply_actions(actions)
+
+    assert grid_values(closed) == grid_values(replayed)
+    for replayed_rhythm, closed_rhythm in zip(replayed.rhythms, closed.rhythms):
+        assert ({name: closed_rhythm.get_modulator_position(name) for name in closed_rhythm.modulators} ==
+                {name: replayed_rhythm.get_modulator_position(name) for name in replayed_rhythm.modulators})
+
+@pytest.mark.parametrize('trial', range(20))
+def test_modulator_states_numpy(trial, monkeypatch):
+    ''' NumPy and plain Python get_modulator_states agree '''
+
+    pytest.importorskip('numpy')
+    rng = random.Random(trial)
+    length = rng.randint(1, 9)
+    modulators = [(f"m{i}", rng.choice([None, *range(length)])) for i in range(rng.randint(1, 5))]
+    steps = [(rng.choice(['forward', 'backward']), rng.choice([None, *[name for name, _ in modulators]]))
+             for _ in range(rng.randint(1, 40))]
+
+    monkeypatch.setattr(utils, 'NUMPY_MIN_MOVES', 0)
+    vectorized = utils.get_modulator_states(modulators, length, steps)
+    monkeypatch.setattr(utils, 'import_numpy', lambda: None)
+    assert vectorized == utils.get_modulator_states(modulators, length, steps)
+
+def test_numpy_not_imported_for_small_plans():
+
+    code = "import sys, core; core.compact_16th_note_grid(closed_form=True); print('numpy' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip() == 'False'
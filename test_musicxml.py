@@ -0,0 +1,111 @@
+from fractions import Fraction
+from io import StringIO
+
+import music21 as m21
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactMultiRhythm
+from musicxml import iter_musicxml, write_musicxml
+from utils import GRACE_NOTES
+
+# music21 class read back for each modifier
+ARTICULATIONS = {'Accent': 'Accent', 'Marcato': 'StrongAccent', 'Tenuto': 'Tenuto', 'Staccato': 'Staccato'}
+TREMOLOS = {'Diddle', 'Buzz'}
+GRACES = {'Flam': GRACE_NOTES['flam'], 'Drag': GRACE_NOTES['drag'], 'ThreeStrokeDrag': GRACE_NOTES['three_stroke']}
+
+
+def parse(source, **kwargs):
+    return m21.converter.parseData(''.join(iter_musicxml(source, **kwargs)), format='musicxml')
+
+def get_notes(source):
+    rhythms = source.rhythms if hasattr(source, 'rhythms') else [source]
+    return [note for rhythm in rhythms for note in rhythm.notes]
+
+def expected_values(notes):
+    ''' (offset, quarter length, dots, sticking, articulations, tremolo, grace count) of every Note '''
+
+    values, offset = [], Fraction(0)
+    for note in notes:
+        names = [mod.name for mod in note.modifiers]
+        values.append((offset, Fraction(note.duration.quarterLength), note.duration.dots, note.sticking,
+                       sorted([ARTICULATIONS[name] for name in names if name in ARTICULATIONS]),
+                       any([name in TREMOLOS for name in names]),
+                       sum([GRACES.get(name, 0) for name in names])))
+        offset += Fraction(note.duration.quarterLength)
+    return values
+
+def parsed_values(score):
+    ''' Same values read from a parsed score, grace notes are counted on the Note they lead into '''
+
+    values, graces = [], 0
+    for note in score.flatten().notes:
+        if note.duration.isGrace:
+            graces += 1
+            continue
+        values.append((Fraction(m21.common.opFrac(note.getOffsetInHierarchy(score))), Fraction(note.duration.quarterLength), note.duration.dots, note.lyric,
+                       sorted([type(articulation).__name__ for articulation in note.articulations]),
+                       any([isinstance(expression, m21.expressions.Tremolo) for expression in note.expressions]),
+                       graces))
+        graces = 0
+    return values
+
+def make_mixed():
+    rhythm = Rhythm(1/16)
+    rhythm.add_note('R', Accent())
+    rhythm.add_note('L', Flam())
+    rhythm.add_note('R', 1/12, Tenuto())
+    rhythm.add_note('L', 1/12, Drag())
+    rhythm.add_note('B', 1/12, Marcato())
+    rhythm.add_note('R', 1/8, dotted=True)
+    rhythm.add_note('L', 1/16, Diddle())
+    rhythm.add_note('R', 1/16, Staccato())
+    rhythm.add_note('L', 1/4, Buzz())
+    rhythm.add_note('R', 1/8, dotted='double')
+    rhythm.add_note('L', 1/32)
+    return rhythm
+
+
+@pytest.mark.parametrize('make', [make_mixed, make_paradiddle, make_flam_accent, make_flamacue])
+def test_rhythm(make):
+
+    rhythm = make()
+    assert parsed_values(parse(rhythm)) == expected_values(rhythm.notes)
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_grid(compact):
+
+    grid = make_16th_note_grid(make_paradiddle())
+    source = CompactMultiRhythm.from_multi_rhythm(grid) if compact else grid
+    score = parse(source, title='Paradiddle grid')
+
+    assert parsed_values(score) == expected_values(get_notes(grid))
+    assert len(score.parts[0].getElementsByClass('Measure')) == len(grid.rhythms) // 4
+    assert score.metadata.title == 'Paradiddle grid'
+
+def test_dynamics():
+
+    rhythm = Rhythm(1/16)
+    for sticking, modifiers, dynamic in [('R', [], 3), ('L', [Accent()], 3), ('R', [], 9), ('L', [Marcato()], 9),
+                                         ('R', [Tenuto()], 12), ('L', [Staccato()], 3), ('R', [], 3)]:
+        rhythm.add_note(sticking, modifiers, dynamic=dynamic)
+    score = parse(rhythm)
+
+    # A dynamic is written where the Notes' own dynamic changes, modifiers only add their articulation
+    assert [dynamic.value for dynamic in score.flatten().getElementsByClass('Dynamic')] == ['p', 'mf', 'f', 'p']
+    assert parsed_values(score) == expected_values(rhythm.notes)
+
+def test_time_signature():
+
+    rhythm = make_mixed()
+    score = parse(rhythm, time_signature=(3, 8))
+    measures = score.parts[0].getElementsByClass('Measure')
+    assert measures[0].timeSignature.ratioString == '3/8'
+    assert parsed_values(score) == expected_values(rhythm.notes)
+
+def test_write():
+
+    file = StringIO()
+    write_musicxml(make_paradiddle(), file, part_name='Snare & Tenor')
+    assert file.getvalue() == ''.join(iter_musicxml(make_paradiddle(), part_name='Snare & Tenor'))
+    assert 'Snare &amp; Tenor' in file.getvalue()
@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+from MultiRhythms import *
+from profiling import JsonLinesSink, MemorySink, PrometheusSink, Profiler
+import utils
+from utils import rhythm_duration
+
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler(MemorySink())
+    yield profiler
+    profiler.close()
+    assert not utils.ACTION_HOOKS and not utils.FACTORY_HOOKS
+
+def test_records_outer_calls(profiler):
+
+    with profiler:
+        grid = make_16th_note_grid(make_paradiddlediddle())
+    stats = profiler.sinks[0].stats()
+
+    # make_paradiddlediddle starts from make_paradiddle, only the outer call is recorded
+    assert [*stats['factory']] == ['make_paradiddlediddle']
+    assert stats['factory']['make_paradiddlediddle']['notes'] == len(grid.default_rhythm)
+    actions = {name: values['calls'] for name, values in stats['action'].items()}
+    assert actions == {name: sum([1 for action, _ in grid.actions if action == name]) for name, _ in grid.actions}
+    assert sum([values['notes'] for values in stats['action'].values()]) == (len(grid.rhythms) - 1) * len(grid.default_rhythm)
+
+def test_enabled_during_a_call(profiler):
+    ''' Calls that started before enable end without a start and are not recorded
+        Hooks are only called when one is enabled as the call starts, the other profiler is '''
+
+    @rhythm_duration
+    def make_enabling(duration=1/4):
+        profiler.enable()
+        return make_paradiddle()
+
+    with Profiler() as other:
+        make_enabling()
+
+    assert [*profiler.sinks[0].stats()['factory']] == ['make_paradiddle']
+    assert [*other.sinks[0].stats()['factory']] == ['make_enabling']
+
+def test_enabled_during_a_failing_call(profiler):
+
+    @rhythm_duration
+    def make_failing(duration=1/4):
+        profiler.enable()
+        raise ValueError('rudiment failed')
+
+    with Profiler():
+        with pytest.raises(ValueError, match='rudiment failed'):
+            make_failing()
+
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Accent(), 0, 'accent')
+    multi_rhythm = MultiRhythm(rhythm)
+    with pytest.raises(Exception, match='position only accepts'):
+        multi_rhythm.modulate(direction='sideways')
+
+def test_disabled_during_a_call(profiler):
+    ''' A call still running when the profiler is disabled does not hide later calls '''
+
+    @rhythm_duration
+    def make_disabling(duration=1/4):
+        profiler.disable()
+        return make_paradiddle()
+
+    with Profiler():
+        profiler.enable()
+        make_disabling()
+        profiler.enable()
+        make_paradiddle()
+
+    assert profiler.sinks[0].stats()['factory']['make_paradiddle']['calls'] == 1
+
+def test_sinks():
+
+    lines, prometheus = io.StringIO(), PrometheusSink()
+    with Profiler(JsonLinesSink(lines), prometheus) as profiler:
+        make_flamacue()
+    profiler.close()
+
+    record = json.loads(lines.getvalue().splitlines()[0])
+    assert (record['kind'], record['name'], record['notes']) == ('factory', 'make_flamacue', len(make_flamacue()))
+    text = prometheus.render()
+    assert 'grid_builder_call_seconds_count{kind="factory",name="make_flamacue"} 1' in text
+    assert 'grid_builder_call_notes_bucket{kind="factory",name="make_flamacue",le="+Inf"} 1' in text
@@ -0,0 +1,78 @@
+import re
+
+import pytest
+
+from MultiRhythms import *
+from CompactRhythms import CompactMultiRhythm, CompactRhythm
+from rudiment_html import TABLE_ID, GridRenderer
+
+
+def apply_fragments(page, fragments):
+    ''' What applyFragments does in the browser, swap each element with the same id '''
+
+    for cell_id, html in fragments.items():
+        if cell_id == TABLE_ID:
+            pattern = rf' *<table [^>]*id="{TABLE_ID}">.*?</table>\n'
+        else:
+            pattern = rf'<td id="{cell_id}">.*?</td>'
+        page, count = re.subn(pattern, lambda match: html, page, flags=re.DOTALL)
+        assert count == 1, f"{cell_id} is not in the page once"
+
+    return page
+
+def make_rhythm():
+    rhythm = make_paradiddle()
+    rhythm.add_modulator(Tenuto(), 2, 'tenuto')
+    return rhythm
+
+
+def test_modulated_rhythm():
+
+    rhythm = make_rhythm()
+    renderer = GridRenderer(rhythm)
+    page = renderer.render_page()
+
+    rhythm.modulate(name='tenuto')
+    fragments = renderer.update(rhythm)
+
+    # Only the Notes the modulator left and landed on are sent
+    assert set(fragments) == {'p3_stroke', 'p4_stroke'}
+    assert apply_fragments(page, fragments) == GridRenderer(rhythm).render_page()
+    assert renderer.update(rhythm) == {}
+
+def test_update_note():
+
+    rhythm = make_rhythm()
+    renderer = GridRenderer(rhythm)
+    page = renderer.render_page()
+
+    rhythm.modulate(name='tenuto')
+    rhythm.set_sticking('_B')
+    for position in [1, 2, 3]:
+        page = apply_fragments(page, renderer.update_note(position, rhythm.notes[position]))
+
+    assert page == GridRenderer(rhythm).render_page()
+    assert renderer.update(rhythm) == {}
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_modulated_grid(compact):
+
+    grid = make_16th_note_grid(make_rhythm())
+    if compact: grid = CompactMultiRhythm.from_multi_rhythm(grid)
+    renderer = GridRenderer(grid)
+    page = renderer.render_page()
+
+    # New rhythms change the number of columns, the whole table is sent
+    grid.modulate(name='tenuto', copies=2)
+    fragments = renderer.update(grid)
+    assert set(fragments) == {TABLE_ID}
+    page = apply_fragments(page, fragments)
+    assert page == GridRenderer(grid).render_page()
+
+    # Modulating the last rhythm in place keeps the columns
+    last = len(grid.rhythms) - 1
+    grid.rhythms[last] = grid.rhythms[last].modulated('backward', 'tenuto')
+    fragments = renderer.update(grid)
+    assert fragments and TABLE_ID not in fragments
+    assert all([int(re.match(r'p(\d+)_', cell_id).group(1)) > 4 * last for cell_id in fragments])
+    assert apply_fragments(page, fragments) == GridRenderer(grid).render_page()
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from MultiRhythms import *
+from search import RhythmIndex
+
+MODIFIERS = {'accent': Accent, 'tenuto': Tenuto, 'flam': Flam}
+
+
+def make_rhythms(count, seed=0):
+    ''' Random short rhythms over a small alphabet so stickings and modifiers repeat and overlap '''
+
+    rng = random.Random(seed)
+    rhythms = []
+    for _ in range(count):
+        rhythm = Rhythm(1/16)
+        for _ in range(rng.randint(1, 8)):
+            sticking = rng.choice('RRLLB')
+            names = [name for name in MODIFIERS if rng.random() < 0.2 and not (name == 'flam' and sticking == 'B')]
+            rhythm.add_note(sticking, *[MODIFIERS[name]() for name in names])
+        rhythms.append(rhythm)
+
+    return rhythms
+
+def describe(rhythm):
+    ''' (sticking, [set of modifier names per Note]) read straight from the Notes '''
+    return ''.join([note.sticking for note in rhythm.notes]), [{mod.name.lower() for mod in note.modifiers} for note in rhythm.notes]
+
+def scan(items, matches):
+    ''' {item key: rhythm indices} of the rhythms matches accepts, checked one by one '''
+
+    found = {}
+    for key, item in items.items():
+        for i, rhythm in enumerate(item.rhythms if hasattr(item, 'rhythms') else [item]):
+            if matches(*describe(rhythm)):
+                found.setdefault(key, []).append(i)
+    return found
+
+def starts(sticking, text):
+    return [start for start in range(len(sticking) - len(text) + 1) if sticking[start:start + len(text)] == text]
+
+@pytest.fixture(scope='module')
+def library():
+
+    items = dict(enumerate(make_rhythms(60)))
+    items['grid'] = make_16th_note_grid(make_paradiddle())
+    index = RhythmIndex()
+    for key, item in items.items():
+        index.add(item, key)
+    return items, index
+
+@pytest.mark.parametrize('text', ['R', 'RL', 'RR', 'RLRR', 'LLL', 'BB', 'RBL', 'BBBBBBBBB'])
+def test_sticking_queries(library, text):
+
+    items, index = library
+    assert index.get_items(index.search(contains=text)) == scan(items, lambda sticking, mods: text in sticking)
+    assert index.get_items(index.search(prefix=text)) == scan(items, lambda sticking, mods: sticking.startswith(text))
+    assert index.get_items(index.search(suffix=text)) == scan(items, lambda sticking, mods: sticking.endswith(text))
+    assert index.get_items(index.search(sticking=text)) == scan(items, lambda sticking, mods: sticking == text)
+
+@pytest.mark.parametrize('modifiers', [{0: 'accent'}, {-1: 'flam'}, {1: ['accent', 'tenuto']}, {0: 'accent', -1: 'tenuto'}, {20: 'accent'}])
+def test_modifier_queries(library, modifiers):
+
+    def matches(sticking, mods):
+        return all([-len(mods) <= position < len(mods) and set([names] if type(names) == str else names) <= mods[position]
+                    for position, names in modifiers.items()])
+
+    items, index = library
+    assert index.get_items(index.search(modifiers=modifiers)) == scan(items, matches)
+    assert index.get_items(index.search(contains='RL', modifiers=modifiers)) == scan(items, lambda sticking, mods: 'RL' in sticking and matches(sticking, mods))
+
+@pytest.mark.parametrize('text, modifiers', [('RR', {1: 'accent'}), ('LL', {1: 'accent'}), ('RL', {0: 'accent', 1: 'tenuto'}),
+                                             ('LR', {0: 'flam'}), ('RRR', {1: 'accent'}), ('BLB', {2: 'tenuto'}),
+                                             ('RLRR', {0: 'accent'}), ('LLLLLLLLL', {0: 'accent'})])
+def test_search_at_match(library, text, modifiers):
+
+    def matches(sticking, mods):
+        return any([all([name in mods[start + offset] for offset, name in modifiers.items()]) for start in starts(sticking, text)])
+
+    items, index = library
+    assert index.get_items(index.search_at_match(text, modifiers)) == scan(items, matches)
+
+def test_overlapping_matches():
+
+    # RRR holds RR at 0 and 1, only the second match has an accent on its first Note
+    rhythm = Rhythm(1/16)
+    rhythm.add_note('R')
+    rhythm.add_note('R', Accent())
+    rhythm.add_note('R')
+    index = RhythmIndex()
+    index.add(rhythm, 'rhythm')
+
+    assert index.get_items(index.search_at_match('RR', {0: 'accent'})) == {'rhythm': [0]}
+    assert index.get_items(index.search_at_match('RR', {1: 'accent'})) == {'rhythm': [0]}
+    assert index.search_at_match('RRR', {0: 'accent'}) == set()
+    assert index.search_at_match('RRRR', {0: 'accent'}) == set()
+    assert index.get_items(index.search(contains='RR')) == {'rhythm': [0]}
+
+def test_pending_inserts_are_searched():
+
+    index = RhythmIndex()
+    index.add(make_paradiddle(), 'first')
+    assert index.search(contains='BL') == set()
+    index.add(make_16th_note_grid(make_paradiddle()), 'grid')
+    index.add(make_rhythms(1, 3)[0], 'random')
+    assert set(index.get_items(index.search(contains='BL'))) == {'random'}
+    assert set(index.get_items(index.search(contains='RLRR'))) == {'first', 'grid'}
+    assert index.search(contains='BL', modifiers={0: 'accent'}) == set()
+
+@pytest.mark.parametrize('offset', [-1, 4, 10])
+def test_search_at_match_offset_outside_match(offset):
+
+    index = RhythmIndex()
+    index.add(make_paradiddle())
+    with pytest.raises(Exception, match='outside'):
+        index.search_at_match('RLRR', {offset: 'accent'})
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import service
+from service import GridService, RequestError, ResponseCache, get_key
+
+
+def test_equal_requests_share_a_key():
+
+    key = get_key('/grid', {})
+    assert get_key('/grid/', {'rudiment': 'paradiddle', 'duration': '0.25', 'start': '0'}) == key
+    assert get_key('/grid', {'duration': '0.2500000001'}) == key
+    assert get_key('/grid', {'start': '8'}) == key       # a paradiddle has 8 Notes
+    assert get_key('/grid', {'start': '9'}) == get_key('/grid', {'start': '1'})
+
+@pytest.mark.parametrize('params', [{'duration': 'nan'}, {'duration': 'inf'}, {'duration': '-0.25'}, {'duration': '0'},
+                                    {'duration': '1e-9'}, {'duration': str(1/11)}, {'duration': 'quarter'},
+                                    {'start': '-1'}, {'start': '1.5'}, {'rudiment': 'ratamacue'}, {'format': 'pdf'},
+                                    {'template': '8th_note_grid'}])
+def test_bad_requests(params):
+    with pytest.raises(RequestError):
+        get_key('/grid', params)
+
+def test_unknown_endpoint():
+    with pytest.raises(LookupError):
+        get_key('/sheet', {})
+
+def test_cache_expires_and_evicts():
+
+    cache = ResponseCache(maxsize=2, ttl=300)
+    cache.store('a', b'a')
+    cache.store('b', b'b')
+    cache.get('a')
+    cache.store('c', b'c')
+    assert [*cache.entries] == ['a', 'c']
+
+    cache = ResponseCache(ttl=-1)
+    cache.store('a', b'a')
+    assert cache.get('a') == None and len(cache) == 0
+
+
+async def run_requests(service, targets):
+    return await asyncio.gather(*[service.handle('GET', target) for target in targets])
+
+def test_coalesced_and_cached():
+
+    service = GridService(workers=0)
+    try:
+        targets = ['/grid?start=1', '/grid?start=9&duration=0.25', '/grid?rudiment=paradiddle&start=1']
+        responses = asyncio.run(run_requests(service, targets))
+        assert [status for status, _, _ in responses] == [200] * 3
+        assert len({body for _, _, body in responses}) == 1
+        assert service.metrics.counts['builds'] == 1
+        assert service.metrics.counts['coalesced'] == 2
+
+        asyncio.run(run_requests(service, ['/grid?start=1']))
+        assert service.metrics.counts['builds'] == 1
+        assert service.metrics.counts['cache_hits'] == 1
+        assert json.loads(responses[0][2])
+    finally:
+        service.close()
+
+def test_bad_request_status():
+
+    service = GridService(workers=0)
+    try:
+        (status, _, body), = asyncio.run(run_requests(service, ['/grid?duration=nan']))
+        assert status == 400 and b'duration' in body
+        (status, _, _), = asyncio.run(run_requests(service, ['/sheet']))
+        assert status == 404
+    finally:
+        service.close()
+
+def test_cancelled_build_does_not_strand_waiters(monkeypatch):
+    ''' A coalesced request builds the key itself when the request it waited on is cancelled '''
+
+    release = threading.Event()
+    def build(key):
+        release.wait(5)
+        return repr(key).encode()
+    monkeypatch.setattr(service, 'build', build)
+
+    async def run(grid_service):
+        key = get_key('/grid', {})
+        owner = asyncio.create_task(grid_service.get(key))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(grid_service.get(key))
+        await asyncio.sleep(0)
+        assert grid_service.metrics.counts['coalesced'] == 1
+
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        release.set()
+        return await asyncio.wait_for(waiter, 5), key
+
+    grid_service = GridService(workers=0)
+    try:
+        body, key = asyncio.run(run(grid_service))
+        assert body == repr(key).encode()
+        assert not grid_service.in_flight and grid_service.queue_depth == 0
+    finally:
+        grid_service.close()
@@ -0,0 +1,83 @@
+from itertools import product
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from stickings import count_stickings, get_stickings, make_rudiments
+
+
+def longest_run(sticking, hand, cyclic):
+    played = ''.join(['x' if stroke in [hand, 'B'] else '.' for stroke in sticking])
+    if cyclic: played *= 2
+    return max([len(run) for run in played.split('.')])
+
+def brute_force(notes, prefix='', max_both=0, max_consecutive=None, max_imbalance=None,
+                accents=(), flams=(), accent_hand=None, flam_hand=None, cyclic=False):
+    ''' Every sticking from itertools.product checked one at a time '''
+
+    stickings = []
+    for sticking in map(''.join, product('RLB', repeat=notes)):
+        if any([fixed not in ['_', stroke] for fixed, stroke in zip(prefix, sticking)]): continue
+        if sticking.count('B') > max_both: continue
+        if any([sticking[position % notes] == 'B' for position in flams]): continue
+        if any([hand != None and sticking[position % notes] != hand
+                for positions, hand in [(accents, accent_hand), (flams, flam_hand)] for position in positions]): continue
+        if max_consecutive != None and max([longest_run(sticking, hand, cyclic) for hand in 'RL']) > max_consecutive: continue
+        if max_imbalance != None:
+            right, left = [len([stroke for stroke in sticking if stroke in [hand, 'B']]) for hand in 'RL']
+            if abs(right - left) > max_imbalance: continue
+        stickings.append(sticking)
+
+    return stickings
+
+CONSTRAINTS = [{},
+               {'max_consecutive': 2},
+               {'max_consecutive': 1, 'cyclic': True},
+               {'max_consecutive': 2, 'cyclic': True, 'max_imbalance': 0},
+               {'max_imbalance': 1, 'max_both': 1},
+               {'max_both': 2, 'max_consecutive': 2},
+               {'prefix': 'R_L', 'max_both': 1},
+               {'prefix': 'B', 'max_both': 1, 'max_consecutive': 3},
+               {'accents': [0, 3], 'accent_hand': 'R', 'max_consecutive': 2},
+               {'flams': [1, -1], 'flam_hand': 'L', 'max_both': 2},
+               {'flams': [0], 'max_both': 1, 'cyclic': True, 'max_consecutive': 2},
+               {'prefix': 'L', 'accents': [0], 'accent_hand': 'R'}]
+
+@pytest.mark.parametrize('notes', [1, 3, 4, 6])
+@pytest.mark.parametrize('constraints', CONSTRAINTS)
+def test_matches_brute_force(notes, constraints):
+
+    if len(constraints.get('prefix', '')) > notes: pytest.skip('prefix longer than the rudiment')
+
+    expected = brute_force(notes, **constraints)
+    found = get_stickings(notes, **constraints, chunk_size=4)
+
+    assert len(found) == len(set(found))
+    assert sorted(found) == sorted(expected)
+    assert count_stickings(notes, **constraints) == len(expected)
+
+def test_limit():
+
+    everything = get_stickings(6, max_consecutive=2)
+    assert get_stickings(6, limit=5, max_consecutive=2, chunk_size=2) == everything[:5]
+
+def test_rudiments():
+
+    rudiments = [*make_rudiments(4, duration=1/4, accents=[0], flams=[2], max_consecutive=2, limit=3)]
+    assert len(rudiments) == 3
+    for rhythm in rudiments:
+        assert rhythm.sticking in brute_force(4, max_consecutive=2, flams=[2])
+        assert [[mod.name for mod in note.modifiers] for note in rhythm.notes] == [['Accent'], [], ['Flam'], []]
+        assert sum([note.duration.quarterLength for note in rhythm.notes]) == 1
+
+def test_invalid_arguments():
+
+    with pytest.raises(Exception, match='supports up to'):
+        get_stickings(33)
+    with pytest.raises(Exception, match='longer than'):
+        get_stickings(2, prefix='RLR')
+    with pytest.raises(Exception, match='Invalid sticking'):
+        get_stickings(4, prefix='X')
+    with pytest.raises(Exception, match='Hand must be'):
+        get_stickings(4, accents=[0], accent_hand='B')
@@ -0,0 +1,46 @@
+from MultiRhythms import *
+from CompactRhythms import CompactRhythm
+from core import compact_paradiddle
+from templates import TemplateCache, cached_rudiment
+
+
+def test_hits_are_independent():
+
+    paradiddle = cached_rudiment(make_paradiddle, TemplateCache())
+    first, second = paradiddle(), paradiddle(1/4)
+
+    assert paradiddle.cache.cache_info()[:2] == (1, 1)
+    assert not any([a is b for a, b in zip(first.notes, second.notes)])
+    assert CompactRhythm.from_rhythm(second) == CompactRhythm.from_rhythm(make_paradiddle())
+
+def test_editing_a_hit_leaves_later_hits():
+
+    paradiddle = cached_rudiment(make_paradiddle, TemplateCache())
+    expected = CompactRhythm.from_rhythm(paradiddle())
+
+    # The miss and a hit, edited in place through the ordinary Rhythm API
+    for rhythm in [paradiddle(), paradiddle()]:
+        rhythm.set_sticking('LLLL')
+        rhythm.set_duration(1/8)
+        rhythm.add_modulator(Accent(), 1, 'accent')
+        rhythm.notes[2].add_modifier(Tenuto())
+        make_16th_note_grid(rhythm)
+
+    assert paradiddle().sticking == 'RLRR'
+    assert CompactRhythm.from_rhythm(paradiddle()) == expected
+
+def test_compact_hits_are_copies():
+
+    paradiddle = cached_rudiment(compact_paradiddle, TemplateCache())
+    paradiddle().set_sticking('LLLL')
+
+    assert paradiddle().sticking == 'RLRR'
+
+def test_eviction():
+
+    cache = TemplateCache(maxsize=1)
+    cache.get(make_paradiddle)
+    cache.get(make_flamacue)
+    cache.get(make_paradiddle)
+
+    assert cache.cache_info() == (0, 3, 2, 1, 1)
@@ -0,0 +1,112 @@
+from fractions import Fraction
+
+import pytest
+
+from MultiRhythms import *
+from timeline import Timeline, align, get_alignment, get_coincident
+from utils import TICKS_PER_WHOLE
+
+
+def make_mixed(repeats=1):
+    ''' Triplet quarters, triplet 8ths, a dotted 8th and a 16th, 5/8 of a whole note per repeat '''
+
+    rhythm = Rhythm(1/12)
+    for _ in range(repeats):
+        for sticking in 'RLR': rhythm.add_note(sticking)
+        for sticking in 'LRL': rhythm.add_note(sticking, 1/24)
+        rhythm.add_note('R', 1/8, dotted=True)
+        rhythm.add_note('L', 1/16)
+    return rhythm
+
+def whole_note_onsets(rhythm):
+    ''' Onsets in whole notes from music21's own offsets '''
+    return [Fraction(note.offset) / 4 for note in rhythm.notes]
+
+def whole_note_durations(rhythm):
+    return [Fraction(note.duration.quarterLength) / 4 for note in rhythm.notes]
+
+
+def test_mixed_tuplets():
+
+    rhythm = make_mixed()
+    timeline = Timeline.from_rhythm(rhythm)
+
+    assert timeline.resolution == 48
+    assert list(timeline.durations) == [4, 4, 4, 2, 2, 2, 9, 3]
+    assert list(timeline.onsets) == [0, 4, 8, 12, 14, 16, 18, 27]
+    assert timeline.get_duration() == Fraction(5, 8)
+    assert timeline.length * (TICKS_PER_WHOLE // timeline.resolution) == rhythm.get_ticks() == TICKS_PER_WHOLE * 5 // 8
+    assert [timeline.get_offset(i) for i in range(len(timeline))] == whole_note_onsets(rhythm)
+
+def test_long_rhythm_has_exact_totals():
+
+    # 1/12 and 1/24 add up to repeating decimals, steps do not drift however many there are
+    rhythm = make_mixed(100)
+    timeline = Timeline.from_rhythm(rhythm)
+
+    assert timeline.length == 100 * 30
+    assert timeline.get_duration() == Fraction(100 * 5, 8)
+    assert timeline.length * (TICKS_PER_WHOLE // timeline.resolution) == rhythm.get_ticks()
+    assert [timeline.get_offset(i) for i in range(len(timeline))] == whole_note_onsets(rhythm)
+
+    bars, positions = timeline.get_bar_positions((5, 8))
+    assert list(positions[::8]) == [0] * 100
+    assert list(bars[::8]) == list(range(100))
+
+def test_round_trip_to_durations():
+
+    rhythm = make_mixed()
+    timeline = Timeline.from_rhythm(rhythm)
+    durations = [Fraction(steps, timeline.resolution) for steps in timeline.durations]
+    assert durations == whole_note_durations(rhythm)
+
+    # Undotted lengths rebuild the same Notes
+    rebuilt = Rhythm()
+    for sticking, duration, note in zip('RLRLRLRL', durations, rhythm.notes):
+        dotted = any([mod.name == 'Dot' for mod in note.modifiers])
+        rebuilt.add_note(sticking, float(duration / Fraction(3, 2) if dotted else duration), dotted=dotted)
+    assert Timeline.from_rhythm(rebuilt) == timeline
+
+    rescaled = timeline.rescale(96)
+    assert [Fraction(steps, rescaled.resolution) for steps in rescaled.durations] == durations
+    assert rescaled.rescale(96) is rescaled
+
+def test_alignment():
+
+    mixed, grid = make_mixed(2), make_16th_note_grid(make_paradiddle())
+    timelines = [Timeline.from_rhythm(mixed), Timeline.from_rhythm(grid)]
+    assert [timeline.resolution for timeline in timelines] == [48, 16]
+
+    aligned = align(*timelines)
+    assert [timeline.resolution for timeline in aligned] == [48, 48]
+    assert [timeline.get_duration() for timeline in aligned] == [timeline.get_duration() for timeline in timelines]
+
+    # Compare with onsets in whole notes from music21
+    onsets = [whole_note_onsets(mixed),
+              [offset + Fraction(i, 4) for i, rhythm in enumerate(grid.rhythms) for offset in whole_note_onsets(rhythm)]]
+    steps = sorted(set(onsets[0]) | set(onsets[1]))
+
+    alignment = get_alignment(*timelines)
+    assert [Fraction(step, 48) for step, _ in alignment] == steps
+    for step, indices in alignment:
+        for offsets, index in zip(onsets, indices):
+            assert (Fraction(step, 48) in offsets) == (index != None)
+            if index != None: assert offsets[index] == Fraction(step, 48)
+
+    assert [Fraction(step, 48) for step in get_coincident(*timelines)] == sorted(set(onsets[0]) & set(onsets[1]))
+
+def test_resolution_errors():
+
+    timeline = Timeline.from_rhythm(make_mixed())
+    with pytest.raises(Exception, match='multiple of 48'):
+        Timeline.from_rhythm(make_mixed(), resolution=32)
+    with pytest.raises(Exception, match='not a multiple'):
+        timeline.rescale(72)
+    with pytest.raises(Exception, match='between steps'):
+        timeline.to_step(Fraction(1, 96))
+    with pytest.raises(Exception, match='whole number of steps'):
+        Timeline.from_rhythm(make_16th_note_grid(make_paradiddle())).rescale(16).get_bar_steps((7, 32))
+
+    assert timeline.to_step(Fraction(3, 8)) == 18
+    assert timeline.get_index_at(17) == 5
+    assert timeline.get_index_at(30) == None
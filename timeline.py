@@ -0,0 +1,187 @@
+''' Exact integer timeline of a grid
+
+    Note lengths are kept as integer steps at the least common multiple resolution of the grid's
+    subdivisions, 16 steps per whole note for a 16th note grid, 48 once triplets are mixed in. Onsets
+    are running sums of the steps, so offsets, bar filling and the alignment of several rhythms
+    are integer arithmetic with no float tolerance, and the columns can be handed to NumPy as is
+
+    timeline = Timeline.from_rhythm(make_16th_note_grid(make_flam_accent()))
+    timeline.resolution                   # 12, triplet 8th notes
+    bars, positions = timeline.get_bar_positions((4, 4))
+    align(timeline, Timeline.from_rhythm(make_16th_note_grid()))   # both at one resolution
+'''
+from array import array
+from bisect import bisect_right
+from fractions import Fraction
+from itertools import accumulate
+from math import gcd, lcm
+
+try:
+    from .CompactRhythms import iter_compact
+    from .utils import TICKS_PER_WHOLE
+except ImportError:
+    from CompactRhythms import iter_compact
+    from utils import TICKS_PER_WHOLE
+
+
+def get_resolution(ticks):
+    ''' Fewest steps per whole note that give every length in ticks a whole number of steps '''
+    return TICKS_PER_WHOLE // gcd(TICKS_PER_WHOLE, *ticks)
+
+
+class Timeline:
+    ''' Onset and length of every Note as integer steps, resolution steps per whole note
+
+        Columns
+            onsets: steps from the start of the timeline
+            durations: Note lengths in steps
+            sticking_codes, dynamics, masks: as CompactRhythm, masks include modulators '''
+
+    def __init__(self, resolution, durations, sticking_codes=None, dynamics=None, masks=None):
+
+        self.resolution = resolution
+        self.durations = array('q', durations)
+        self.onsets = array('q', accumulate(self.durations, initial=0))
+        self.length = self.onsets.pop()
+
+        self.sticking_codes = array('b', sticking_codes or [])
+        self.dynamics = array('b', dynamics or [])
+        self.masks = array('l', masks or [])
+
+    def __repr__(self):
+        return f"Timeline(resolution={self.resolution}, notes={len(self)}, length={self.get_duration()})"
+
+    def __len__(self):
+        return len(self.durations)
+
+    def __eq__(self, other):
+        if not isinstance(other, Timeline): return NotImplemented
+        return (self.resolution == other.resolution and
+                self.durations == other.durations and
+                self.sticking_codes == other.sticking_codes and
+                self.dynamics == other.dynamics and
+                self.masks == other.masks)
+
+    @classmethod
+    def from_rhythm(cls, source, resolution=None):
+        ''' Timeline of a Rhythm, MultiRhythm or their compact versions
+            resolution: steps per whole note, default the least that keeps every length exact '''
+
+        ticks, sticking_codes, dynamics, masks = array('l'), array('b'), array('b'), array('l')
+        for rhythm in iter_compact(source):
+            ticks.extend(rhythm.ticks)
+            sticking_codes.extend(rhythm.sticking_codes)
+            dynamics.extend(rhythm.dynamics)
+            masks.extend(rhythm.get_masks())
+
+        minimum = get_resolution(set(ticks))
+        if resolution == None:
+            resolution = minimum
+        elif resolution % minimum:
+            raise Exception(f"Resolution {resolution} can not hold every Note length, use a multiple of {minimum}")
+
+        step = TICKS_PER_WHOLE // resolution
+        return cls(resolution, [value // step for value in ticks], sticking_codes, dynamics, masks)
+
+    def rescale(self, resolution):
+        ''' Same timeline at a resolution that is a multiple of the current one '''
+
+        if resolution == self.resolution: return self
+        if resolution % self.resolution:
+            raise Exception(f"Resolution {resolution} is not a multiple of {self.resolution}")
+
+        factor = resolution // self.resolution
+        return Timeline(resolution, [value * factor for value in self.durations], self.sticking_codes, self.dynamics, self.masks)
+
+    #########################################
+    #                Offsets                #
+    #########################################
+
+    def get_duration(self):
+        ''' Exact length in whole notes '''
+        return Fraction(self.length, self.resolution)
+
+    def get_offset(self, index):
+        ''' Exact onset of a Note in whole notes '''
+        return Fraction(self.onsets[index], self.resolution)
+
+    def get_index_at(self, step):
+        ''' Index of the Note playing at a step, None past the end '''
+
+        if not 0 <= step < self.length: return None
+        return bisect_right(self.onsets, step) - 1
+
+    def to_step(self, offset):
+        ''' Step of an offset in whole notes, which must fall on a step '''
+
+        step = Fraction(offset) * self.resolution
+        if step.denominator != 1:
+            raise Exception(f"Offset {offset} is between steps at resolution {self.resolution}")
+        return int(step)
+
+    #########################################
+    #                 Bars                  #
+    #########################################
+
+    def get_bar_steps(self, time_signature=(4, 4)):
+        ''' Steps in one bar, the resolution has to divide the bar exactly '''
+
+        beats, beat_unit = time_signature
+        steps = Fraction(self.resolution * beats, beat_unit)
+        if steps.denominator != 1:
+            raise Exception(f"A {beats}/{beat_unit} bar is not a whole number of steps at resolution {self.resolution}, rescale to {lcm(self.resolution, beat_unit)}")
+        return int(steps)
+
+    def get_bar_positions(self, time_signature=(4, 4)):
+        ''' (bar index, steps from the start of the bar) arrays of every Note onset '''
+
+        bar_steps = self.get_bar_steps(time_signature)
+        return array('q', [onset // bar_steps for onset in self.onsets]), array('q', [onset % bar_steps for onset in self.onsets])
+
+    def get_bar_starts(self, time_signature=(4, 4)):
+        ''' Index of the first Note starting in each bar, a bar no Note starts in gets the index of the next Note '''
+
+        bar_steps = self.get_bar_steps(time_signature)
+        bars = -(-self.length // bar_steps)
+        return [bisect_right(self.onsets, bar * bar_steps - 1) for bar in range(bars)]
+
+    def to_numpy(self):
+        ''' {column: NumPy array} views of the columns, nothing is copied '''
+
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                for name in ['onsets', 'durations', 'sticking_codes', 'dynamics', 'masks']}
+
+
+###############################################################################
+#                                                                             #
+#                                                                             #
+#                                  Alignment                                  #
+#                                                                             #
+#                                                                             #
+###############################################################################
+
+def align(*timelines):
+    ''' Timelines rescaled to one common resolution, the least common multiple of theirs '''
+
+    resolution = lcm(*[timeline.resolution for timeline in timelines])
+    return [timeline.rescale(resolution) for timeline in timelines]
+
+def get_alignment(*timelines):
+    ''' Sorted [(step, (Note index or None for every timeline))] at every step a Note of any timeline starts
+        Timelines are aligned first, so steps are at their common resolution '''
+
+    timelines = align(*timelines)
+
+    starts = {}
+    for i, timeline in enumerate(timelines):
+        for index, onset in enumerate(timeline.onsets):
+            starts.setdefault(onset, [None] * len(timelines))[i] = index
+
+    return [(step, tuple(indices)) for step, indices in sorted(starts.items())]
+
+def get_coincident(*timelines):
+    ''' Steps where every timeline starts a Note together, at their common resolution '''
+
+    onsets = [set(timeline.onsets) for timeline in align(*timelines)]
+    return sorted(set.intersection(*onsets))
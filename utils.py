@@ -1,4 +1,9 @@
-from itertools import cycle
+from fractions import Fraction
+import functools
+from itertools import accumulate, cycle
+
+# (modulator, step) moves from which get_modulator_states uses NumPy, below it plain Python is faster
+NUMPY_MIN_MOVES = 128
 
 DYNAMICS = {'pp': 1, 
             'p': 3, 
@@ -20,7 +25,37 @@ MODIFIERS = {'articulation': {'accent': 1,
             'grace_note': {'flam': 7,
                             'drag': 8,
                             'three_stroke': 9},
-            'duration': {'dot': 10}}
+            'duration': {'dot': 10,
+                        'double_dot': 11}}
+
+# Dynamic set on a Note by modifiers that change it
+MODIFIER_DYNAMICS = {'marcato': 15,
+                     'staccato': 6,
+                     'tenuto': 9}
+
+# Flat lookup of modifier codes, a Note's modifiers are stored as a bitmask of 1 << code
+MODIFIER_CODES = {name: code for group in MODIFIERS.values() for name, code in group.items()}
+
+# Duration multipliers for dotted Notes
+DURATION_MULTIPLIERS = {'dot': 1.5,
+                        'double_dot': 1.75}
+
+# Grace strokes played before a Note by grace note modifiers
+GRACE_NOTES = {'flam': 1,
+               'drag': 2,
+               'three_stroke': 3}
+
+# Integer resolution of a whole note, divisible by every tuplet and dot combination used in the rudiments
+# 1/16 = 5040, 1/12 = 6720, 1/24 = 3360, double dotted 1/64 = 2205
+TICKS_PER_WHOLE = 80640
+
+# Strokes a tremolo modifier plays in the length of its Note on playback
+TREMOLO_STROKES = {'diddle': 2,
+                   'buzz': 4}
+
+# Playback: grace strokes are a 128th note apart and lead into their Note, accents add dynamic levels up to ff
+GRACE_TICKS = TICKS_PER_WHOLE // 128
+ACCENT_BOOST = 6
 
 def define_dynamic(height):
 
@@ -32,3 +67,182 @@ def define_dynamic(height):
         return height
     else:
         raise Exception(f"Invalid value {height} passed to height")
+
+
+# Called as hook(name, 'start' or 'end', target) around every action and rudiment factory, empty unless
+# instrumentation is on. target is the MultiRhythm of an action, a factory gets None then the rhythm it built
+# See memory.MemoryTracker and profiling.Profiler
+ACTION_HOOKS = []
+FACTORY_HOOKS = []
+
+def call_hooked(hooks, name, target, function, *args, **kwargs):
+    ''' Call function between the start and end calls of every hook '''
+
+    for hook in hooks: hook(name, 'start', target)
+    result = None
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        for hook in hooks: hook(name, 'end', result if target is None else target)
+
+    return result
+
+def action(func):
+    ''' Record function calls and parameters used to build up MultiRhythm object '''
+
+    def record(*args, **kwargs):
+        call = func(*args, **kwargs)
+        if kwargs.get('_save_action') != False:
+            args[0].actions.append((func.__name__, call))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+
+        # Hooks see the action once it is recorded
+        if ACTION_HOOKS:
+            call_hooked(ACTION_HOOKS, func.__name__, args[0], record, *args, **kwargs)
+        else:
+            record(*args, **kwargs)
+
+    return wrapper
+
+def rhythm_duration(func):
+    ''' Spread the duration passed as the first parameter across the Notes of the returned rhythm 
+        Works for Rhythm and CompactRhythm, both have one element per Note '''
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+
+        if FACTORY_HOOKS: return call_hooked(FACTORY_HOOKS, func.__name__, None, build, *args, **kwargs)
+        return build(*args, **kwargs)
+
+    def build(*args, **kwargs):
+       
+        rhythm = func(*args, **kwargs)
+
+        if args:
+            duration, *_ = args
+        else:
+            duration, *_ = func.__defaults__
+
+        # Split exactly, 1/4 over 6 Notes is 1/24 and not a rounded float
+        if type(duration) in [float, int, Fraction]:
+            duration = [Fraction(duration).limit_denominator(TICKS_PER_WHOLE) / len(rhythm)]
+        rhythm.set_duration(*duration)
+
+        return rhythm
+
+    return wrapper
+
+def duration_to_ticks(duration):
+    ''' Convert a duration (quarter note would be .25) to integer ticks '''
+
+    ticks = Fraction(duration).limit_denominator(TICKS_PER_WHOLE) * TICKS_PER_WHOLE
+    if ticks.denominator != 1:
+        raise Exception(f"Duration {duration} can not be represented in {TICKS_PER_WHOLE} ticks per whole note")
+    return int(ticks)
+
+def ticks_to_duration(ticks):
+    ''' Convert integer ticks back to a duration '''
+    return ticks / TICKS_PER_WHOLE
+
+def get_plan(actions):
+    ''' Split copy and modulate actions into modulation steps and rhythm counts
+        Returns ([(direction, name)] per modulate action, [rhythms added per state])
+        State 0 is the current rhythm, only copy actions add to it '''
+
+    steps, counts = [], [0]
+    for name, call in actions:
+        params = dict(call)
+        if name == 'modulate':
+            steps.append((params.get('direction', 'forward'), params.get('name')))
+            counts.append(params.get('copies', 1))
+        elif name == 'copy':
+            counts[-1] += params.get('copies', 1)
+        else:
+            raise Exception(f"Only copy and modulate actions can be planned, {name} passed")
+
+    return steps, counts
+
+def get_modulator_states(modulators, length, steps):
+    ''' Position of every modulator after each modulation step, without modulating anything
+
+        A modulator k steps in is its start position plus its net moves, modulo the Note count.
+        One not on a Note goes to the first Note moving forward and the last moving backward
+
+        Parameters
+            modulators: [(name, position or None)] in the Rhythm's modulator order
+            length: Notes in the Rhythm
+            steps: [(direction, name)], name None moves every modulator
+        Returns [(position, last step that moved it or None) per modulator] per step '''
+
+    for direction, _ in steps:
+        if direction not in ['forward', 'backward']:
+            raise Exception(f"position only accepts 'forward' or 'backward', value {direction} passed")
+
+    # Modulator index each step moves, None for every modulator
+    index = {name: i for i, (name, _) in enumerate(modulators)}
+    targets = [index[name] if name else None for _, name in steps]
+    if not modulators or not steps: return [() for _ in steps]
+    if len(modulators) * len(steps) >= NUMPY_MIN_MOVES and import_numpy() != None:
+        return get_modulator_states_numpy(modulators, length, steps, targets)
+
+    deltas = [[0] * len(steps) for _ in modulators]
+    for step, ((direction, _), target) in enumerate(zip(steps, targets)):
+        for i in range(len(modulators)) if target == None else [target]:
+            deltas[i][step] = 1 if direction == 'forward' else -1
+
+    columns = []
+    for (_, start), moves in zip(modulators, deltas):
+        first = next((step for step, delta in enumerate(moves) if delta), len(steps))
+        moved_start = start if start != None else -1 if first < len(steps) and moves[first] == 1 else 0
+
+        column = []
+        last = [step if delta else -1 for step, delta in enumerate(moves)]
+        for step, (total, moved) in enumerate(zip(accumulate(moves), accumulate(last, max))):
+            if step < first: column.append((start, None))
+            else: column.append(((moved_start + total) % length, moved))
+        columns.append(column)
+
+    return [*zip(*columns)]
+
+@functools.lru_cache(maxsize=None)
+def import_numpy():
+    ''' NumPy, None when it is not installed
+        Optional and imported on first use, core does not load it for plans that never need it '''
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def get_modulator_states_numpy(modulators, length, steps, targets):
+    ''' get_modulator_states with running sums over the (modulator, step) moves matrix '''
+
+    np = import_numpy()
+    count = len(steps)
+    signs = np.array([1 if direction == 'forward' else -1 for direction, _ in steps], dtype=np.int64)
+    every = np.array([target == None for target in targets], dtype=bool)
+    named = np.flatnonzero(~every)
+
+    deltas = np.zeros((len(modulators), count), dtype=np.int64)
+    deltas[:, every] = signs[every]
+    deltas[[targets[step] for step in named], named] = signs[named]
+
+    moves = deltas != 0
+    last = np.maximum.accumulate(np.where(moves, np.arange(count), -1), axis=1)
+    first = np.where(moves.any(axis=1), moves.argmax(axis=1), count).tolist()
+
+    # Modulators not on a Note start one before the first Note moving forward
+    moved_starts = np.array([start if start != None else -1 if first[i] < count and deltas[i, first[i]] == 1 else 0
+                             for i, (_, start) in enumerate(modulators)], dtype=np.int64)
+    positions = (moved_starts[:, None] + np.cumsum(deltas, axis=1)) % length
+
+    columns = []
+    for (_, start), moved, row, last_row in zip(modulators, first, positions.tolist(), last.tolist()):
+        column = [*zip(row, last_row)]
+        column[:moved] = [(start, None)] * moved
+        columns.append(column)
+
+    return [*zip(*columns)]